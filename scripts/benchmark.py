@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+微基准测试
+功能：对比追踪器关键路径的不同实现的耗时
+"""
+
+import os
+import sys
+import queue
+import timeit
+import statistics
+import subprocess
+import logging
+import tempfile
+from logging.handlers import QueueListener
+from typing import Callable, Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+from website_tracker import MetaRefreshScanner, DeferredQueueHandler, JsonLogFormatter, AntiCrawlMatcher
+
+
+def legacy_parse_meta_refresh(html_content: str) -> Optional[str]:
+    """旧版实现：用BeautifulSoup解析整页后查找Meta刷新"""
+    try:
+        soup = BeautifulSoup(html_content, 'html.parser')
+        meta_refresh = soup.find('meta', attrs={'http-equiv': lambda x: x and x.lower() == 'refresh'})
+
+        if meta_refresh and 'content' in meta_refresh.attrs:
+            content = meta_refresh['content']
+            if 'url=' in content.lower():
+                return content.split('url=', 1)[1].strip()
+    except Exception:
+        pass
+    return None
+
+
+def streaming_parse_meta_refresh(body: bytes, max_bytes: int = 65536, chunk_size: int = 8192) -> Optional[str]:
+    """新版实现：按块输入流式扫描器，模拟 iter_content 的读取方式"""
+    scanner = MetaRefreshScanner(max_bytes)
+    for start in range(0, len(body), chunk_size):
+        if scanner.feed(body[start:start + chunk_size]):
+            break
+    return scanner.result
+
+
+def build_meta_refresh_pages() -> Dict[str, str]:
+    """构造测试页面：普通跳转页、嵌入大型播放器的落地页、无跳转页，以及注释、脚本、body中的Meta刷新等边界情况"""
+    player = "<script>" + "var playerConfig = {};" * 50000 + "</script>"
+    # 跨越多个读取块的长注释，检验注释状态能跨块保持
+    long_comment = ('<!-- ' + "旧版播放器配置 " * 2000 +
+                    '<meta http-equiv="refresh" content="0; url=http://example.com/old"></head> -->')
+    return {
+        "小型跳转页": '<html><head><meta http-equiv="refresh" content="0; url=http://example.com/a"></head><body></body></html>',
+        "大型播放器页": ('<html><head><title>视频</title>'
+                    '<meta http-equiv="Refresh" content="0; url=http://example.com/b"></head>'
+                    '<body>' + player + '</body></html>'),
+        "无跳转大页面": '<html><head><title>视频</title></head><body>' + player + '</body></html>',
+        "注释中的Meta刷新": ('<html><head><!-- <meta http-equiv="refresh" content="0; url=http://example.com/old"> -->'
+                       '<title>视频</title></head><body>' + player + '</body></html>'),
+        "长注释后的Meta刷新": ('<html><head>' + long_comment +
+                        '<meta http-equiv="refresh" content="0; url=http://example.com/c"></head><body></body></html>'),
+        "head脚本中的<body>": ('<html><head><script>var s="<body>";</script>'
+                           '<meta http-equiv="refresh" content="0; url=http://example.com/d"></head><body></body></html>'),
+        "body中的Meta刷新": ('<html><head><title>视频</title></head><body><p>正在跳转</p>'
+                         '<meta http-equiv="refresh" content="0; url=http://example.com/e"></body></html>'),
+        "属性值中含>": ('<html><head><meta http-equiv="refresh" content="0; url=http://example.com/f?next=>g">'
+                    '</head><body></body></html>'),
+    }
+
+
+def measure(func: Callable[[], object], repeat: int = 5, number: int = 10) -> float:
+    """返回单次调用的最佳耗时（毫秒）"""
+    best = min(timeit.repeat(func, repeat=repeat, number=number))
+    return best / number * 1000
+
+
+def bench_meta_refresh() -> List[Dict]:
+    """对比旧版整页解析与新版流式扫描，并检查两者结果一致"""
+    rows = []
+    for name, page in build_meta_refresh_pages().items():
+        body = page.encode("utf-8")
+        same_result = legacy_parse_meta_refresh(page) == streaming_parse_meta_refresh(body)
+        legacy_ms = measure(lambda: legacy_parse_meta_refresh(page), number=2)
+        streaming_ms = measure(lambda: streaming_parse_meta_refresh(body))
+        rows.append({
+            "case": name,
+            "bytes": len(body),
+            "legacy_ms": legacy_ms,
+            "streaming_ms": streaming_ms,
+            "speedup": legacy_ms / streaming_ms if streaming_ms else float("inf"),
+            "same_result": same_result,
+        })
+    return rows
+
+
+def bench_logging(calls: int = 20000) -> List[Dict]:
+    """对比调用线程上的单条日志开销：同步文件/控制台处理器 + f-string 与 队列管道 + 延迟格式化"""
+    url = "http://tians.06kd.mlkj888.cn/s/shizu12345"
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir, open(os.devnull, "w") as console:
+        text_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+        logger = logging.getLogger("benchmark.logging")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+
+        sync_handler = logging.FileHandler(os.path.join(workdir, "sync.log"), encoding="utf-8")
+        sync_handler.setFormatter(text_formatter)
+        sync_console = logging.StreamHandler(console)
+        sync_console.setFormatter(text_formatter)
+        logger.addHandler(sync_handler)
+        logger.addHandler(sync_console)
+        sync_ms = measure(lambda: logger.info(f"处理 {url} (尝试 {1}/{3})"), repeat=3, number=calls)
+        logger.removeHandler(sync_handler)
+        logger.removeHandler(sync_console)
+        sync_handler.close()
+
+        file_handler = logging.FileHandler(os.path.join(workdir, "queued.log"), encoding="utf-8")
+        file_handler.setFormatter(JsonLogFormatter())
+        log_queue = queue.SimpleQueue()
+        queued_console = logging.StreamHandler(console)
+        queued_console.setFormatter(text_formatter)
+        listener = QueueListener(log_queue, file_handler, queued_console)
+        listener.start()
+        queue_handler = DeferredQueueHandler(log_queue)
+        logger.addHandler(queue_handler)
+        queued_ms = measure(lambda: logger.info("处理 %s (尝试 %s/%s)", url, 1, 3,
+                                                extra={"fields": {"event": "probe", "attempt": 1}}),
+                            repeat=3, number=calls)
+        logger.removeHandler(queue_handler)
+        listener.stop()
+        file_handler.close()
+
+    for name, per_call_ms in (("同步文件+控制台 + f-string", sync_ms), ("队列管道 + JSON延迟格式化", queued_ms)):
+        rows.append({"case": name, "us_per_call": per_call_ms * 1000})
+    return rows
+
+
+def legacy_is_anti_crawl_url(url: str, patterns: List[str]) -> bool:
+    """旧版实现：逐条子串比较"""
+    for pattern in patterns:
+        if pattern in url:
+            return True
+    return False
+
+
+def build_anti_crawl_rules(count: int, filterable_regex: bool = True) -> List[str]:
+    """构造指定数量的规则：主机、主机+路径、子串、正则四类各占四分之一；
+    filterable_regex 为False时正则忽略大小写，提取不到预筛用的字面子串"""
+    rules = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            rules.append(f"host:decoy{i}.example.com")
+        elif kind == 1:
+            rules.append(f"path:cdn{i}.example.net/trap/{i}")
+        elif kind == 2:
+            rules.append(f"save-video-{i}/")
+        elif filterable_regex:
+            rules.append(rf"regex:^https?://[^/]+/vid{i}/\d+")
+        else:
+            rules.append(rf"regex:(?i)^https?://[^/]+/vid{i}/\d+")
+    return rules
+
+
+def legacy_patterns(rules: List[str]) -> List[str]:
+    """把规则换成旧版只能表达的子串形式（正则规则按原文当作子串，只用于对比耗时）"""
+    return [rule.split(":", 1)[1] if rule.startswith(("host:", "path:", "regex:")) else rule for rule in rules]
+
+
+def bench_anti_crawl_matcher() -> List[Dict]:
+    """对比规则数增长时旧版线性子串扫描与编译后匹配器的单个URL耗时（绝大多数URL不命中，是最坏情况）；
+    可预筛的正则与其他规则一样基本不随规则数增长，无法预筛的正则（忽略大小写等）逐条运行，耗时随条数线性增长"""
+    urls = [f"http://target{i}.example.org/v/{i}/play.html?id={i * 7919}" for i in range(50)]
+    rows = []
+    for count, filterable_regex in ((2, True), (100, True), (1000, True), (10000, True),
+                                    (100, False), (1000, False)):
+        rules = build_anti_crawl_rules(count, filterable_regex)
+        patterns = legacy_patterns(rules)
+        matcher = AntiCrawlMatcher(rules)
+        legacy_ms = measure(lambda: [legacy_is_anti_crawl_url(url, patterns) for url in urls], number=5)
+        matcher_ms = measure(lambda: [matcher.match(url) for url in urls], number=5)
+        rows.append({
+            "rules": count,
+            "regex": "可预筛" if filterable_regex else "不可预筛",
+            "legacy_us_per_url": legacy_ms * 1000 / len(urls),
+            "matcher_us_per_url": matcher_ms * 1000 / len(urls),
+        })
+    return rows
+
+
+def bench_cold_start(runs: int = 7) -> List[Dict]:
+    """测量命令行冷启动耗时：每次新起解释器，取中位数（包含解释器自身的启动时间）"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    cases = {
+        "python 空解释器": [sys.executable, "-c", "pass"],
+        "import website_tracker": [sys.executable, "-c", "import website_tracker"],
+        "import website_tracker + requests": [sys.executable, "-c", "import website_tracker, requests"],
+        "website_tracker.py --help": [sys.executable, os.path.join(script_dir, "website_tracker.py"), "--help"],
+    }
+    rows = []
+    for name, command in cases.items():
+        timings = []
+        for _ in range(runs):
+            start = timeit.default_timer()
+            subprocess.run(command, cwd=script_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            timings.append((timeit.default_timer() - start) * 1000)
+        rows.append({"case": name, "median_ms": statistics.median(timings)})
+    return rows
+
+
+def print_rows(title: str, rows: List[Dict]):
+    """打印基准结果表"""
+    print(f"\n== {title} ==")
+    for row in rows:
+        print("  " + ", ".join(
+            f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in row.items()
+        ))
+
+
+def main():
+    """主函数"""
+    meta_refresh_rows = bench_meta_refresh()
+    print_rows("Meta刷新检测: BeautifulSoup整页解析 vs 流式扫描", meta_refresh_rows)
+    print_rows("日志: 调用线程上的单条开销", bench_logging())
+    print_rows("反爬规则匹配: 线性子串扫描 vs 编译后匹配器", bench_anti_crawl_matcher())
+    print_rows("冷启动: 新进程导入与命令行耗时", bench_cold_start())
+    # 流式扫描与旧版结果不一致时以非零状态退出
+    return 1 if any(not row["same_result"] for row in meta_refresh_rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,67 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网站追踪报告生成工具
+功能：单遍流式读取结果历史（文本文件或SQLite结果库），在有限内存内汇总状态统计、变化次数和反爬趋势
+"""
+
 import os
-import json
-import pandas as pd
+import re
+import sqlite3
+import argparse
+from collections import Counter
 from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from website_tracker import ConfigManager, ProcessResult, ResultAnalyzer
+
+
+STATUS_LABELS = {
+    'success': '成功访问',
+    'failed': '访问失败',
+    'retry_needed': '触发反爬（需要重试）',
+    'skipped': '已跳过',
+}
+
+# 时间窗口对应的时间戳前缀长度（时间戳格式为 %Y-%m-%d %H:%M:%S）
+WINDOW_PREFIX = {'hour': 13, 'day': 10}
+
+
+class ReportAggregator:
+    """单遍流式聚合器：内存只随编号数和时间窗口数增长，与历史记录条数无关"""
+
+    def __init__(self, window: str = 'day'):
+        self.prefix = WINDOW_PREFIX[window]
+        self.total = 0
+        self.status_counts: Counter = Counter()
+        self.latest: Dict[str, Optional[str]] = {}
+        self.change_counts: Counter = Counter()
+        self.windows: Dict[str, List[int]] = {}
+        self.first_timestamp: Optional[str] = None
+        self.last_timestamp: Optional[str] = None
+
+    def add(self, result: ProcessResult):
+        """累加一条记录"""
+        self.total += 1
+        self.status_counts[result.status] += 1
+
+        timestamp = result.timestamp
+        if self.first_timestamp is None or timestamp < self.first_timestamp:
+            self.first_timestamp = timestamp
+        if self.last_timestamp is None or timestamp > self.last_timestamp:
+            self.last_timestamp = timestamp
+
+        window = self.windows.setdefault(timestamp[:self.prefix], [0, 0])
+        window[0] += 1
+        if result.status == 'retry_needed':
+            window[1] += 1
+
+        # 只有成功跳转的URL参与变化统计，第一次出现不算变化
+        if result.status == 'success':
+            previous = self.latest.get(result.shizu_id)
+            if previous is not None and previous != result.redirect_url:
+                self.change_counts[result.shizu_id] += 1
+            self.latest[result.shizu_id] = result.redirect_url
+        else:
+            self.latest.setdefault(result.shizu_id, None)
+
+    def add_all(self, results: Iterable[ProcessResult]) -> "ReportAggregator":
+        """依次累加所有记录"""
+        for result in results:
+            self.add(result)
+        return self
+
+    def summary(self) -> Dict:
+        """汇总为报告数据"""
+        return {
+            'total': self.total,
+            'status_counts': dict(self.status_counts),
+            'first_timestamp': self.first_timestamp,
+            'last_timestamp': self.last_timestamp,
+            'ids': list(self.latest),
+            'change_counts': dict(self.change_counts),
+            'windows': {key: tuple(value) for key, value in sorted(self.windows.items())},
+        }
+
+
+def aggregate_text(results_file: str, window: str = 'day') -> Dict:
+    """流式解析文本结果文件"""
+    results = (result for result, _ in ResultAnalyzer.iter_results(results_file))
+    return ReportAggregator(window).add_all(results).summary()
+
+
+def aggregate_sqlite(db_path: str, window: str = 'day') -> Dict:
+    """在SQLite内以集合运算完成聚合，只把汇总结果取回Python"""
+    prefix = WINDOW_PREFIX[window]
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        total, first_timestamp, last_timestamp = conn.execute(
+            "SELECT COUNT(*), MIN(timestamp), MAX(timestamp) FROM results").fetchone()
+        status_counts = dict(conn.execute("SELECT status, COUNT(*) FROM results GROUP BY status"))
+        ids = [row[0] for row in conn.execute("SELECT DISTINCT shizu_id FROM results")]
+        windows = {
+            key: (count, anti_crawl) for key, count, anti_crawl in conn.execute(
+                "SELECT substr(timestamp, 1, ?) AS bucket, COUNT(*), SUM(status = 'retry_needed') "
+                "FROM results GROUP BY bucket ORDER BY bucket", (prefix,))
+        }
+        change_counts = _sqlite_change_counts(conn)
+    finally:
+        conn.close()
+
+    return {
+        'total': total,
+        'status_counts': status_counts,
+        'first_timestamp': first_timestamp,
+        'last_timestamp': last_timestamp,
+        'ids': ids,
+        'change_counts': change_counts,
+        'windows': windows,
+    }
 
-def generate_report():
+
+def _sqlite_change_counts(conn: sqlite3.Connection) -> Dict[str, int]:
+    """统计每个编号成功跳转URL的变化次数"""
+    if sqlite3.sqlite_version_info >= (3, 25, 0):
+        rows = conn.execute(
+            "SELECT shizu_id, SUM(changed) FROM ("
+            "  SELECT shizu_id, redirect_url != LAG(redirect_url) OVER "
+            "    (PARTITION BY shizu_id ORDER BY timestamp, id) AS changed "
+            "  FROM results WHERE status = 'success'"
+            ") GROUP BY shizu_id HAVING SUM(changed) > 0")
+        return {shizu_id: int(changes) for shizu_id, changes in rows}
+
+    # 旧版SQLite没有窗口函数，按索引顺序流式比较
+    change_counts: Counter = Counter()
+    previous_id, previous_url = None, None
+    for shizu_id, redirect_url in conn.execute(
+            "SELECT shizu_id, redirect_url FROM results WHERE status = 'success' "
+            "ORDER BY shizu_id, timestamp, id"):
+        if shizu_id == previous_id and redirect_url != previous_url:
+            change_counts[shizu_id] += 1
+        previous_id, previous_url = shizu_id, redirect_url
+    return dict(change_counts)
+
+
+def id_range(ids: Iterable[str]) -> Tuple[Optional[str], Optional[str]]:
+    """按编号末尾的数字取链接范围"""
+    def number(shizu_id: str) -> int:
+        match = re.search(r'(\d+)$', shizu_id)
+        return int(match.group(1)) if match else -1
+
+    ordered = sorted(ids, key=number)
+    return (ordered[0], ordered[-1]) if ordered else (None, None)
+
+
+def format_report(summary: Dict, source: str, top: int = 10) -> str:
+    """生成报告文本"""
+    total = summary['total']
+    counts = summary['status_counts']
+    success_rate = counts.get('success', 0) / total * 100 if total else 0
+
+    if summary['first_timestamp']:
+        date_range = f"{summary['first_timestamp']} 到 {summary['last_timestamp']}"
+    else:
+        date_range = "无数据"
+    first_id, last_id = id_range(summary['ids'])
+
+    lines = [
+        f"网站追踪报告 (生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')})",
+        "======================================================",
+        "",
+        f"数据来源: {source}",
+        f"追踪日期范围: {date_range}",
+        "",
+        "总体统计:",
+        f"  - 总记录数: {total}",
+        f"  - 追踪链接数: {len(summary['ids'])}",
+    ]
+    for status, label in STATUS_LABELS.items():
+        count = counts.get(status, 0)
+        lines.append(f"  - {label}: {count} ({count / total * 100 if total else 0:.2f}%)")
+    lines.append(f"  - 成功率: {success_rate:.2f}%")
+
+    lines += ["", "详细统计:", f"  - 链接范围: {first_id or '无'} 到 {last_id or '无'}"]
+    change_counts = summary['change_counts']
+    lines.append(f"  - 跳转URL发生过变化的链接: {len(change_counts)} 个，共变化 {sum(change_counts.values())} 次")
+    for shizu_id, changes in sorted(change_counts.items(), key=lambda item: (-item[1], item[0]))[:top]:
+        lines.append(f"      {shizu_id}: {changes} 次")
+
+    lines += ["", "反爬命中率（按时间窗口）:"]
+    for window, (count, anti_crawl) in summary['windows'].items():
+        lines.append(f"  - {window}: {anti_crawl}/{count} ({anti_crawl / count * 100 if count else 0:.2f}%)")
+
+    return "\n".join(lines) + "\n"
+
+
+def generate_report(source: Optional[str] = None, backend: Optional[str] = None, window: str = 'day',
+                    report_file: str = "tracking_report.txt", top: int = 10):
     """生成网站追踪报告"""
+    config = ConfigManager.load_config()
+    backend = backend or config.results_backend
+    source = source or (config.results_db if backend == 'sqlite' else config.results_file)
+
     # 检查结果文件是否存在
-    results_file = "website_results.txt"
-    if not os.path.exists(results_file):
-        print("结果文件不存在，无法生成报告。")
+    if not os.path.exists(source):
+        print(f"结果文件 {source} 不存在，无法生成报告。")
         return
-    
-    # 加载数据
+
     try:
-        df = pd.read_csv(results_file)
-        
-        # 基本统计
-        total_urls = len(df)
-        successful = df[df['状态'] == '成功'].shape[0]
-        failed = df[df['状态'] == '失败'].shape[0]
-        retries = df[df['状态'] == '需要重试'].shape[0]
-        errors = df[df['状态'] == '出错'].shape[0]
-        skipped = df[df['状态'] == '跳过'].shape[0]
-        
-        # 计算成功率
-        success_rate = (successful / total_urls) * 100 if total_urls > 0 else 0
-        
-        # 获取追踪的日期范围
-        if not df.empty:
-            start_date = pd.to_datetime(df['时间戳']).min()
-            end_date = pd.to_datetime(df['时间戳']).max()
-            date_range = f"{start_date.strftime('%Y-%m-%d %H:%M:%S')} 到 {end_date.strftime('%Y-%m-%d %H:%M:%S')}"
+        if backend == 'sqlite':
+            summary = aggregate_sqlite(source, window)
         else:
-            date_range = "无数据"
-        
-        # 生成报告
-        report = f"""
-网站追踪报告 (生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
-======================================================
-
-追踪日期范围: {date_range}
-
-总体统计:
-  - 总链接数: {total_urls}
-  - 成功访问: {successful} ({success_rate:.2f}%)
-  - 访问失败: {failed}
-  - 需要重试: {retries}
-  - 发生错误: {errors}
-  - 已跳过: {skipped}
-
-详细统计:
-  - 链接范围: {df['链接编号'].min()} 到 {df['链接编号'].max()}
-"""
-        
+            summary = aggregate_text(source, window)
+
         # 将报告写入文件
-        report_file = "tracking_report.txt"
         with open(report_file, 'w', encoding='utf-8') as f:
-            f.write(report)
-        
+            f.write(format_report(summary, source, top))
+
         print(f"报告已生成: {report_file}")
-        
+
     except Exception as e:
         print(f"生成报告时出错: {e}")
 
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="生成网站追踪报告")
+    parser.add_argument("--source", help="结果文件或SQLite结果库路径（默认取配置）")
+    parser.add_argument("--backend", choices=["text", "sqlite"], help="结果来源类型（默认取配置中的 results_backend）")
+    parser.add_argument("--window", choices=sorted(WINDOW_PREFIX), default="day", help="反爬命中率统计的时间窗口")
+    parser.add_argument("--output", default="tracking_report.txt", help="报告文件路径")
+    parser.add_argument("--top", type=int, default=10, help="列出变化次数最多的前N个链接")
+    args = parser.parse_args()
+    generate_report(args.source, args.backend, args.window, args.output, args.top)
+
+
 if __name__ == "__main__":
-    generate_report()
+    main()
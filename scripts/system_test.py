@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+系统压测与吞吐基准
+功能：启动本地模拟源站，测量追踪器各环节的吞吐、延迟、CPU和内存，结果保存为JSON便于版本间对比
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+from website_tracker import (ConfigManager, FileManager, NetworkUtils, ResultAnalyzer,
+                             TrackerConfig, WebsiteTracker)
+
+
+class StandInBehavior:
+    """模拟源站的行为参数"""
+
+    def __init__(self, meta_refresh_rate: float = 0.2, anti_crawl_rate: float = 0.05,
+                 error_rate: float = 0.0, latency: float = 0.0, jitter: float = 0.0,
+                 page_padding: int = 0, seed: int = 0, client_rate: float = 0.0):
+        self.meta_refresh_rate = meta_refresh_rate
+        self.anti_crawl_rate = anti_crawl_rate
+        self.error_rate = error_rate
+        self.latency = latency
+        self.jitter = jitter
+        self.page_padding = page_padding
+        self.random = random.Random(seed)
+        self.client_rate = client_rate
+        self.clients: Dict[str, List[float]] = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+
+    def roll(self) -> float:
+        """线程安全地取一个随机数并计数"""
+        with self.lock:
+            self.requests += 1
+            return self.random.random()
+
+    def over_limit(self, client: str) -> bool:
+        """按客户端的令牌桶（容量2）判断是否超过 client_rate，模拟源站按来源地址触发反爬"""
+        if self.client_rate <= 0:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            tokens, last = self.clients.get(client, (2.0, now))
+            tokens = min(2.0, tokens + (now - last) * self.client_rate)
+            limited = tokens < 1
+            self.clients[client] = [tokens if limited else tokens - 1, now]
+            if limited:
+                self.rate_limited += 1
+            return limited
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """模拟源站：302跳转、Meta刷新页、反爬诱饵跳转、连接错误"""
+
+    protocol_version = "HTTP/1.1"
+    behavior: StandInBehavior = StandInBehavior()
+
+    def do_GET(self):
+        behavior = self.behavior
+        delay = behavior.latency + (random.uniform(-behavior.jitter, behavior.jitter) if behavior.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+        shizu_id = self.path.rsplit("/", 1)[-1]
+        if behavior.over_limit(self.headers.get("X-Egress") or self.client_address[0]):
+            self._redirect(f"https://v.qq.com/txp/iframe/player.html?vid={shizu_id}")
+            return
+        roll = behavior.roll()
+        if roll < behavior.error_rate:
+            # 不返回任何响应直接断开，模拟源站错误
+            self.close_connection = True
+            return
+        roll -= behavior.error_rate
+        if roll < behavior.anti_crawl_rate:
+            self._redirect(f"https://v.qq.com/txp/iframe/player.html?vid={shizu_id}")
+            return
+        roll -= behavior.anti_crawl_rate
+        if roll < behavior.meta_refresh_rate:
+            padding = "<script>" + "x" * behavior.page_padding + "</script>" if behavior.page_padding else ""
+            body = (f'<html><head><title>{shizu_id}</title>'
+                    f'<meta http-equiv="refresh" content="0; url=/landing/{shizu_id}">'
+                    f'</head><body>{padding}</body></html>').encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self._redirect(f"http://cdn.example.com/save-video/{shizu_id}.mp4")
+
+    def _redirect(self, location: str):
+        """返回302跳转"""
+        self.send_response(302)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer:
+    """在后台线程运行的本地模拟源站"""
+
+    def __init__(self, behavior: StandInBehavior, host: str = "127.0.0.1", port: int = 0):
+        handler = type("BoundStandInHandler", (StandInHandler,), {"behavior": behavior})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        """模拟源站的编号URL前缀"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/s/shizu"
+
+    def __enter__(self) -> "StandInServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StandInProxyHandler(BaseHTTPRequestHandler):
+    """模拟出口代理：转发GET请求并用 X-Egress 头标明出口，源站据此区分来源"""
+
+    protocol_version = "HTTP/1.1"
+    egress = "proxy"
+    HOP_HEADERS = {"connection", "proxy-connection", "keep-alive", "transfer-encoding"}
+
+    def do_GET(self):
+        target = urlsplit(self.path)
+        path = target.path + (f"?{target.query}" if target.query else "")
+        headers = {key: value for key, value in self.headers.items() if key.lower() not in self.HOP_HEADERS}
+        headers["X-Egress"] = self.egress
+        upstream = http.client.HTTPConnection(target.netloc, timeout=10)
+        try:
+            upstream.request("GET", path, headers=headers)
+            response = upstream.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            # 源站断开时同样断开客户端连接，保持错误的表现一致
+            self.close_connection = True
+            return
+        finally:
+            upstream.close()
+        self.send_response(response.status)
+        for key, value in response.getheaders():
+            if key.lower() not in self.HOP_HEADERS and key.lower() != "content-length":
+                self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInProxy(StandInServer):
+    """在后台线程运行的本地转发代理，每个实例代表一个出口"""
+
+    def __init__(self, egress: str, host: str = "127.0.0.1", port: int = 0):
+        handler = type("BoundStandInProxyHandler", (StandInProxyHandler,), {"egress": egress})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """代理地址"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def peak_rss_kb() -> Optional[int]:
+    """进程至今的峰值常驻内存（KB），平台不支持时返回None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """取样本分位数"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def measure(name: str, items: int, func: Callable[[], Optional[List[float]]]) -> Dict:
+    """运行一项基准，统计吞吐、延迟分位数、CPU时间和峰值内存"""
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    latencies = func() or []
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    row = {
+        "name": name,
+        "items": items,
+        "wall_seconds": round(wall, 4),
+        "items_per_second": round(items / wall, 2) if wall > 0 else None,
+        "cpu_seconds": round(cpu, 4),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+    if latencies:
+        row["p50_ms"] = round(percentile(latencies, 0.50) * 1000, 3)
+        row["p99_ms"] = round(percentile(latencies, 0.99) * 1000, 3)
+    print(f"  {name}: {row['items_per_second']} 个/秒，CPU {row['cpu_seconds']} 秒"
+          + (f"，p50 {row['p50_ms']} ms，p99 {row['p99_ms']} ms" if latencies else ""))
+    return row
+
+
+def bench_get_redirect_url(base_url: str, ids: int) -> Dict:
+    """逐个探测编号，测量 NetworkUtils.get_redirect_url"""
+    def run():
+        latencies = []
+        for index in range(1, ids + 1):
+            start = time.perf_counter()
+            NetworkUtils.get_redirect_url(f"{base_url}{index}")
+            latencies.append(time.perf_counter() - start)
+        return latencies
+    return measure("get_redirect_url", ids, run)
+
+
+def bench_parse_meta_refresh(iterations: int) -> Dict:
+    """测量 NetworkUtils._parse_meta_refresh"""
+    page = ('<html><head><title>x</title><meta http-equiv="refresh" content="0; url=/landing/1"></head>'
+            '<body>' + "<p>content</p>" * 200 + '</body></html>')
+
+    def run():
+        latencies = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            NetworkUtils._parse_meta_refresh(page)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+    return measure("_parse_meta_refresh", iterations, run)
+
+
+def bench_load_results(workdir: str, records: int) -> Dict:
+    """生成合成结果文件，测量 ResultAnalyzer.load_results_from_file"""
+    results_file = os.path.join(workdir, "bench_results.txt")
+    FileManager.ensure_file_exists(results_file, "=== 网站跳转结果记录 ===")
+    with open(results_file, "a", encoding="utf-8") as f:
+        for i in range(records):
+            index = i % 5000 + 1
+            f.write(f"时间戳: 2025-08-28 00:00:00\n直连网站: http://example.com/s/shizu{index}\n"
+                    f"跳转网站: http://cdn.example.com/save-video/{i}.mp4\nshizu编号: shizu{index}\n---\n")
+
+    def run():
+        start = time.perf_counter()
+        ResultAnalyzer.load_results_from_file(results_file)
+        return [time.perf_counter() - start]
+    return measure("load_results_from_file", records, run)
+
+
+def bench_tracker_run(label: str, base_url: str, workdir: str, ids: int, overrides: Dict) -> Dict:
+    """在临时目录中完整运行一轮 WebsiteTracker.run"""
+    sweep_dir = tempfile.mkdtemp(dir=workdir)
+    config_data = dict(ConfigManager.DEFAULT_CONFIG)
+    config_data.update({
+        "base_url": base_url, "min_index": 1, "max_index": ids,
+        "min_delay": 0, "max_delay": 0, "anti_crawl_wait_min": 0, "anti_crawl_wait_max": 0, "retry_delay": 0,
+        "results_file": "website_results.txt", "log_file": "website_tracker.log",
+    })
+    config_data.update(overrides)
+    config = TrackerConfig(**config_data)
+
+    def run():
+        cwd = os.getcwd()
+        os.chdir(sweep_dir)
+        try:
+            WebsiteTracker(config).run()
+        finally:
+            os.chdir(cwd)
+    return measure(label, ids, run)
+
+
+def bench_proxy_scaling(behavior: StandInBehavior, workdir: str, ids: int, proxies: int,
+                        concurrency: int) -> List[Dict]:
+    """模拟源站按出口限流，对比只用一个出口与使用全部出口时整轮的吞吐"""
+    rows = []
+    with StandInServer(behavior) as server:
+        stand_ins = [StandInProxy(f"egress{i}").__enter__() for i in range(proxies)]
+        try:
+            for count in sorted({1, proxies}):
+                overrides = {"response_cache_file": "", "concurrency": concurrency,
+                             "proxies": [proxy.url for proxy in stand_ins[:count]],
+                             "proxy_rate": behavior.client_rate * 0.8, "proxy_cooldown": 1.0,
+                             "host_burst": 1}
+                limited_before = behavior.rate_limited
+                row = bench_tracker_run(f"WebsiteTracker.run proxies x{count}", server.base_url, workdir,
+                                        ids, overrides)
+                row["rate_limited"] = behavior.rate_limited - limited_before
+                rows.append(row)
+        finally:
+            for proxy in stand_ins:
+                proxy.__exit__()
+    return rows
+
+
+def bench_shard_workers(behavior: StandInBehavior, workdir: str, ids: int, workers: int) -> Dict:
+    """启动多个 --shard-worker 进程共同处理一轮，合并后检查每个编号恰好处理一次"""
+    sweep_dir = tempfile.mkdtemp(dir=workdir)
+    tracker = os.path.join(os.path.dirname(os.path.abspath(__file__)), "website_tracker.py")
+    row = {}
+    with StandInServer(behavior) as server:
+        config_data = dict(ConfigManager.DEFAULT_CONFIG)
+        config_data.update({
+            "base_url": server.base_url, "min_index": 1, "max_index": ids,
+            "min_delay": 0, "max_delay": 0, "anti_crawl_wait_min": 0, "anti_crawl_wait_max": 0, "retry_delay": 0,
+            "results_file": "website_results.txt", "log_file": "website_tracker.log",
+            "shard_dir": os.path.join(sweep_dir, "shards"), "shard_size": max(ids // (workers * 4), 1),
+            "response_cache_file": "", "title_sample_rate": 0, "metrics_file": "",
+        })
+        config_file = os.path.join(sweep_dir, "config.json")
+        with open(config_file, "w", encoding="utf-8") as f:
+            json.dump(config_data, f, ensure_ascii=False)
+
+        def tracker_process(*args):
+            return subprocess.Popen([sys.executable, tracker, "--config", config_file, *args], cwd=sweep_dir,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        def run():
+            processes = [tracker_process("--shard-worker") for _ in range(workers)]
+            for process in processes:
+                process.wait()
+            tracker_process("--merge-shards").wait()
+
+        requests_before = behavior.requests
+        row = measure(f"WebsiteTracker shard workers x{workers}", ids, run)
+        row["server_requests"] = behavior.requests - requests_before
+
+    counts = Counter(result.shizu_id for result, _ in
+                     ResultAnalyzer.iter_results(os.path.join(sweep_dir, "website_results.txt")))
+    expected = {f"shizu{index}" for index in range(1, ids + 1)}
+    row["missing"] = len(expected - set(counts))
+    row["duplicates"] = sum(1 for count in counts.values() if count > 1)
+    row["exactly_once"] = not row["missing"] and not row["duplicates"] and set(counts) == expected
+    print(f"  分片检查: 源站请求 {row['server_requests']} 次，缺失 {row['missing']} 个，重复 {row['duplicates']} 个"
+          + ("" if row["exactly_once"] else "  <-- 失败"))
+    return row
+
+
+def git_version() -> Optional[str]:
+    """当前代码版本"""
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare_with_baseline(rows: List[Dict], baseline_file: str, tolerance: float = 0.1) -> int:
+    """与基线结果对比吞吐，返回回退项数量"""
+    baseline = {row["name"]: row for row in (FileManager.load_json(baseline_file) or {}).get("results", [])}
+    regressions = 0
+    print(f"\n== 与基线 {baseline_file} 对比 ==")
+    for row in rows:
+        old = baseline.get(row["name"])
+        if not old or not old.get("items_per_second") or not row.get("items_per_second"):
+            continue
+        change = row["items_per_second"] / old["items_per_second"] - 1
+        flag = ""
+        if change < -tolerance:
+            flag = "  <-- 回退"
+            regressions += 1
+        print(f"  {row['name']}: {old['items_per_second']} -> {row['items_per_second']} 个/秒 ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="追踪器系统压测与吞吐基准")
+    parser.add_argument("--ids", type=int, default=200, help="每项探测基准处理的编号数")
+    parser.add_argument("--records", type=int, default=50000, help="结果文件基准的记录数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发整轮基准的工作线程数")
+    parser.add_argument("--latency", type=float, default=0.005, help="模拟源站的基础延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.002, help="模拟源站延迟抖动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="模拟源站断开连接的比例")
+    parser.add_argument("--anti-crawl-rate", type=float, default=0.02, help="返回反爬诱饵跳转的比例")
+    parser.add_argument("--meta-refresh-rate", type=float, default=0.2, help="返回Meta刷新页的比例")
+    parser.add_argument("--page-padding", type=int, default=0, help="Meta刷新页正文附加的字节数")
+    parser.add_argument("--proxies", type=int, default=0,
+                        help="启动的本地模拟出口代理数，大于0时额外对比单出口与多出口的吞吐")
+    parser.add_argument("--client-rate", type=float, default=10.0,
+                        help="出口代理基准中模拟源站允许每个出口每秒的请求数，超过即返回反爬跳转")
+    parser.add_argument("--proxy-ids", type=int, default=50, help="出口代理基准处理的编号数")
+    parser.add_argument("--shard-workers", type=int, default=0,
+                        help="启动的分片工作进程数，大于0时额外检查多进程分片模式每个编号恰好处理一次")
+    parser.add_argument("--output", default="benchmark_results.json", help="结果JSON文件")
+    parser.add_argument("--baseline", help="用于对比的历史结果JSON文件")
+    parser.add_argument("--verbose", action="store_true", help="输出追踪器日志")
+    args = parser.parse_args()
+
+    # 追踪器的日志配置在已有处理器时不会生效，默认静默以免日志I/O影响测量
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL,
+                        handlers=[logging.StreamHandler() if args.verbose else logging.NullHandler()])
+
+    behavior = StandInBehavior(args.meta_refresh_rate, args.anti_crawl_rate, args.error_rate,
+                               args.latency, args.jitter, args.page_padding)
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir, StandInServer(behavior) as server:
+        print(f"模拟源站: {server.base_url}")
+        rows.append(bench_get_redirect_url(server.base_url, args.ids))
+        rows.append(bench_parse_meta_refresh(args.ids * 50))
+        rows.append(bench_load_results(workdir, args.records))
+        no_cache = {"response_cache_file": ""}
+        rows.append(bench_tracker_run("WebsiteTracker.run sequential", server.base_url, workdir,
+                                      args.ids, dict(no_cache)))
+        rows.append(bench_tracker_run("WebsiteTracker.run concurrent", server.base_url, workdir, args.ids,
+                                      dict(no_cache, concurrency=args.concurrency, host_rate=10000,
+                                           host_burst=args.concurrency)))
+        server_requests = behavior.requests
+        if args.proxies > 0:
+            limited = StandInBehavior(args.meta_refresh_rate, args.anti_crawl_rate, args.error_rate,
+                                      args.latency, args.jitter, args.page_padding, client_rate=args.client_rate)
+            rows.extend(bench_proxy_scaling(limited, workdir, args.proxy_ids, args.proxies, args.concurrency))
+        if args.shard_workers > 0:
+            # 不产生反爬和错误，每个编号只应有一条结果、一次请求
+            clean = StandInBehavior(args.meta_refresh_rate, 0.0, 0.0, args.latency, args.jitter, args.page_padding)
+            rows.append(bench_shard_workers(clean, workdir, args.ids, args.shard_workers))
+
+    report = {
+        "version": git_version(),
+        "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "python": sys.version.split()[0],
+        "parameters": vars(args),
+        "server_requests": server_requests,
+        "results": rows,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"基准结果已保存: {args.output}")
+
+    failed = any(row.get("exactly_once") is False for row in rows)
+    if args.baseline:
+        return 1 if compare_with_baseline(rows, args.baseline) or failed else 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
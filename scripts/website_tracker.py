@@ -7,18 +7,62 @@
 日期：2025-08-28
 """
 
-import requests
 import time
 import random
 import os
+import re
 import json
 import sys
+import html
+import gzip
+import queue
+import atexit
+import shutil
+import hashlib
+import heapq
+import bisect
+import signal
+import socket
 import logging
+import sqlite3
+import argparse
+import threading
+import importlib
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 from datetime import datetime
-from urllib.parse import urlparse
-from typing import Dict, List, Tuple, Optional
+from urllib.parse import urlparse, urljoin
+from typing import Callable, Dict, List, Tuple, Optional, Iterator, Iterable
+from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from bs4 import BeautifulSoup
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python 3.10 及更早版本
+    import sre_parse
+
+
+class LazyModule:
+    """首次访问属性时才导入的模块：不发网络请求的命令行路径不必付出 requests/urllib3 的导入开销"""
+    
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+    
+    def load(self):
+        """导入并返回真实模块"""
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+    
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+
+requests = LazyModule("requests")
+urllib3_connection = LazyModule("urllib3.util.connection")
+http_server = LazyModule("http.server")
+cookiejar = LazyModule("http.cookiejar")
 
 
 @dataclass
@@ -36,6 +80,73 @@ class TrackerConfig:
     retry_delay: int
     anti_crawl_wait_min: int
     anti_crawl_wait_max: int
+    concurrency: int = 1
+    host_rate: float = 0.0
+    host_burst: int = 1
+    pool_connections: int = 10
+    pool_maxsize: int = 10
+    pool_block: bool = False
+    keep_alive: bool = True
+    meta_refresh_max_bytes: int = 65536
+    results_backend: str = "text"
+    results_db: str = "website_results.db"
+    export_text: bool = True
+    store_batch_size: int = 50
+    response_cache_file: str = "redirect_cache.json"
+    response_cache_ttl: int = 0
+    response_cache_max_entries: int = 10000
+    schedule_mode: str = "linear"
+    schedule_file: str = "revisit_schedule.json"
+    sweep_budget: int = 0
+    revisit_min_interval: int = 3600
+    revisit_max_interval: int = 604800
+    shard_dir: str = "shards"
+    shard_size: int = 100
+    lease_ttl: int = 120
+    worker_id: str = ""
+    progress_journal: str = "tracker_progress.journal"
+    journal_fsync_batch: int = 20
+    journal_fsync_interval: float = 1.0
+    journal_compact_every: int = 1000
+    adaptive_rate: bool = False
+    rate_state_file: str = "rate_state.json"
+    aimd_min_rate: float = 0.02
+    aimd_max_rate: float = 2.0
+    aimd_increase: float = 0.005
+    aimd_decrease: float = 0.5
+    aimd_timeout_threshold: float = 0.2
+    metrics_file: str = "tracker_metrics.prom"
+    metrics_port: int = 0
+    log_format: str = "json"
+    log_max_bytes: int = 10485760
+    log_backup_count: int = 5
+    log_rotate_when: str = ""
+    log_compress: bool = True
+    anti_crawl_log_file: str = "anti_crawl_urls.log"
+    follow_redirects: bool = False
+    max_hops: int = 5
+    hop_cache_ttl: int = 3600
+    hop_cache_max_entries: int = 10000
+    dns_cache_ttl: int = 300
+    dns_overrides: Optional[Dict[str, str]] = None
+    warm_up: bool = True
+    anti_crawl_rules_file: str = "anti_crawl_rules.txt"
+    anti_crawl_rules_check_interval: float = 5.0
+    title_cache_file: str = "title_cache.json"
+    title_max_bytes: int = 16384
+    title_rate: float = 0.5
+    title_queue_size: int = 1000
+    targets: Optional[List[Dict]] = None
+    history_db: str = "redirect_history.db"
+    daemon_interval: int = 3600
+    proxies: Optional[List] = None
+    proxy_rate: float = 0.0
+    proxy_cooldown: float = 30.0
+    notify_sinks: Optional[List[str]] = None
+    notify_batch_size: int = 50
+    notify_batch_interval: float = 1.0
+    notify_queue_size: int = 1000
+    notify_max_retries: int = 3
 
 
 @dataclass
@@ -47,6 +158,7 @@ class ProcessResult:
     redirect_url: str
     status: str
     message: Optional[str] = None
+    redirect_chain: Optional[List[str]] = None
 
 
 class ConfigManager:
@@ -64,278 +176,3071 @@ class ConfigManager:
         "max_retries": 3,
         "retry_delay": 60,
         "anti_crawl_wait_min": 120,
-        "anti_crawl_wait_max": 300
+        "anti_crawl_wait_max": 300,
+        "concurrency": 1,
+        "host_rate": 0.0,
+        "host_burst": 1,
+        "pool_connections": 10,
+        "pool_maxsize": 10,
+        "pool_block": False,
+        "keep_alive": True,
+        "meta_refresh_max_bytes": 65536,
+        "results_backend": "text",
+        "results_db": "website_results.db",
+        "export_text": True,
+        "store_batch_size": 50,
+        "response_cache_file": "redirect_cache.json",
+        "response_cache_ttl": 0,
+        "response_cache_max_entries": 10000,
+        "schedule_mode": "linear",
+        "schedule_file": "revisit_schedule.json",
+        "sweep_budget": 0,
+        "revisit_min_interval": 3600,
+        "revisit_max_interval": 604800,
+        "shard_dir": "shards",
+        "shard_size": 100,
+        "lease_ttl": 120,
+        "worker_id": "",
+        "progress_journal": "tracker_progress.journal",
+        "journal_fsync_batch": 20,
+        "journal_fsync_interval": 1.0,
+        "journal_compact_every": 1000,
+        "adaptive_rate": False,
+        "rate_state_file": "rate_state.json",
+        "aimd_min_rate": 0.02,
+        "aimd_max_rate": 2.0,
+        "aimd_increase": 0.005,
+        "aimd_decrease": 0.5,
+        "aimd_timeout_threshold": 0.2,
+        "metrics_file": "tracker_metrics.prom",
+        "metrics_port": 0,
+        "log_format": "json",
+        "log_max_bytes": 10485760,
+        "log_backup_count": 5,
+        "log_rotate_when": "",
+        "log_compress": True,
+        "anti_crawl_log_file": "anti_crawl_urls.log",
+        "follow_redirects": False,
+        "max_hops": 5,
+        "hop_cache_ttl": 3600,
+        "hop_cache_max_entries": 10000,
+        "dns_cache_ttl": 300,
+        "dns_overrides": {},
+        "warm_up": True,
+        "anti_crawl_rules_file": "anti_crawl_rules.txt",
+        "anti_crawl_rules_check_interval": 5.0,
+        "title_cache_file": "title_cache.json",
+        "title_max_bytes": 16384,
+        "title_rate": 0.5,
+        "title_queue_size": 1000,
+        "targets": [],
+        "history_db": "redirect_history.db",
+        "daemon_interval": 3600,
+        "proxies": [],
+        "proxy_rate": 0.0,
+        "proxy_cooldown": 30.0,
+        "notify_sinks": [],
+        "notify_batch_size": 50,
+        "notify_batch_interval": 1.0,
+        "notify_queue_size": 1000,
+        "notify_max_retries": 3
     }
     
+    @staticmethod
+    def resolve_path(config_path: str = "config.json") -> str:
+        """配置文件的完整路径，相对路径相对于脚本所在目录"""
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        return os.path.join(script_dir, config_path)
+    
+    @staticmethod
+    def read_config(config_path: str = "config.json") -> TrackerConfig:
+        """读取配置文件，文件缺失或内容无效时抛出异常"""
+        with open(ConfigManager.resolve_path(config_path), "r", encoding="utf-8") as f:
+            config_data = json.load(f)
+        
+        # 限制某些参数的最大值以确保安全
+        config_data["max_retries"] = min(config_data.get("max_retries", 3), 3)
+        config_data["retry_delay"] = min(config_data.get("retry_delay", 20), 30)
+        config_data["anti_crawl_wait_min"] = min(config_data.get("anti_crawl_wait_min", 15), 15)
+        config_data["anti_crawl_wait_max"] = min(config_data.get("anti_crawl_wait_max", 30), 30)
+        config_data["concurrency"] = max(int(config_data.get("concurrency", 1)), 1)
+        
+        return TrackerConfig(**config_data)
+    
     @staticmethod
     def load_config(config_path: str = "config.json") -> TrackerConfig:
         """加载配置文件"""
         try:
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            full_path = os.path.join(script_dir, config_path)
-            
-            with open(full_path, "r", encoding="utf-8") as f:
-                config_data = json.load(f)
-            
-            # 限制某些参数的最大值以确保安全
-            config_data["max_retries"] = min(config_data.get("max_retries", 3), 3)
-            config_data["retry_delay"] = min(config_data.get("retry_delay", 20), 30)
-            config_data["anti_crawl_wait_min"] = min(config_data.get("anti_crawl_wait_min", 15), 15)
-            config_data["anti_crawl_wait_max"] = min(config_data.get("anti_crawl_wait_max", 30), 30)
-            
-            return TrackerConfig(**config_data)
-            
+            return ConfigManager.read_config(config_path)
         except Exception as e:
-            logging.warning(f"无法加载配置文件: {e}，使用默认配置")
+            logging.warning("无法加载配置文件: %s，使用默认配置", e)
             return TrackerConfig(**ConfigManager.DEFAULT_CONFIG)
 
 
-class NetworkUtils:
-    """网络工具类"""
+class WorkTarget:
+    """追踪目标：基础URL加若干编号区间，按位置惰性生成工作项，内存只随区间数增长而与编号总数无关"""
     
-    USER_AGENTS = [
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0",
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15",
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36 Edg/92.0.902.55",
-        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36"
-    ]
+    DEFAULT_NAME = "shizu"  # 该名称的目标沿用原有的编号前缀、进度文件和分片目录
+    NAME_PATTERN = re.compile(r'[A-Za-z_][\w-]*[A-Za-z_-]|[A-Za-z_]')
+    ID_PATTERN = re.compile(r'(.*?)(\d+)$')
     
-    # 反爬机制检测规则
-    ANTI_CRAWL_PATTERNS = [
-        "v.qq.com/txp/iframe/player.html",  # 腾讯视频反爬
-        "mtvod.meituan.net/save-video",     # 美团视频反爬
-    ]
+    def __init__(self, name: str, base_url: str, ranges: Iterable[Tuple[int, int]], rate: float = 0.0,
+                 progress_file: str = "tracker_progress.json", journal_file: str = "tracker_progress.journal",
+                 shard_dir: str = "shards"):
+        self.name = name
+        self.base_url = base_url
+        self.rate = rate
+        self.progress_file = progress_file
+        self.journal_file = journal_file
+        self.shard_dir = shard_dir
+        
+        # 合并重叠或相邻的区间，记录每段的首尾编号和首个编号对应的序号
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.offsets: List[int] = []
+        count = 0
+        for start, end in sorted(ranges):
+            if end < start:
+                continue
+            if self.ends and start <= self.ends[-1] + 1:
+                if end > self.ends[-1]:
+                    count += end - self.ends[-1]
+                    self.ends[-1] = end
+                continue
+            self.starts.append(start)
+            self.ends.append(end)
+            self.offsets.append(count)
+            count += end - start + 1
+        self.count = count
+        # 位置从首个编号起连续编号；只有一个连续区间时位置就是编号，与旧进度文件兼容
+        self.first = self.starts[0] if self.starts else 0
+        self.last = self.first + count - 1
     
-    @staticmethod
-    def get_random_user_agent() -> str:
-        """获取随机用户代理"""
-        return random.choice(NetworkUtils.USER_AGENTS)
+    @classmethod
+    def from_spec(cls, config: TrackerConfig, spec: Dict) -> "WorkTarget":
+        """根据 targets 中的一项创建目标；ranges 为闭区间列表，ids 为零散编号"""
+        name = spec.get("name") or cls.DEFAULT_NAME
+        if not cls.NAME_PATTERN.fullmatch(name):
+            raise ValueError(f"追踪目标名称无效（只能包含字母、数字、下划线和连字符，且不能以数字开头或结尾）: {name}")
+        ranges = [(int(start), int(end)) for start, end in spec.get("ranges", [])]
+        ranges += [(int(index), int(index)) for index in spec.get("ids", [])]
+        
+        if name == cls.DEFAULT_NAME:
+            progress_file, journal_file, shard_dir = "tracker_progress.json", config.progress_journal, config.shard_dir
+        else:
+            root, ext = os.path.splitext(config.progress_journal)
+            progress_file = f"tracker_progress.{name}.json"
+            journal_file = f"{root}.{name}{ext}"
+            shard_dir = os.path.join(config.shard_dir, name)
+        return cls(name, spec.get("base_url", config.base_url), ranges, float(spec.get("rate", 0)),
+                   progress_file, journal_file, shard_dir)
+    
+    @classmethod
+    def all_from_config(cls, config: TrackerConfig) -> List["WorkTarget"]:
+        """按配置创建全部目标；未配置 targets 时由 base_url 和 min_index..max_index 组成单个目标"""
+        specs = config.targets or [{"name": cls.DEFAULT_NAME, "base_url": config.base_url,
+                                    "ranges": [[config.min_index, config.max_index]]}]
+        targets = []
+        for spec in specs:
+            target = cls.from_spec(config, spec)
+            if any(existing.name == target.name for existing in targets):
+                raise ValueError(f"追踪目标名称重复: {target.name}")
+            if not target.count:
+                logging.warning("追踪目标 %s 没有可处理的编号，跳过", target.name)
+                continue
+            targets.append(target)
+        return targets
+    
+    @classmethod
+    def split_id(cls, shizu_id: str) -> Tuple[str, str]:
+        """把结果编号拆成目标名称和编号"""
+        match = cls.ID_PATTERN.match(shizu_id)
+        return (match.group(1), match.group(2)) if match else (shizu_id, "")
+    
+    def id_at(self, position: int) -> int:
+        """位置对应的编号"""
+        ordinal = position - self.first
+        segment = bisect.bisect_right(self.offsets, ordinal) - 1
+        return self.starts[segment] + ordinal - self.offsets[segment]
+    
+    def position_of(self, number: int) -> Optional[int]:
+        """编号对应的位置，不在任何区间内时返回None"""
+        segment = bisect.bisect_right(self.starts, number) - 1
+        if segment < 0 or number > self.ends[segment]:
+            return None
+        return self.first + self.offsets[segment] + number - self.starts[segment]
+    
+    def segments(self) -> List[List[int]]:
+        """合并后的编号区间，随进度文件保存，用于识别区间被修改"""
+        return [[start, end] for start, end in zip(self.starts, self.ends)]
+    
+    def url(self, position: int) -> str:
+        """位置对应的探测URL"""
+        return f"{self.base_url}{self.id_at(position)}"
+    
+    def shizu_id(self, position: int) -> str:
+        """位置对应的结果编号，由目标名称加编号组成"""
+        return f"{self.name}{self.id_at(position)}"
+    
+    def positions(self, start: Optional[int] = None) -> Iterator[int]:
+        """从指定位置起惰性列出位置"""
+        return iter(range(self.first if start is None else max(start, self.first), self.last + 1))
+
+
+class MetricsRegistry:
+    """进程内指标：计数器、直方图和仪表，以Prometheus文本格式导出"""
+    
+    LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                       1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+    # 不是耗时的直方图各自指定桶边界
+    HISTOGRAM_BUCKETS = {
+        "tracker_redirect_hops": (0, 1, 2, 3, 5, 10),
+    }
+    
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Tuple], float] = {}
+        self.gauges: Dict[Tuple[str, Tuple], float] = {}
+        self.histograms: Dict[Tuple[str, Tuple], List] = {}
+        self.lock = threading.Lock()
+        self.server: Optional["http_server.ThreadingHTTPServer"] = None
+    
+    def inc(self, name: str, value: float = 1.0, **labels):
+        """计数器累加"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+    
+    def set_gauge(self, name: str, value: float, **labels):
+        """设置仪表值"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.gauges[key] = value
+    
+    def observe(self, name: str, value: float, **labels):
+        """记录一次直方图观测值"""
+        key = (name, tuple(sorted(labels.items())))
+        buckets = self.HISTOGRAM_BUCKETS.get(name, self.LATENCY_BUCKETS)
+        slot = bisect.bisect_left(buckets, value)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                # [各桶计数..., +Inf计数, 总和]
+                histogram = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            histogram[slot] += 1
+            histogram[-1] += value
+    
+    def timer(self, name: str, **labels) -> "MetricsTimer":
+        """用于 with 语句的计时器"""
+        return MetricsTimer(self, name, labels)
     
     @staticmethod
-    def is_anti_crawl_url(url: str) -> bool:
-        """检测是否为反爬机制URL"""
-        if not url:
-            return False
+    def _format_labels(labels: Tuple, extra: str = "") -> str:
+        """格式化标签"""
+        parts = [f'{key}="{value}"' for key, value in labels]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+    
+    def render(self) -> str:
+        """生成Prometheus文本格式"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted((key, list(values)) for key, values in self.histograms.items())
         
-        for pattern in NetworkUtils.ANTI_CRAWL_PATTERNS:
-            if pattern in url:
-                logging.info(f"匹配到反爬模式: {pattern} -> {url}")
-                return True
-        return False
+        lines = []
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                lines.append(f"# TYPE {name} counter")
+                declared.add(name)
+            lines.append(f"{name}{self._format_labels(labels)} {value}")
+        for (name, labels), value in gauges:
+            if name not in declared:
+                lines.append(f"# TYPE {name} gauge")
+                declared.add(name)
+            lines.append(f"{name}{self._format_labels(labels)} {value}")
+        for (name, labels), values in histograms:
+            if name not in declared:
+                lines.append(f"# TYPE {name} histogram")
+                declared.add(name)
+            cumulative = 0
+            bounds = [str(bound) for bound in self.HISTOGRAM_BUCKETS.get(name, self.LATENCY_BUCKETS)] + ["+Inf"]
+            for bound, count in zip(bounds, values):
+                cumulative += count
+                bucket_labels = self._format_labels(labels, 'le="' + bound + '"')
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{self._format_labels(labels)} {values[-1]}")
+            lines.append(f"{name}_count{self._format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
     
-    @staticmethod
-    def log_anti_crawl_url(url: str):
-        """记录反爬URL到单独的日志文件"""
+    def write_textfile(self, filepath: str):
+        """原子写入指标文本文件"""
+        if not filepath:
+            return
+        temp_file = f"{filepath}.{os.getpid()}.tmp"
         try:
-            with open("anti_crawl_urls.log", "a", encoding="utf-8") as f:
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                f.write(f"{timestamp} - {url}\n")
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(self.render())
+            os.replace(temp_file, filepath)
         except Exception as e:
-            logging.error(f"记录反爬URL时出错: {e}")
+            logging.error("写入指标文件时出错: %s", e)
+    
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """在后台线程提供 /metrics 接口"""
+        if self.server is not None:
+            return
+        registry = self
+        
+        class MetricsHandler(http_server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render().encode("utf-8")
+                self.send_response(200 if self.path.startswith("/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = http_server.ThreadingHTTPServer((host, port), MetricsHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        logging.info("指标接口已启动: http://%s:%s/metrics", host, port)
+
+
+class MetricsTimer:
+    """计时上下文，退出时把耗时记入直方图"""
+    
+    __slots__ = ("registry", "name", "labels", "start")
+    
+    def __init__(self, registry: MetricsRegistry, name: str, labels: Dict):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+    
+    def __enter__(self) -> "MetricsTimer":
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+# 进程内共享的指标注册表
+METRICS = MetricsRegistry()
+
+
+class JsonLogFormatter(logging.Formatter):
+    """把日志记录格式化为单行JSON事件，附带调用方通过 extra={"fields": ...} 传入的结构化字段"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            "ts": self.formatTime(record, "%Y-%m-%d %H:%M:%S"),
+            "level": record.levelname,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            event.update(fields)
+        if record.exc_info:
+            event["exc"] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """只把记录放入队列，消息格式化推迟到后台线程"""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class LogPipeline:
+    """后台日志管道：调用方只把记录放入队列，格式化、写文件、轮转和压缩都在后台线程完成"""
+    
+    ANTI_CRAWL_LOGGER = "website_tracker.anti_crawl"
+    
+    listener: Optional[QueueListener] = None
+    queue_handler: Optional[DeferredQueueHandler] = None
+    _lock = threading.Lock()
+    _atexit_registered = False
     
     @staticmethod
-    def get_redirect_url(url: str) -> Optional[str]:
-        """获取URL重定向后的最终URL"""
-        try:
-            headers = {
-                "User-Agent": NetworkUtils.get_random_user_agent(),
-                "Referer": "http://tians.06kd.mlkj888.cn/",
-            }
+    def _gzip_rotator(source: str, dest: str):
+        """轮转时把旧日志压缩为 .gz"""
+        with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+    
+    @staticmethod
+    def _file_handler(filepath: str, config: TrackerConfig, formatter: logging.Formatter) -> logging.Handler:
+        """创建按大小或按时间轮转的文件处理器"""
+        if config.log_rotate_when:
+            handler = TimedRotatingFileHandler(filepath, when=config.log_rotate_when,
+                                               backupCount=config.log_backup_count, encoding='utf-8')
+        else:
+            handler = RotatingFileHandler(filepath, maxBytes=config.log_max_bytes,
+                                          backupCount=config.log_backup_count, encoding='utf-8')
+        if config.log_compress:
+            handler.namer = lambda name: name + ".gz"
+            handler.rotator = LogPipeline._gzip_rotator
+        handler.setFormatter(formatter)
+        return handler
+    
+    @classmethod
+    def start(cls, config: TrackerConfig):
+        """启动日志管道；根日志已由外部程序配置时保持原样"""
+        with cls._lock:
+            root = logging.getLogger()
+            if any(handler is not cls.queue_handler for handler in root.handlers):
+                return
+            cls._stop_locked()
             
-            response = requests.get(url, headers=headers, allow_redirects=False, timeout=10)
+            text_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+            file_formatter = JsonLogFormatter() if config.log_format == "json" else text_formatter
+            is_anti_crawl = lambda record: record.name == LogPipeline.ANTI_CRAWL_LOGGER
             
-            # 处理HTTP重定向
-            if 300 <= response.status_code < 400:
-                redirect_url = response.headers.get('Location')
-                logging.info(f"重定向URL: {redirect_url}")
-                
-                # 检查反爬机制
-                if NetworkUtils.is_anti_crawl_url(redirect_url):
-                    NetworkUtils.log_anti_crawl_url(redirect_url)
-                    logging.warning(f"检测到反爬机制！跳转到: {redirect_url}")
-                    return "ANTI_CRAWL_DETECTED"
-                
-                # 处理相对URL
-                if redirect_url and not redirect_url.startswith('http'):
-                    parsed_url = urlparse(url)
-                    base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-                    redirect_url = base_url + redirect_url
-                
-                return redirect_url
+            console = logging.StreamHandler()
+            console.setFormatter(text_formatter)
+            console.addFilter(lambda record: not is_anti_crawl(record))
+            main_file = cls._file_handler(config.log_file, config, file_formatter)
+            main_file.addFilter(lambda record: not is_anti_crawl(record))
+            # 反爬URL日志保持原有的"时间 - URL"格式，通过同一队列写入常驻句柄
+            anti_crawl_file = cls._file_handler(config.anti_crawl_log_file, config,
+                                                logging.Formatter('%(asctime)s - %(message)s', '%Y-%m-%d %H:%M:%S'))
+            anti_crawl_file.addFilter(is_anti_crawl)
             
-            # 处理Meta刷新重定向
-            redirect_url = NetworkUtils._parse_meta_refresh(response.text)
-            if redirect_url:
-                logging.info(f"Meta刷新重定向: {redirect_url}")
-                if not redirect_url.startswith('http'):
-                    parsed_url = urlparse(url)
-                    base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-                    redirect_url = base_url + redirect_url
-                return redirect_url
+            log_queue = queue.SimpleQueue()
+            cls.listener = QueueListener(log_queue, console, main_file, anti_crawl_file)
+            cls.listener.start()
+            cls.queue_handler = DeferredQueueHandler(log_queue)
+            root.addHandler(cls.queue_handler)
+            root.setLevel(logging.INFO)
             
-            logging.info(f"没有找到重定向，状态码: {response.status_code}")
-            return url
+            if not cls._atexit_registered:
+                atexit.register(cls.stop)
+                cls._atexit_registered = True
+    
+    @classmethod
+    def stop(cls):
+        """写完队列中剩余的记录并关闭文件"""
+        with cls._lock:
+            cls._stop_locked()
+    
+    @classmethod
+    def _stop_locked(cls):
+        """移除队列处理器并停止后台线程（调用方持有锁）"""
+        if cls.queue_handler is not None:
+            logging.getLogger().removeHandler(cls.queue_handler)
+            cls.queue_handler = None
+        if cls.listener is not None:
+            cls.listener.stop()
+            for handler in cls.listener.handlers:
+                handler.close()
+            cls.listener = None
+    
+    @classmethod
+    def is_running(cls) -> bool:
+        """管道是否已启动"""
+        return cls.listener is not None
+
+
+class TokenBucket:
+    """令牌桶限速器"""
+    
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        self.waiting = 0
+        self.lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        """按流逝时间补充令牌（暂停期间不补充）"""
+        if now <= self.last_refill:
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+    
+    def acquire(self, stop_event: Optional[threading.Event] = None) -> bool:
+        """获取一个令牌，必要时阻塞等待；被 stop_event 中断时返回False"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return True
+                    wait_time = (1 - self.tokens) / self.rate
+                else:
+                    wait_time = self.paused_until - now
+                self.waiting += 1
             
-        except Exception as e:
-            logging.error(f"获取重定向URL时出错: {e}")
+            try:
+                if stop_event is None:
+                    time.sleep(wait_time)
+                elif stop_event.wait(wait_time):
+                    return False
+            finally:
+                with self.lock:
+                    self.waiting -= 1
+    
+    def try_acquire(self) -> bool:
+        """低优先级获取：只有没有线程在排队且有空闲令牌时才取走一个，从不阻塞"""
+        with self.lock:
+            now = time.monotonic()
+            if self.waiting or now < self.paused_until:
+                return False
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+    
+    def reserve(self) -> float:
+        """非阻塞获取：取到令牌时返回0，否则返回距下一个令牌可用的秒数"""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+    
+    def pause(self, seconds: float):
+        """暂停发放令牌（用于反爬退避），暂停结束后令牌从零开始累积"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self.last_refill = self.paused_until
+
+
+class HostRateLimiter:
+    """按目标主机分别限速的令牌桶集合"""
+    
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+    
+    def _bucket(self, url: str) -> TokenBucket:
+        """获取URL所属主机的令牌桶"""
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets[host]
+    
+    def acquire(self, url: str, stop_event: Optional[threading.Event] = None) -> bool:
+        """为指定URL获取一次请求配额"""
+        return self._bucket(url).acquire(stop_event)
+    
+    def try_acquire(self, url: str) -> bool:
+        """为低优先级请求尝试获取配额，不与正常请求争抢"""
+        return self._bucket(url).try_acquire()
+    
+    def reserve(self, url: str) -> float:
+        """非阻塞获取指定URL的配额，返回还需等待的秒数（0表示已取到）"""
+        return self._bucket(url).reserve()
+    
+    def pause(self, url: str, seconds: float):
+        """暂停指定URL所属主机的全部请求"""
+        self._bucket(url).pause(seconds)
+    
+    def set_rate(self, rate: float):
+        """调整所有主机的令牌补充速率"""
+        with self.lock:
+            self.rate = rate
+            buckets = list(self.buckets.values())
+        for bucket in buckets:
+            with bucket.lock:
+                bucket._refill(time.monotonic())
+                bucket.rate = rate
+
+
+class EgressProxy:
+    """一个出口：独立的按主机配额、健康分、反爬命中统计和冷却时间"""
+    
+    DIRECT = "direct"
+    
+    def __init__(self, name: str, url: str, rate: float, fixed_rate: bool = False, burst: int = 1):
+        self.name = name
+        self.url = url
+        self.fixed_rate = fixed_rate
+        self.limiter = HostRateLimiter(rate, burst)
+        self.health = 1.0
+        self.requests = 0
+        self.anti_crawl_hits = 0
+        self.failures = 0
+        self.consecutive_anti_crawl = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+    
+    @property
+    def proxies(self) -> Optional[Dict[str, str]]:
+        """传给 requests 的代理参数，直连出口为None"""
+        if self.url == self.DIRECT:
+            return None
+        return {"http": self.url, "https": self.url}
+
+
+class ProxyPool:
+    """出口代理池：每次探测选择健康分最高且仍有配额的出口，触发反爬的出口单独冷却，不影响其他出口"""
+    
+    HEALTH_DECAY = 0.8  # 健康分的指数滑动平均系数
+    FAILURE_COOLDOWN_AFTER = 3  # 连续请求失败多少次后冷却出口
+    MAX_COOLDOWN_FACTOR = 8  # 连续触发反爬时冷却时间倍增的上限
+    
+    def __init__(self, proxies: List[EgressProxy], cooldown: float = 30.0):
+        self.proxies = proxies
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config: TrackerConfig, default_rate: float) -> Optional["ProxyPool"]:
+        """根据配置创建，未配置 proxies 时不启用；每项可以是代理URL、"direct"，或含 url/name/rate 的字典"""
+        if not config.proxies:
+            return None
+        proxies = []
+        for spec in config.proxies:
+            if isinstance(spec, str):
+                spec = {"url": spec}
+            url = spec["url"]
+            name = spec.get("name") or (url if url == EgressProxy.DIRECT else urlparse(url).netloc)
+            if any(existing.name == name for existing in proxies):
+                raise ValueError(f"出口代理名称重复: {name}")
+            rate = spec.get("rate") or config.proxy_rate
+            proxies.append(EgressProxy(name, url, rate or default_rate, fixed_rate=bool(rate),
+                                       burst=config.host_burst))
+        return cls(proxies, config.proxy_cooldown)
+    
+    def acquire(self, url: str, stop_event: Optional[threading.Event] = None) -> Optional[EgressProxy]:
+        """为URL选择出口并占用一次配额，所有出口都在冷却或没有配额时等待；被 stop_event 中断时返回None"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                wait_time = None
+                ready = []
+                for proxy in self.proxies:
+                    if proxy.cooldown_until > now:
+                        remaining = proxy.cooldown_until - now
+                        wait_time = remaining if wait_time is None else min(wait_time, remaining)
+                    else:
+                        ready.append(proxy)
+                for proxy in sorted(ready, key=lambda proxy: (-proxy.health, proxy.in_flight)):
+                    proxy_wait = proxy.limiter.reserve(url)
+                    if proxy_wait <= 0:
+                        proxy.in_flight += 1
+                        proxy.requests += 1
+                        return proxy
+                    wait_time = proxy_wait if wait_time is None else min(wait_time, proxy_wait)
+            
+            wait_time = min(wait_time, 30.0)
+            if stop_event is None:
+                time.sleep(wait_time)
+            elif stop_event.wait(wait_time):
+                return None
+    
+    def report(self, proxy: EgressProxy, outcome: str):
+        """记录一次探测结果：更新健康分，触发反爬或连续失败时冷却该出口"""
+        healthy = outcome not in ("anti_crawl", "timeout", "error")
+        cooldown = 0.0
+        with self.lock:
+            proxy.in_flight -= 1
+            proxy.health = proxy.health * self.HEALTH_DECAY + (1 - self.HEALTH_DECAY) * (1.0 if healthy else 0.0)
+            if outcome == "anti_crawl":
+                proxy.anti_crawl_hits += 1
+                proxy.consecutive_anti_crawl += 1
+                cooldown = self.cooldown * min(2 ** (proxy.consecutive_anti_crawl - 1), self.MAX_COOLDOWN_FACTOR)
+            elif healthy:
+                proxy.consecutive_anti_crawl = 0
+                proxy.consecutive_failures = 0
+            else:
+                proxy.failures += 1
+                proxy.consecutive_failures += 1
+                if proxy.consecutive_failures >= self.FAILURE_COOLDOWN_AFTER:
+                    cooldown = self.cooldown
+            if cooldown:
+                proxy.cooldown_until = max(proxy.cooldown_until, time.monotonic() + cooldown)
+            health = proxy.health
+        
+        METRICS.inc("tracker_proxy_requests_total", proxy=proxy.name, outcome=outcome)
+        METRICS.set_gauge("tracker_proxy_health", health, proxy=proxy.name)
+        if cooldown:
+            METRICS.inc("tracker_proxy_cooldowns_total", proxy=proxy.name)
+            logging.warning("出口 %s 冷却 %.1f 秒（%s）", proxy.name, cooldown,
+                            "触发反爬" if outcome == "anti_crawl" else "连续请求失败")
+    
+    def set_rate(self, rate: float):
+        """调整未单独配置速率的出口的每主机速率"""
+        for proxy in self.proxies:
+            if not proxy.fixed_rate:
+                proxy.limiter.set_rate(rate)
+    
+    def stats(self) -> List[Dict]:
+        """各出口的统计"""
+        with self.lock:
+            return [{"name": proxy.name, "requests": proxy.requests, "anti_crawl_hits": proxy.anti_crawl_hits,
+                     "failures": proxy.failures, "health": proxy.health} for proxy in self.proxies]
+
+
+class RetryQueue:
+    """按下次可重试时间排序的延迟重试队列：失败的编号移出主流程，到期后再混入处理"""
+    
+    def __init__(self, limit: int = 1000):
+        self.limit = max(limit, 1)
+        self.heap: List[Tuple[float, int, int]] = []
+        self.counter = 0
+    
+    def __len__(self) -> int:
+        return len(self.heap)
+    
+    def is_full(self) -> bool:
+        """队列已满时暂停领取新编号，先消化到期的重试"""
+        return len(self.heap) >= self.limit
+    
+    def push(self, index: int, delay: float):
+        """把编号推迟 delay 秒后再重试"""
+        heapq.heappush(self.heap, (time.monotonic() + delay, self.counter, index))
+        self.counter += 1
+        METRICS.inc("tracker_deferred_retries_total")
+        METRICS.set_gauge("tracker_retry_queue_size", len(self.heap))
+    
+    def pop_ready(self) -> Optional[int]:
+        """取出一个已到期的编号，没有时返回None"""
+        if not self.heap or self.heap[0][0] > time.monotonic():
+            return None
+        index = heapq.heappop(self.heap)[2]
+        METRICS.set_gauge("tracker_retry_queue_size", len(self.heap))
+        return index
+    
+    def wait_time(self) -> float:
+        """距最早一个编号到期的秒数"""
+        return max(self.heap[0][0] - time.monotonic(), 0.0) if self.heap else 0.0
+
+
+class AIMDController:
+    """加性增、乘性减的速率/并发控制器：探测成功时缓慢提速，触发反爬或超时增多时成倍降速"""
+    
+    MIN_RATE_FLOOR = 0.001  # 速率下限不能为0，否则降速间隔和令牌桶等待时间无法计算
+    
+    def __init__(self, initial_rate: float, max_concurrency: int, min_rate: float, max_rate: float,
+                 increase: float, decrease: float, timeout_threshold: float,
+                 state_file: Optional[str] = None):
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.timeout_threshold = timeout_threshold
+        self.max_concurrency = max(max_concurrency, 1)
+        self.state_file = state_file
+        
+        state = FileManager.load_json(state_file) if state_file else None
+        self.rate = min(max((state or {}).get("rate", initial_rate), self.min_rate), self.max_rate)
+        self.concurrency = min(max((state or {}).get("concurrency", 1.0), 1.0), float(self.max_concurrency))
+        if state:
+            logging.info("已加载上次学习到的安全速率: %.3f 请求/秒，并发 %s", self.rate, int(self.concurrency))
+        
+        self.probes = 0
+        self.anti_crawl_hits = 0
+        self.timeouts = 0
+        self.timeout_ratio = 0.0
+        self.last_cut = 0.0
+        self.lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config: TrackerConfig, initial_rate: float) -> "AIMDController":
+        """根据配置创建控制器，速率下限不大于0时按 MIN_RATE_FLOOR 处理"""
+        min_rate = config.aimd_min_rate
+        if min_rate < cls.MIN_RATE_FLOOR:
+            logging.warning("aimd_min_rate 必须大于0，已调整为 %s", cls.MIN_RATE_FLOOR)
+            min_rate = cls.MIN_RATE_FLOOR
+        return cls(initial_rate, config.concurrency, min_rate, config.aimd_max_rate,
+                   config.aimd_increase, config.aimd_decrease, config.aimd_timeout_threshold,
+                   config.rate_state_file)
+    
+    def _cut(self, reason: str):
+        """乘性降速；同一批在途请求引发的连续信号只降一次"""
+        now = time.monotonic()
+        if now - self.last_cut < 1.0 / self.rate:
+            return
+        self.last_cut = now
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self.concurrency = max(1.0, self.concurrency * self.decrease)
+        logging.warning("%s，降速至 %.3f 请求/秒，并发 %s", reason, self.rate, int(self.concurrency))
+    
+    def _observe_timeout(self, timed_out: bool):
+        """更新超时比例的滑动平均"""
+        self.timeout_ratio = self.timeout_ratio * 0.9 + (0.1 if timed_out else 0.0)
+    
+    def on_success(self):
+        """探测成功：加性提速"""
+        with self.lock:
+            self.probes += 1
+            self._observe_timeout(False)
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            self.concurrency = min(float(self.max_concurrency), self.concurrency + 1.0 / self.concurrency)
+    
+    def on_anti_crawl(self):
+        """触发反爬：乘性降速"""
+        with self.lock:
+            self.probes += 1
+            self.anti_crawl_hits += 1
+            self._observe_timeout(False)
+            self._cut("检测到反爬")
+    
+    def on_failure(self, timed_out: bool):
+        """探测失败：超时比例超过阈值时乘性降速"""
+        with self.lock:
+            self.probes += 1
+            if timed_out:
+                self.timeouts += 1
+            self._observe_timeout(timed_out)
+            if self.timeout_ratio > self.timeout_threshold:
+                self._cut(f"超时比例升至 {self.timeout_ratio:.2f}")
+    
+    def concurrency_limit(self) -> int:
+        """当前允许的在途请求数"""
+        return int(self.concurrency)
+    
+    def stats(self) -> Dict[str, float]:
+        """当前速率及反爬命中率"""
+        with self.lock:
+            return {
+                "rate": self.rate,
+                "concurrency": int(self.concurrency),
+                "probes": self.probes,
+                "anti_crawl_ratio": self.anti_crawl_hits / self.probes if self.probes else 0.0,
+                "timeout_ratio": self.timeout_ratio,
+            }
+    
+    def save(self):
+        """保存学习到的安全速率"""
+        if not self.state_file:
+            return
+        with self.lock:
+            data = {"rate": self.rate, "concurrency": self.concurrency,
+                    "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        FileManager.save_json_atomic(self.state_file, data)
+
+
+class DNSCache:
+    """进程内DNS缓存：按TTL缓存解析结果，解析函数可替换为本地桩解析器"""
+    
+    # 安装前urllib3原有的建连函数，首次使用时记录
+    _original_create_connection: Optional[Callable] = None
+    
+    def __init__(self, ttl: int = 300, resolver: Optional[Callable] = None):
+        self.ttl = ttl
+        self.resolver = resolver or socket.getaddrinfo
+        self.entries: Dict[Tuple, Tuple[List, float]] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.resolve_seconds = 0.0
+    
+    @classmethod
+    def from_config(cls, config: TrackerConfig) -> Optional["DNSCache"]:
+        """根据配置创建缓存，dns_cache_ttl为0时返回None"""
+        if config.dns_cache_ttl <= 0:
             return None
+        resolver = cls.static_resolver(config.dns_overrides) if config.dns_overrides else None
+        return cls(config.dns_cache_ttl, resolver)
     
     @staticmethod
-    def _parse_meta_refresh(html_content: str) -> Optional[str]:
-        """解析Meta刷新重定向"""
+    def static_resolver(overrides: Dict[str, str], fallback: Optional[Callable] = None) -> Callable:
+        """按固定的主机名到IP映射解析，未列出的主机交给fallback（默认系统解析）"""
+        fallback = fallback or socket.getaddrinfo
+        
+        def resolve(host, port, family=0, type=0, proto=0, flags=0):
+            return fallback(overrides.get(host, host), port, family, type, proto, flags)
+        return resolve
+    
+    def getaddrinfo(self, host: str, port: int, family: int = 0, type: int = 0,
+                    proto: int = 0, flags: int = 0) -> List:
+        """与 socket.getaddrinfo 相同的接口，TTL内直接返回缓存结果"""
+        key = (host, port, family, type, proto, flags)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() < entry[1]:
+                self.hits += 1
+                return entry[0]
+        
+        start = time.perf_counter()
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            meta_refresh = soup.find('meta', attrs={'http-equiv': lambda x: x and x.lower() == 'refresh'})
+            infos = self.resolver(host, port, family, type, proto, flags)
+        except socket.gaierror:
+            # 解析失败时沿用过期结果，避免解析器抖动直接变成请求失败
+            if entry is not None:
+                logging.warning("DNS解析 %s 失败，沿用过期的缓存结果", host)
+                return entry[0]
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            METRICS.observe("tracker_dns_resolve_seconds", elapsed)
+            with self.lock:
+                self.misses += 1
+                self.resolve_seconds += elapsed
+        
+        with self.lock:
+            self.entries[key] = (infos, time.monotonic() + self.ttl)
+        return infos
+    
+    def create_connection(self, address: Tuple[str, int], timeout=socket._GLOBAL_DEFAULT_TIMEOUT,
+                          source_address=None, socket_options=None) -> socket.socket:
+        """替代urllib3的建连函数：先查缓存得到IP，再逐个地址尝试连接"""
+        host, port = address
+        last_error: Optional[OSError] = None
+        for _, _, _, _, sockaddr in self.getaddrinfo(host, port, 0, socket.SOCK_STREAM):
+            try:
+                return DNSCache._original()((sockaddr[0], port), timeout, source_address, socket_options)
+            except OSError as e:
+                last_error = e
+        raise last_error or socket.gaierror(f"没有可用的地址: {host}")
+    
+    @staticmethod
+    def _original() -> Callable:
+        """urllib3原有的建连函数"""
+        if DNSCache._original_create_connection is None:
+            DNSCache._original_create_connection = urllib3_connection.create_connection
+        return DNSCache._original_create_connection
+    
+    def install(self):
+        """让后续新建的HTTP连接都经过本缓存解析"""
+        DNSCache._original()
+        urllib3_connection.load().create_connection = self.create_connection
+    
+    @staticmethod
+    def uninstall():
+        """恢复urllib3原有的建连函数；从未安装过时无需处理"""
+        if DNSCache._original_create_connection is not None:
+            urllib3_connection.load().create_connection = DNSCache._original_create_connection
+    
+    def stats(self) -> Dict[str, float]:
+        """返回解析次数、命中次数和累计解析耗时"""
+        with self.lock:
+            return {"lookups": self.misses, "hits": self.hits, "resolve_seconds": self.resolve_seconds}
+
+
+class SessionPool:
+    """共享的长连接HTTP会话池"""
+    
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10,
+                 pool_block: bool = False, keep_alive: bool = True):
+        self.keep_alive = keep_alive
+        self.session = requests.Session()
+        # 不在探测之间保留Cookie，保持与单次请求相同的行为
+        self.session.cookies.set_policy(cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                                pool_block=pool_block, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+    
+    @classmethod
+    def from_config(cls, config: TrackerConfig) -> "SessionPool":
+        """根据追踪器配置创建连接池"""
+        return cls(pool_connections=config.pool_connections,
+                   pool_maxsize=max(config.pool_maxsize, config.concurrency),
+                   pool_block=config.pool_block,
+                   keep_alive=config.keep_alive)
+    
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> "requests.Response":
+        """通过连接池发送GET请求"""
+        headers = dict(headers or {})
+        if not self.keep_alive:
+            headers["Connection"] = "close"
+        return self.session.get(url, headers=headers, **kwargs)
+    
+    def warm(self, url: str, connections: int) -> int:
+        """并发发送HEAD请求，提前为URL所在主机建立连接并留在连接池中，返回新建的连接数"""
+        if not self.keep_alive or connections <= 0:
+            return 0
+        before = self.stats()["new_connections"]
+        
+        def head(_):
+            try:
+                self.session.head(url, allow_redirects=False, timeout=10)
+                return None
+            except Exception as e:
+                return e
+        
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            errors = [error for error in executor.map(head, range(connections)) if error is not None]
+        if errors:
+            logging.warning("预热连接 %s 失败 %s 次: %s", url, len(errors), errors[0])
+        # 连接失败也计入连接池的新建数，只统计请求成功的部分
+        return min(self.stats()["new_connections"] - before, connections - len(errors))
+    
+    def stats(self) -> Dict[str, int]:
+        """统计新建连接数与复用连接数"""
+        requests_sent, new_connections = 0, 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                try:
+                    pool = pools[key]
+                except KeyError:
+                    continue
+                requests_sent += pool.num_requests
+                new_connections += pool.num_connections
+        return {
+            "requests": requests_sent,
+            "new_connections": new_connections,
+            "reused_connections": max(requests_sent - new_connections, 0),
+        }
+    
+    def close(self):
+        """关闭全部连接"""
+        self.session.close()
+
+
+class MetaRefreshScanner:
+    """增量扫描HTML字节流中的Meta刷新标签，找到目标或达到字节上限即停止"""
+    
+    # 属性值可能包含">"，按引号整体匹配
+    _TAG_BODY = rb"""(?:[^>"']|"[^"]*"|'[^']*')*>"""
+    # 按出现顺序识别注释开始、meta标签和原始文本元素（其内容不是标记）的开始标签
+    TOKEN_PATTERN = re.compile(rb"<!--|<meta\b" + _TAG_BODY + rb"|<(script|style|textarea|title)\b" + _TAG_BODY,
+                               re.IGNORECASE)
+    COMMENT_END_PATTERN = re.compile(rb"-->")
+    ATTR_PATTERN = re.compile(rb"""([^\s=/>]+)\s*(?:=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+)))?""")
+    REFRESH_URL_PATTERN = re.compile(r"url\s*=\s*(.*)", re.IGNORECASE | re.DOTALL)
+    MAX_TAG_BYTES = 4096
+    MAX_END_TAG_BYTES = 16  # 跨块保留的结束标记前缀长度，不短于最长的"</textarea"
+    
+    def __init__(self, max_bytes: Optional[int] = None, encoding: str = "utf-8"):
+        self.max_bytes = max_bytes
+        self.encoding = encoding
+        self.bytes_seen = 0
+        self.buffer = b""
+        self.skip_until: Optional["re.Pattern"] = None
+        self.done = False
+        self.result: Optional[str] = None
+    
+    def feed(self, chunk: bytes) -> bool:
+        """输入一段数据，返回是否已可停止读取；注释和script/style/textarea/title内容中的标签一律跳过"""
+        if self.done:
+            return True
+        self.bytes_seen += len(chunk)
+        self.buffer += chunk
+        
+        position = 0
+        while True:
+            if self.skip_until is not None:
+                skip_end = self.skip_until.search(self.buffer, position)
+                if skip_end is None:
+                    # 注释或原始文本尚未结束，只保留可能是半个结束标记的末尾几个字节
+                    self.buffer = self.buffer[max(position, len(self.buffer) - self.MAX_END_TAG_BYTES):]
+                    break
+                position = skip_end.end()
+                self.skip_until = None
             
-            if meta_refresh and 'content' in meta_refresh.attrs:
-                content = meta_refresh['content']
-                if 'url=' in content.lower():
-                    return content.split('url=', 1)[1].strip()
-        except Exception:
-            pass
-        return None
+            match = self.TOKEN_PATTERN.search(self.buffer, position)
+            if match is None:
+                # 其后已没有完整标签，只保留末尾可能是未闭合标签的部分，使缓冲区大小与标签长度相关而非页面大小
+                tail_start = self.buffer.find(b"<", max(position, len(self.buffer) - self.MAX_TAG_BYTES))
+                self.buffer = self.buffer[tail_start:] if tail_start != -1 else b""
+                break
+            
+            position = match.end()
+            if match.group(0) == b"<!--":
+                self.skip_until = self.COMMENT_END_PATTERN
+            elif match.group(1):
+                self.skip_until = re.compile(rb"</" + match.group(1) + rb"\b", re.IGNORECASE)
+            else:
+                target = self._parse_meta_tag(match.group(0))
+                if target is not None:
+                    self.result = target
+                    self.done = True
+                    return True
+        
+        if self.max_bytes is not None and self.bytes_seen >= self.max_bytes:
+            self.done = True
+        return self.done
+    
+    def _parse_meta_tag(self, tag: bytes) -> Optional[str]:
+        """解析单个meta标签，若为刷新跳转则返回目标URL"""
+        attrs = {}
+        for match in self.ATTR_PATTERN.finditer(tag, 5, len(tag) - 1):
+            value = match.group(2) if match.group(2) is not None else (
+                match.group(3) if match.group(3) is not None else match.group(4))
+            attrs.setdefault(match.group(1).lower(), value or b"")
+        
+        http_equiv = attrs.get(b"http-equiv", b"")
+        if http_equiv.strip().lower() != b"refresh" or b"content" not in attrs:
+            return None
+        content = html.unescape(attrs[b"content"].decode(self.encoding, errors="replace"))
+        url_match = self.REFRESH_URL_PATTERN.search(content)
+        if not url_match:
+            return None
+        target = url_match.group(1).strip().strip("\"'").strip()
+        return target or None
+
+
+class ResponseCache:
+    """跳转结果的磁盘缓存：TTL内直接命中，过期后用ETag/Last-Modified发起条件请求"""
+    
+    def __init__(self, cache_file: str, ttl: int = 0, max_entries: int = 10000):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.max_entries = max(max_entries, 1)
+        self.entries: "OrderedDict[str, Dict]" = OrderedDict(FileManager.load_json(cache_file) or {})
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+    
+    @classmethod
+    def from_config(cls, config: TrackerConfig) -> Optional["ResponseCache"]:
+        """根据配置创建缓存，未配置缓存文件时返回None"""
+        if not config.response_cache_file:
+            return None
+        return cls(config.response_cache_file, config.response_cache_ttl, config.response_cache_max_entries)
+    
+    def lookup(self, url: str) -> Optional[Dict]:
+        """查找缓存条目并标记为最近使用"""
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                self.entries.move_to_end(url)
+            return entry
+    
+    def is_fresh(self, entry: Dict) -> bool:
+        """条目是否仍在TTL内"""
+        return time.time() < entry.get("expires", 0)
     
     @staticmethod
-    def get_page_title(url: str) -> str:
-        """获取页面标题"""
+    def conditional_headers(entry: Dict) -> Dict[str, str]:
+        """构造条件请求头"""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+    
+    def record_hit(self):
+        """记录一次TTL内命中"""
+        with self.lock:
+            self.hits += 1
+    
+    def record_miss(self):
+        """记录一次未命中"""
+        with self.lock:
+            self.misses += 1
+    
+    def refresh(self, url: str, entry: Dict):
+        """条件请求返回304后延长条目有效期"""
+        with self.lock:
+            self.revalidated += 1
+            entry["expires"] = time.time() + self.ttl
+            self.entries[url] = entry
+    
+    def store(self, url: str, result: str, response: "requests.Response"):
+        """保存探测结果；没有TTL也没有校验信息的响应不缓存"""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if self.ttl <= 0 and not etag and not last_modified:
+            return
+        with self.lock:
+            self.entries[url] = {
+                "result": result,
+                "etag": etag,
+                "last_modified": last_modified,
+                "expires": time.time() + self.ttl,
+            }
+            self.entries.move_to_end(url)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def stats(self) -> Dict[str, int]:
+        """命中统计"""
+        with self.lock:
+            return {"hits": self.hits, "revalidated": self.revalidated,
+                    "misses": self.misses, "entries": len(self.entries)}
+    
+    def save(self):
+        """持久化缓存"""
+        with self.lock:
+            data = dict(self.entries)
+        FileManager.save_json_atomic(self.cache_file, data)
+
+
+class HopCache:
+    """中间跳转缓存：按TTL缓存每一跳的下一跳，并把并发的相同查询合并为一次请求"""
+    
+    def __init__(self, ttl: int = 3600, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max(max_entries, 1)
+        self.entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.inflight: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+    
+    @classmethod
+    def from_config(cls, config: TrackerConfig) -> Optional["HopCache"]:
+        """根据配置创建缓存，未开启跳转链解析时返回None"""
+        if not config.follow_redirects:
+            return None
+        return cls(config.hop_cache_ttl, config.hop_cache_max_entries)
+    
+    def resolve(self, url: str, fetch: Callable[[str], Optional[str]],
+                timeout: Optional[float] = None) -> Optional[str]:
+        """返回某一跳的下一跳；未命中时由第一个调用方请求，其余并发调用方等待同一结果，
+        等待超过 timeout 秒时改为自己请求"""
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None and time.time() < entry[1]:
+                self.entries.move_to_end(url)
+                self.hits += 1
+                METRICS.inc("tracker_hop_cache_total", outcome="hit")
+                return entry[0]
+            flight = self.inflight.get(url)
+            is_leader = flight is None
+            if is_leader:
+                flight = self.inflight[url] = {"done": threading.Event(), "result": None}
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        
+        if not is_leader:
+            METRICS.inc("tracker_hop_cache_total", outcome="coalesced")
+            # 第一个调用方可能正在主机限速器上排队，默认一直等到它完成，而不是中途当作失败
+            if flight["done"].wait(timeout):
+                return flight["result"]
+            return fetch(url)
+        
+        METRICS.inc("tracker_hop_cache_total", outcome="miss")
+        result = None
         try:
-            headers = {"User-Agent": NetworkUtils.get_random_user_agent()}
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            title = soup.title.string if soup.title else "无标题"
-            return title.strip()
-        except Exception as e:
-            logging.error(f"获取页面标题时出错: {e}")
-            return "获取标题失败"
+            result = fetch(url)
+        finally:
+            with self.lock:
+                flight["result"] = result
+                del self.inflight[url]
+                # 请求失败和反爬结果不缓存
+                if result and result != "ANTI_CRAWL_DETECTED" and self.ttl > 0:
+                    self.entries[url] = (result, time.time() + self.ttl)
+                    self.entries.move_to_end(url)
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+            flight["done"].set()
+        return result
+    
+    def stats(self) -> Dict[str, int]:
+        """返回命中、合并和未命中次数"""
+        with self.lock:
+            return {"hits": self.hits, "coalesced": self.coalesced, "misses": self.misses,
+                    "entries": len(self.entries)}
+
+
+class AhoCorasickAutomaton:
+    """多模式子串匹配的Aho-Corasick自动机，每个状态记录在此结束的全部模式"""
+    
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List] = [[]]
+    
+    def add(self, pattern: str, value):
+        """把模式插入转移表，命中时返回 value"""
+        node = 0
+        for char in pattern:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][char] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            node = next_node
+        self.output[node].append(value)
+    
+    def build(self):
+        """按广度优先计算失配链接，并把后缀上的匹配结果传递下来"""
+        pending = deque(self.goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for char, next_node in self.goto[node].items():
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_node] = target if target != next_node else 0
+                self.output[next_node] = self.output[next_node] + self.output[self.fail[next_node]]
+                pending.append(next_node)
+    
+    def __bool__(self) -> bool:
+        return len(self.goto) > 1
+    
+    def first(self, text: str):
+        """返回文本中最先出现的模式的值，未命中时返回None"""
+        goto, fail, output = self.goto, self.fail, self.output
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                return output[node][0]
+        return None
+    
+    def all(self, text: str) -> set:
+        """返回文本中出现的全部模式的值"""
+        goto, fail, output = self.goto, self.fail, self.output
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
+
+
+class AntiCrawlMatcher:
+    """编译后的反爬规则：主机后缀走反向标签字典树，主机+路径前缀走哈希查找，
+    子串走Aho-Corasick自动机，正则逐条编译并按必需的字面子串预筛"""
+    
+    MIN_LITERAL = 3  # 短于此长度的字面子串筛除效果差，不用于预筛
+    
+    def __init__(self, rules: Iterable[str]):
+        self.host_trie: Dict = {}
+        self.path_rules: Dict[str, Dict[str, str]] = {}
+        self.substrings = AhoCorasickAutomaton()
+        # 正则不合并：合并后内联全局标志、重名分组和编号反向引用都会出错或改变含义
+        self.regexes: List["re.Pattern"] = []
+        # 每条正则必须出现的字面子串放进另一个自动机，匹配时只运行字面子串出现了的正则
+        self.regex_literals = AhoCorasickAutomaton()
+        self.unfiltered_regexes: List[int] = []
+        self.rule_count = 0
+        
+        for rule in rules:
+            rule = rule.strip()
+            if not rule or rule.startswith('#'):
+                continue
+            kind, _, value = rule.partition(':')
+            if kind == 'host' and value:
+                self._add_host(value.strip().lower().strip('.'), rule)
+            elif kind == 'path' and value:
+                host, _, path = value.strip().partition('/')
+                self.path_rules.setdefault(host.lower().rstrip('.'), {})['/' + path.rstrip('/')] = rule
+            elif kind == 'regex' and value:
+                self._add_regex(value, rule)
+            else:
+                self.substrings.add(rule, rule)
+            self.rule_count += 1
+        
+        self.substrings.build()
+        self.regex_literals.build()
+    
+    def _add_host(self, host: str, rule: str):
+        """按反向标签插入字典树，例如 a.example.com -> com / example / a"""
+        node = self.host_trie
+        for label in reversed(host.split('.')):
+            node = node.setdefault(label, {})
+        node.setdefault('$', rule)
+    
+    def _add_regex(self, value: str, rule: str):
+        """编译单条正则规则，出错时指出具体规则；能提取出必需字面子串的登记到预筛自动机"""
+        try:
+            pattern = re.compile(value)
+        except re.error as e:
+            raise re.error(f"正则规则 {rule!r} 无效: {e}") from e
+        index = len(self.regexes)
+        self.regexes.append(pattern)
+        literal = self._required_literal(pattern)
+        if literal is None:
+            self.unfiltered_regexes.append(index)
+        else:
+            self.regex_literals.add(literal, index)
+    
+    @classmethod
+    def _required_literal(cls, pattern: "re.Pattern") -> Optional[str]:
+        """正则顶层连续字面字符中最长的一段，任何匹配都必然包含它；忽略大小写或提取不到时返回None"""
+        if pattern.flags & re.IGNORECASE:
+            return None
+        try:
+            parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+        except Exception:
+            return None
+        longest, run = "", []
+        for op, argument in list(parsed) + [(None, None)]:
+            if op == sre_parse.LITERAL:
+                run.append(chr(argument))
+                continue
+            if len(run) > len(longest):
+                longest = "".join(run)
+            run = []
+        return longest if len(longest) >= cls.MIN_LITERAL else None
+    
+    def match(self, url: str) -> Optional[str]:
+        """返回命中的规则，未命中时返回None"""
+        if not url:
+            return None
+        
+        parts = urlparse(url if '//' in url else '//' + url)
+        # 去掉完全限定域名末尾的点，decoy.example.com. 与 decoy.example.com 是同一主机
+        host = (parts.hostname or '').lower().rstrip('.')
+        if host:
+            node = self.host_trie
+            for label in reversed(host.split('.')):
+                node = node.get(label)
+                if node is None:
+                    break
+                if '$' in node:
+                    return node['$']
+            
+            prefixes = self.path_rules.get(host)
+            if prefixes:
+                if '/' in prefixes:
+                    # 只写到主机根路径的规则匹配该主机下的所有路径
+                    return prefixes['/']
+                path = parts.path.rstrip('/') or '/'
+                if path in prefixes:
+                    return prefixes[path]
+                position = path.find('/', 1)
+                while position != -1:
+                    if path[:position] in prefixes:
+                        return prefixes[path[:position]]
+                    position = path.find('/', position + 1)
+        
+        if self.substrings:
+            found = self.substrings.first(url)
+            if found is not None:
+                return found
+        
+        if self.regexes:
+            candidates = self.regex_literals.all(url) if self.regex_literals else set()
+            for index in sorted(candidates.union(self.unfiltered_regexes)):
+                found = self.regexes[index].search(url)
+                if found:
+                    return f"regex:{found.group(0)}"
+        return None
+
+
+class AntiCrawlRules:
+    """反爬规则集：内置规则加外部规则文件，文件修改后在运行中自动重新编译"""
+    
+    def __init__(self, rules_file: str, default_rules: Iterable[str], check_interval: float = 5.0):
+        self.rules_file = rules_file
+        self.default_rules = list(default_rules)
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.next_check = 0.0
+        self.file_signature: Optional[Tuple[float, int]] = None
+        self.matcher = AntiCrawlMatcher(self.default_rules)
+        self.reload()
+    
+    @classmethod
+    def from_config(cls, config: TrackerConfig, default_rules: Iterable[str]) -> "AntiCrawlRules":
+        """根据配置创建规则集"""
+        return cls(config.anti_crawl_rules_file, default_rules, config.anti_crawl_rules_check_interval)
+    
+    def _signature(self) -> Optional[Tuple[float, int]]:
+        """规则文件的修改时间和大小，文件不存在时为None"""
+        try:
+            stat = os.stat(self.rules_file)
+            return stat.st_mtime, stat.st_size
+        except OSError:
+            return None
+    
+    def reload(self) -> bool:
+        """规则文件有变化时重新编译并原子替换匹配器，返回是否发生替换"""
+        signature = self._signature() if self.rules_file else None
+        if signature == self.file_signature:
+            return False
+        
+        rules = list(self.default_rules)
+        if signature is not None:
+            try:
+                with open(self.rules_file, 'r', encoding='utf-8') as f:
+                    rules.extend(f)
+                matcher = AntiCrawlMatcher(rules)
+            except (OSError, re.error) as e:
+                # 规则有误时保留旧规则继续运行
+                logging.error("加载反爬规则文件 %s 失败，继续使用现有规则: %s", self.rules_file, e)
+                self.file_signature = signature
+                return False
+        else:
+            matcher = AntiCrawlMatcher(rules)
+        
+        self.matcher = matcher
+        self.file_signature = signature
+        logging.info("反爬规则已加载: 共 %s 条", matcher.rule_count)
+        return True
+    
+    def match(self, url: str) -> Optional[str]:
+        """按当前规则匹配URL，必要时先检查规则文件是否更新"""
+        now = time.monotonic()
+        if now >= self.next_check and self.lock.acquire(blocking=False):
+            # 只由一个线程检查文件，其他线程继续使用当前匹配器
+            try:
+                self.next_check = now + self.check_interval
+                self.reload()
+            finally:
+                self.lock.release()
+        return self.matcher.match(url)
+
+
+class NetworkUtils:
+    """网络工具类"""
+    
+    USER_AGENTS = [
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0",
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15",
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36 Edg/92.0.902.55",
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36"
+    ]
+    
+    # 内置反爬机制检测规则（子串匹配），外部规则文件中的规则在此基础上追加
+    ANTI_CRAWL_PATTERNS = [
+        "v.qq.com/txp/iframe/player.html",  # 腾讯视频反爬
+        "mtvod.meituan.net/save-video",     # 美团视频反爬
+    ]
+    anti_crawl_rules: Optional[AntiCrawlRules] = None
+    
+    # 页面标题提取
+    TITLE_PATTERN = re.compile(rb"<title\b[^>]*>(.*?)</title", re.IGNORECASE | re.DOTALL)
+    TITLE_END_PATTERN = re.compile(rb"</title", re.IGNORECASE)
+    CHARSET_PATTERN = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?([\w-]+)""", re.IGNORECASE)
+    
+    # 流式检测Meta刷新时最多读取的字节数
+    meta_refresh_max_bytes: Optional[int] = 65536
+    
+    _session_pool: Optional[SessionPool] = None
+    _probe_state = threading.local()
+    response_cache: Optional[ResponseCache] = None
+    hop_cache: Optional[HopCache] = None
+    max_hops = 5
+    dns_cache: Optional[DNSCache] = None
+    # 追踪器的主机限速器，跳转链中间跳也从中获取配额
+    host_limiter: Optional[HostRateLimiter] = None
+    stop_event: Optional[threading.Event] = None
+    anti_crawl_log_file = "anti_crawl_urls.log"
+    _pool_lock = threading.Lock()
+    
+    @staticmethod
+    def configure(config: TrackerConfig) -> SessionPool:
+        """按配置重建共享连接池及网络参数"""
+        with NetworkUtils._pool_lock:
+            if NetworkUtils._session_pool is not None:
+                NetworkUtils._session_pool.close()
+            NetworkUtils._session_pool = SessionPool.from_config(config)
+            NetworkUtils.meta_refresh_max_bytes = config.meta_refresh_max_bytes or None
+            NetworkUtils.response_cache = ResponseCache.from_config(config)
+            NetworkUtils.hop_cache = HopCache.from_config(config)
+            NetworkUtils.max_hops = max(config.max_hops, 1)
+            NetworkUtils.anti_crawl_log_file = config.anti_crawl_log_file
+            NetworkUtils.anti_crawl_rules = AntiCrawlRules.from_config(config, NetworkUtils.ANTI_CRAWL_PATTERNS)
+            NetworkUtils.dns_cache = DNSCache.from_config(config)
+            if NetworkUtils.dns_cache:
+                NetworkUtils.dns_cache.install()
+            else:
+                DNSCache.uninstall()
+            return NetworkUtils._session_pool
+    
+    @staticmethod
+    def get_session_pool() -> SessionPool:
+        """获取共享连接池，未配置时使用默认参数创建"""
+        with NetworkUtils._pool_lock:
+            if NetworkUtils._session_pool is None:
+                NetworkUtils._session_pool = SessionPool()
+            return NetworkUtils._session_pool
+    
+    @staticmethod
+    def get_random_user_agent() -> str:
+        """获取随机用户代理"""
+        return random.choice(NetworkUtils.USER_AGENTS)
+    
+    @staticmethod
+    def is_anti_crawl_url(url: str) -> bool:
+        """检测是否为反爬机制URL"""
+        if not url:
+            return False
+        
+        if NetworkUtils.anti_crawl_rules is None:
+            NetworkUtils.anti_crawl_rules = AntiCrawlRules("", NetworkUtils.ANTI_CRAWL_PATTERNS)
+        rule = NetworkUtils.anti_crawl_rules.match(url)
+        if rule is None:
+            return False
+        logging.debug("匹配到反爬模式: %s -> %s", rule, url)
+        METRICS.inc("tracker_anti_crawl_rule_hits_total")
+        return True
+    
+    @staticmethod
+    def log_anti_crawl_url(url: str):
+        """记录反爬URL到单独的日志文件"""
+        if LogPipeline.is_running():
+            logging.getLogger(LogPipeline.ANTI_CRAWL_LOGGER).info("%s", url)
+            return
+        # 未启动日志管道（例如被其他程序导入）时直接追加写入
+        try:
+            with open(NetworkUtils.anti_crawl_log_file, "a", encoding="utf-8") as f:
+                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                f.write(f"{timestamp} - {url}\n")
+        except Exception as e:
+            logging.error("记录反爬URL时出错: %s", e)
+    
+    @staticmethod
+    def last_probe_timed_out() -> bool:
+        """当前线程最近一次探测是否超时"""
+        return getattr(NetworkUtils._probe_state, "timed_out", False)
+    
+    @staticmethod
+    def last_probe_chain() -> Optional[List[str]]:
+        """当前线程最近一次探测的完整跳转链（未开启跳转链解析时为None）"""
+        return getattr(NetworkUtils._probe_state, "chain", None)
+    
+    @staticmethod
+    def last_probe_outcome() -> str:
+        """当前线程最近一次探测的结果类别：ok / cache_hit / not_modified / anti_crawl / timeout / error"""
+        return getattr(NetworkUtils._probe_state, "outcome", "error")
+    
+    @staticmethod
+    def get_redirect_url(url: str, proxies: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """获取URL重定向后的最终URL；proxies 指定探测请求经由的出口代理"""
+        start = time.perf_counter()
+        NetworkUtils._probe_state.timed_out = False
+        NetworkUtils._probe_state.cache_outcome = None
+        NetworkUtils._probe_state.chain = None
+        NetworkUtils._probe_state.outcome = "error"
+        redirect_url = NetworkUtils._get_redirect_url(url, proxies)
+        if NetworkUtils.hop_cache and redirect_url and redirect_url != "ANTI_CRAWL_DETECTED":
+            redirect_url, NetworkUtils._probe_state.chain = NetworkUtils._follow_chain(url, redirect_url)
+        
+        if redirect_url is None:
+            outcome = "timeout" if NetworkUtils.last_probe_timed_out() else "error"
+        elif redirect_url == "ANTI_CRAWL_DETECTED":
+            outcome = "anti_crawl"
+        else:
+            outcome = NetworkUtils._probe_state.cache_outcome or "ok"
+        NetworkUtils._probe_state.outcome = outcome
+        METRICS.observe("tracker_probe_seconds", time.perf_counter() - start, outcome=outcome)
+        return redirect_url
+    
+    @staticmethod
+    def _get_redirect_url(url: str, proxies: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """发起探测请求（可能命中缓存）并解析跳转目标"""
+        try:
+            headers = {
+                "User-Agent": NetworkUtils.get_random_user_agent(),
+                "Referer": "http://tians.06kd.mlkj888.cn/",
+            }
+            
+            cache = NetworkUtils.response_cache
+            entry = cache.lookup(url) if cache else None
+            if entry is not None and cache.is_fresh(entry):
+                cache.record_hit()
+                NetworkUtils._probe_state.cache_outcome = "cache_hit"
+                logging.info("缓存命中: %s -> %s", url, entry['result'])
+                return entry["result"]
+            if entry is not None:
+                headers.update(ResponseCache.conditional_headers(entry))
+            
+            response = NetworkUtils.get_session_pool().get(url, headers=headers, allow_redirects=False,
+                                                            timeout=10, stream=True, proxies=proxies)
+            METRICS.observe("tracker_http_ttfb_seconds", response.elapsed.total_seconds())
+            
+            # 条件请求未变化，沿用缓存结果
+            if response.status_code == 304 and entry is not None:
+                response.content
+                cache.refresh(url, entry)
+                NetworkUtils._probe_state.cache_outcome = "not_modified"
+                logging.info("缓存校验未变化: %s -> %s", url, entry['result'])
+                return entry["result"]
+            
+            if cache:
+                cache.record_miss()
+            redirect_url = NetworkUtils._resolve_response(url, response)
+            # 反爬结果永不缓存
+            if cache and redirect_url and redirect_url != "ANTI_CRAWL_DETECTED":
+                cache.store(url, redirect_url, response)
+            return redirect_url
+            
+        except requests.Timeout as e:
+            NetworkUtils._probe_state.timed_out = True
+            logging.error("获取重定向URL超时: %s", e)
+            return None
+        except Exception as e:
+            logging.error("获取重定向URL时出错: %s", e)
+            return None
+    
+    @staticmethod
+    def _follow_chain(url: str, first_hop: str) -> Tuple[Optional[str], List[str]]:
+        """从第一跳开始逐跳解析到最终目标，每一跳都检查反爬，中间跳经共享缓存查询；
+        中间跳解析失败时返回None，整次探测按失败处理"""
+        chain = [url]
+        target = first_hop
+        while target != chain[-1]:
+            if NetworkUtils.is_anti_crawl_url(target):
+                NetworkUtils.log_anti_crawl_url(target)
+                logging.warning("跳转链中检测到反爬机制！第 %s 跳: %s", len(chain), target)
+                return "ANTI_CRAWL_DETECTED", chain + [target]
+            chain.append(target)
+            # 达到跳数上限或出现循环时，以当前一跳为终点
+            if len(chain) - 1 >= NetworkUtils.max_hops or target in chain[:-1]:
+                break
+            next_target = NetworkUtils.hop_cache.resolve(target, NetworkUtils._fetch_hop)
+            if next_target == "ANTI_CRAWL_DETECTED":
+                return next_target, chain
+            if next_target is None:
+                # 中间跳请求失败：不把短链/CDN中间地址当作最终目标记录，交给重试队列重新探测
+                logging.warning("跳转链第 %s 跳解析失败: %s", len(chain) - 1, target)
+                return None, chain
+            target = next_target
+        
+        METRICS.observe("tracker_redirect_hops", len(chain) - 1)
+        return chain[-1], chain
+    
+    @staticmethod
+    def _fetch_hop(url: str) -> Optional[str]:
+        """请求一个中间跳转地址并解析它的下一跳，没有下一跳时返回自身；请求计入目标主机的配额"""
+        if NetworkUtils.host_limiter and not NetworkUtils.host_limiter.acquire(url, NetworkUtils.stop_event):
+            return None
+        try:
+            headers = {"User-Agent": NetworkUtils.get_random_user_agent()}
+            response = NetworkUtils.get_session_pool().get(url, headers=headers, allow_redirects=False,
+                                                            timeout=10, stream=True)
+            METRICS.observe("tracker_http_ttfb_seconds", response.elapsed.total_seconds())
+            return NetworkUtils._resolve_response(url, response)
+        except requests.Timeout as e:
+            NetworkUtils._probe_state.timed_out = True
+            logging.error("解析跳转链 %s 超时: %s", url, e)
+            return None
+        except Exception as e:
+            logging.error("解析跳转链 %s 时出错: %s", url, e)
+            return None
+    
+    @staticmethod
+    def _resolve_response(url: str, response: "requests.Response") -> Optional[str]:
+        """从探测响应中解析跳转目标"""
+        # 处理HTTP重定向
+        if 300 <= response.status_code < 400:
+            redirect_url = response.headers.get('Location')
+            # 读取跳转响应的短正文，使连接可以归还连接池复用
+            response.content
+            logging.info("重定向URL: %s", redirect_url)
+            
+            # 检查反爬机制
+            if NetworkUtils.is_anti_crawl_url(redirect_url):
+                NetworkUtils.log_anti_crawl_url(redirect_url)
+                logging.warning("检测到反爬机制！跳转到: %s", redirect_url)
+                return "ANTI_CRAWL_DETECTED"
+            
+            # 处理相对URL
+            if redirect_url and not redirect_url.startswith('http'):
+                redirect_url = urljoin(url, redirect_url)
+            
+            return redirect_url
+        
+        # 处理Meta刷新重定向（流式读取，只扫描到</head>或字节上限）
+        redirect_url = NetworkUtils._scan_meta_refresh(response, NetworkUtils.meta_refresh_max_bytes)
+        if redirect_url:
+            logging.info("Meta刷新重定向: %s", redirect_url)
+            if not redirect_url.startswith('http'):
+                redirect_url = urljoin(url, redirect_url)
+            return redirect_url
+        
+        logging.info("没有找到重定向，状态码: %s", response.status_code)
+        return url
+    
+    @staticmethod
+    def _scan_meta_refresh(response: "requests.Response", max_bytes: Optional[int]) -> Optional[str]:
+        """分块读取响应正文并查找Meta刷新目标，提前结束时关闭连接"""
+        scanner = MetaRefreshScanner(max_bytes, response.encoding or "utf-8")
+        try:
+            with METRICS.timer("tracker_meta_refresh_scan_seconds"):
+                for chunk in response.iter_content(chunk_size=8192):
+                    if scanner.feed(chunk):
+                        break
+        finally:
+            response.close()
+        METRICS.inc("tracker_meta_refresh_bytes_total", scanner.bytes_seen)
+        return scanner.result
+    
+    @staticmethod
+    def _parse_meta_refresh(html_content: str) -> Optional[str]:
+        """解析Meta刷新重定向"""
+        try:
+            with METRICS.timer("tracker_meta_refresh_parse_seconds"):
+                scanner = MetaRefreshScanner()
+                scanner.feed(html_content.encode("utf-8", errors="replace"))
+            return scanner.result
+        except Exception:
+            pass
+        return None
+    
+    @staticmethod
+    def get_page_title(url: str, max_bytes: Optional[int] = 16384) -> str:
+        """获取页面标题：流式读取到</title>或字节上限为止"""
+        try:
+            headers = {"User-Agent": NetworkUtils.get_random_user_agent()}
+            response = NetworkUtils.get_session_pool().get(url, headers=headers, timeout=10, stream=True)
+            response.raise_for_status()
+            
+            data = b""
+            try:
+                for chunk in response.iter_content(chunk_size=4096):
+                    data += chunk
+                    if NetworkUtils.TITLE_END_PATTERN.search(data) or (max_bytes and len(data) >= max_bytes):
+                        break
+            finally:
+                response.close()
+            METRICS.inc("tracker_title_bytes_total", len(data))
+            
+            found = NetworkUtils.TITLE_PATTERN.search(data[:max_bytes] if max_bytes else data)
+            if not found:
+                return "无标题"
+            # 响应头未声明编码时按页面内的charset声明解码，默认UTF-8
+            encoding = None
+            if "charset" in response.headers.get("Content-Type", "").lower():
+                encoding = response.encoding
+            if not encoding:
+                declared = NetworkUtils.CHARSET_PATTERN.search(data)
+                encoding = declared.group(1).decode("ascii") if declared else "utf-8"
+            try:
+                title = found.group(1).decode(encoding, errors="replace")
+            except LookupError:
+                title = found.group(1).decode("utf-8", errors="replace")
+            return " ".join(html.unescape(title).split()) or "无标题"
+        except Exception as e:
+            logging.error("获取页面标题时出错: %s", e)
+            return "获取标题失败"
+
+
+class FileManager:
+    """文件管理器"""
+    
+    @staticmethod
+    def ensure_file_exists(filepath: str, header: str):
+        """确保文件存在，如果不存在则创建"""
+        if not os.path.exists(filepath):
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(f"{header}\n\n")
+    
+    @staticmethod
+    def write_result(filepath: str, result: ProcessResult):
+        """写入处理结果到文件"""
+        with METRICS.timer("tracker_result_write_seconds", backend="text"), \
+                open(filepath, 'a', encoding='utf-8') as f:
+            f.write(f"时间戳: {result.timestamp}\n")
+            f.write(f"直连网站: {result.original_url}\n")
+            f.write(f"跳转网站: {result.redirect_url}\n")
+            f.write(f"shizu编号: {result.shizu_id}\n")
+            if result.redirect_chain:
+                f.write(f"跳转链: {' -> '.join(result.redirect_chain)}\n")
+            if result.message:
+                f.write(f"备注: {result.message}\n")
+            f.write("---\n")
+    
+    @staticmethod
+    def load_json(filepath: str) -> Optional[Dict]:
+        """读取JSON文件，不存在或损坏时返回None"""
+        try:
+            if os.path.exists(filepath):
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logging.error("读取 %s 时出错: %s", filepath, e)
+        return None
+    
+    @staticmethod
+    def save_json_atomic(filepath: str, data: Dict, indent: Optional[int] = None):
+        """先写临时文件并落盘，再原子替换，避免中途退出留下损坏的JSON"""
+        temp_file = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=indent)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, filepath)
+            return True
+        except Exception as e:
+            logging.error("保存 %s 时出错: %s", filepath, e)
+            return False
+    
+    @staticmethod
+    def load_progress(progress_file: str = "tracker_progress.json") -> Optional[Dict]:
+        """加载处理进度"""
+        try:
+            if os.path.exists(progress_file):
+                with open(progress_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                logging.info("已加载进度: 上次处理到 %s", data.get('last_index', 'unknown'))
+                return data
+        except Exception as e:
+            logging.error("加载进度时出错: %s", e)
+        return None
+    
+    @staticmethod
+    def save_progress(progress_file: str, current_index: int, consecutive_failures: int,
+                      extra: Optional[Dict] = None) -> bool:
+        """保存处理进度（原子替换），返回是否成功"""
+        data = {
+            "last_index": current_index,
+            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "consecutive_failures": consecutive_failures
+        }
+        data.update(extra or {})
+        if not FileManager.save_json_atomic(progress_file, data, indent=2):
+            return False
+        logging.info("进度已保存: 当前处理到 shizu%s", current_index)
+        return True
+
+
+class TitleEnricher:
+    """低优先级的页面标题补充：按采样率挑选跳转目标，在后台线程中流式读取标题并按最终URL缓存"""
+    
+    SAVE_EVERY = 20  # 每获取多少个新标题保存一次缓存
+    
+    def __init__(self, sample_rate: int, cache_file: Optional[str] = None, max_bytes: int = 16384,
+                 rate: float = 0.5, queue_size: int = 1000, limiter: Optional[HostRateLimiter] = None):
+        self.sample_rate = sample_rate
+        self.cache_file = cache_file
+        self.max_bytes = max_bytes or None
+        self.limiter = limiter
+        self.titles: Dict[str, str] = (FileManager.load_json(cache_file) if cache_file else None) or {}
+        self.queue: "queue.Queue[str]" = queue.Queue(maxsize=max(queue_size, 1))
+        self.queued: set = set()
+        self.bucket = TokenBucket(rate) if rate > 0 else None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.fetched = 0
+        self.dropped = 0
+        self.unsaved = 0
+    
+    @classmethod
+    def from_config(cls, config: TrackerConfig,
+                    limiter: Optional[HostRateLimiter] = None) -> Optional["TitleEnricher"]:
+        """根据配置创建，title_sample_rate为0时不启用；limiter 为追踪器的主机限速器，标题请求只取用其空闲配额"""
+        if config.title_sample_rate <= 0:
+            return None
+        return cls(config.title_sample_rate, config.title_cache_file, config.title_max_bytes,
+                   config.title_rate, config.title_queue_size, limiter)
+    
+    def is_sampled(self, url: str) -> bool:
+        """按URL哈希抽样，约每 sample_rate 个目标选一个，同一目标每次结果一致"""
+        digest = hashlib.md5(url.encode("utf-8")).digest()
+        return int.from_bytes(digest[:4], "big") % self.sample_rate == 0
+    
+    def submit(self, url: str):
+        """提交跳转目标；未被抽中、已有缓存或队列已满时直接丢弃，从不阻塞调用方"""
+        if not url or not self.is_sampled(url):
+            return
+        with self.lock:
+            if url in self.titles or url in self.queued:
+                return
+            try:
+                self.queue.put_nowait(url)
+            except queue.Full:
+                self.dropped += 1
+                return
+            self.queued.add(url)
+    
+    def start(self):
+        """启动后台线程"""
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._worker, name="TitleEnricher", daemon=True)
+        self.thread.start()
+    
+    def _worker(self):
+        """逐个获取标题；主机有正常请求在排队时让出配额"""
+        while not self.stop_event.is_set():
+            try:
+                url = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if url is None:
+                break
+            if self.bucket and not self.bucket.acquire(self.stop_event):
+                break
+            while self.limiter and not self.limiter.try_acquire(url):
+                if self.stop_event.wait(0.5):
+                    return
+            
+            with METRICS.timer("tracker_title_fetch_seconds"):
+                title = NetworkUtils.get_page_title(url, self.max_bytes)
+            with self.lock:
+                self.queued.discard(url)
+                # 失败的目标不缓存，下次被抽中时重试
+                if title != "获取标题失败":
+                    self.titles[url] = title
+                    self.fetched += 1
+                    self.unsaved += 1
+            logging.info("页面标题: %s -> %s", url, title)
+            if self.unsaved >= self.SAVE_EVERY:
+                self.save()
+    
+    def save(self):
+        """保存标题缓存"""
+        if not self.cache_file:
+            return
+        with self.lock:
+            titles = dict(self.titles)
+            self.unsaved = 0
+        FileManager.save_json_atomic(self.cache_file, titles)
+    
+    def close(self, timeout: float = 1.0):
+        """停止后台线程并保存缓存；未处理的目标留给下一轮，不拖慢本轮结束"""
+        self.stop_event.set()
+        if self.thread is not None:
+            try:
+                self.queue.put_nowait(None)  # 唤醒等待队列的后台线程
+            except queue.Full:
+                pass
+            self.thread.join(timeout)
+            self.thread = None
+        self.save()
+        with self.lock:
+            pending = len(self.queued)
+        logging.info("页面标题统计: 新获取 %s 个，未处理 %s 个，队列满丢弃 %s 个，缓存标题 %s 个",
+                     self.fetched, pending, self.dropped, len(self.titles))
+
+
+class ProgressJournal:
+    """逐条追加的完成日志：组提交fsync，定期压缩到进度文件，恢复时按日志重建精确状态"""
+    
+    def __init__(self, progress_file: str, journal_file: str, fsync_batch: int = 20,
+                 fsync_interval: float = 1.0, compact_every: int = 1000, min_index: int = 1,
+                 ranges: Optional[List[List[int]]] = None):
+        self.progress_file = progress_file
+        self.journal_file = journal_file
+        self.fsync_batch = max(fsync_batch, 1)
+        self.fsync_interval = fsync_interval
+        self.compact_every = max(compact_every, 1)
+        self.last_index = min_index - 1
+        self.completed = set()
+        self.retry_counts: Dict[int, int] = {}
+        self.consecutive_failures = 0
+        self.lock = threading.Lock()
+        self.unsynced = 0
+        self.records = 0
+        self.last_sync = time.monotonic()
+        # 位置按编号区间连续编号，区间被修改后旧进度中的位置要按编号换算到新区间
+        self.ranges = ranges
+        stale = self._load()
+        self.file = open(journal_file, 'a', encoding='utf-8')
+        if stale:
+            # 先把当前区间写入进度文件再追加日志：换算过的旧记录不再回放，之后的记录也能认出所属区间
+            self.compact()
+    
+    @classmethod
+    def from_config(cls, config: TrackerConfig, target: WorkTarget) -> "ProgressJournal":
+        """根据配置创建某个追踪目标的进度日志"""
+        return cls(target.progress_file, target.journal_file, config.journal_fsync_batch,
+                   config.journal_fsync_interval, config.journal_compact_every, target.first,
+                   target.segments())
+    
+    def _load(self) -> bool:
+        """读取进度文件作为基线，再回放日志中的记录；编号区间已修改时按编号换算位置，返回进度文件是否需要重写"""
+        progress = FileManager.load_progress(self.progress_file)
+        if progress:
+            self.last_index = progress.get("last_index", self.last_index)
+            self.consecutive_failures = progress.get("consecutive_failures", 0)
+            self.completed = set(progress.get("completed", []))
+            self.retry_counts = {int(index): count for index, count in progress.get("retry_counts", {}).items()}
+        
+        replayed = 0
+        if os.path.exists(self.journal_file):
+            good_end = 0
+            torn = False
+            with open(self.journal_file, 'rb') as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("记录不完整")
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 崩溃时写了一半的最后一行
+                        torn = True
+                        break
+                    self._apply(entry)
+                    replayed += 1
+                    good_end += len(line)
+            if torn:
+                # 截掉残缺的记录，否则之后追加的记录排在它后面，下次回放时会被一起丢弃
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(good_end)
+                logging.warning("进度日志 %s 末尾有残缺记录，已截断到 %s 字节", self.journal_file, good_end)
+        if replayed:
+            logging.info("已回放进度日志 %s 条（%s），处理到位置 %s，另有 %s 个位置已提前完成",
+                         replayed, self.journal_file, self.last_index, len(self.completed))
+        
+        saved_ranges = progress.get("ranges") if progress else None
+        if self.ranges is None or saved_ranges == self.ranges:
+            return False
+        if not saved_ranges:
+            # 新建的进度或没有记录区间的旧进度文件：按区间未变处理，补记当前区间
+            return True
+        self._remap(WorkTarget("", "", saved_ranges), WorkTarget("", "", self.ranges))
+        logging.warning("进度文件 %s 保存时的编号区间 %s 与当前配置 %s 不同，已按编号换算：处理到位置 %s，另有 %s 个位置已完成",
+                        self.progress_file, saved_ranges, self.ranges, self.last_index, len(self.completed))
+        return True
+    
+    def _remap(self, old: WorkTarget, new: WorkTarget):
+        """把旧区间下的水位线、已完成位置和重试次数按编号换算到新区间"""
+        # 旧区间中已完成的编号：水位线之前的部分按区间表示，避免逐个展开
+        done = []
+        for start, end, offset in zip(old.starts, old.ends, old.offsets):
+            segment_first = old.first + offset
+            if segment_first > self.last_index:
+                break
+            done.append([start, min(end, start + self.last_index - segment_first)])
+        done += [[number, number] for number in map(old.id_at, self.completed)]
+        merged: List[List[int]] = []
+        for start, end in sorted(done):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        
+        # 新水位线：从新区间开头起连续已完成的最后一个位置
+        last_index = new.first - 1
+        for start, end, offset in zip(new.starts, new.ends, new.offsets):
+            covering = bisect.bisect_right(merged, [start, float("inf")]) - 1
+            if covering < 0 or merged[covering][1] < start:
+                break
+            covered_end = min(end, merged[covering][1])
+            last_index = new.first + offset + covered_end - start
+            if covered_end < end:
+                break
+        
+        # 水位线之后的已完成编号：按区间交集换算成位置
+        completed = set()
+        for start, end in merged:
+            for segment_start, segment_end, offset in zip(new.starts, new.ends, new.offsets):
+                low, high = max(start, segment_start), min(end, segment_end)
+                if low > high:
+                    continue
+                first_position = new.first + offset + low - segment_start
+                completed.update(range(max(first_position, last_index + 1), first_position + high - low + 1))
+        retry_counts = {}
+        for index, count in self.retry_counts.items():
+            position = new.position_of(old.id_at(index))
+            if position is not None and position > last_index:
+                retry_counts[position] = count
+        self.last_index, self.completed, self.retry_counts = last_index, completed, retry_counts
+    
+    def _apply(self, entry: Dict):
+        """把一条日志记录应用到内存状态"""
+        index = entry["i"]
+        self.consecutive_failures = entry.get("cf", self.consecutive_failures)
+        if entry["e"] == "done":
+            self.retry_counts.pop(index, None)
+            if index > self.last_index:
+                self.completed.add(index)
+            # 推进连续完成的水位线
+            while self.last_index + 1 in self.completed:
+                self.last_index += 1
+                self.completed.remove(self.last_index)
+        elif entry["e"] == "retry":
+            self.retry_counts[index] = entry["r"]
+    
+    def _append(self, entry: Dict):
+        """追加一条记录，按批次或时间间隔统一fsync"""
+        with self.lock:
+            self._apply(entry)
+            self.file.write(json.dumps(entry) + "\n")
+            self.file.flush()
+            self.unsynced += 1
+            self.records += 1
+            if self.unsynced >= self.fsync_batch or time.monotonic() - self.last_sync >= self.fsync_interval:
+                self._sync()
+            should_compact = self.records >= self.compact_every
+        if should_compact:
+            self.compact()
+    
+    def _sync(self):
+        """把已写入的日志落盘"""
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+    
+    def record_done(self, index: int, consecutive_failures: int):
+        """记录某个编号已完成且结果已落盘"""
+        self._append({"e": "done", "i": index, "cf": consecutive_failures})
+    
+    def record_retry(self, index: int, retry_count: int, consecutive_failures: int):
+        """记录某个编号的重试次数"""
+        self._append({"e": "retry", "i": index, "r": retry_count, "cf": consecutive_failures})
+    
+    def reset(self, start_index: int):
+        """开始新一轮处理"""
+        with self.lock:
+            self.last_index = start_index - 1
+            self.completed = set()
+            self.retry_counts = {}
+        self.compact()
+    
+    def compact(self):
+        """把当前状态原子写入进度文件并清空日志"""
+        with self.lock:
+            extra = {
+                "completed": sorted(self.completed),
+                "retry_counts": {str(index): count for index, count in self.retry_counts.items()},
+            }
+            if self.ranges is not None:
+                extra["ranges"] = self.ranges
+            saved = FileManager.save_progress(self.progress_file, self.last_index, self.consecutive_failures, extra)
+            # 进度文件未能保存时保留日志，下次仍可回放
+            if not saved:
+                return
+            self.file.close()
+            self.file = open(self.journal_file, 'w', encoding='utf-8')
+            self.unsynced = 0
+            self.records = 0
+    
+    def close(self):
+        """压缩并关闭日志"""
+        self.compact()
+        self.file.close()
+
+
+class ResultAnalyzer:
+    """结果分析器"""
+    
+    # 结果文件中表示未成功跳转的占位内容及其对应状态
+    FAILURE_MARKERS = {
+        '触发反爬机制': 'retry_needed',
+        '获取失败': 'failed',
+        '处理出错': 'failed',
+        '超过最大重试次数': 'skipped',
+    }
+    
+    @staticmethod
+    def parse_record(lines: List[str]) -> Optional[ProcessResult]:
+        """把一条记录的若干行解析为处理结果"""
+        fields = {}
+        for line in lines:
+            line = line.strip()
+            if ':' in line:
+                key, value = line.split(':', 1)
+                fields.setdefault(key.strip(), value.strip())
+        
+        if '时间戳' not in fields or not fields.get('shizu编号'):
+            return None
+        redirect_url = fields.get('跳转网站', '')
+        redirect_chain = fields.get('跳转链')
+        return ProcessResult(
+            timestamp=fields['时间戳'],
+            shizu_id=fields['shizu编号'],
+            original_url=fields.get('直连网站', ''),
+            redirect_url=redirect_url,
+            status=ResultAnalyzer.FAILURE_MARKERS.get(redirect_url, 'success' if redirect_url else 'failed'),
+            message=fields.get('备注'),
+            redirect_chain=redirect_chain.split(' -> ') if redirect_chain else None,
+        )
+    
+    @staticmethod
+    def iter_results(filepath: str, offset: int = 0,
+                     include_partial: bool = True) -> Iterator[Tuple[ProcessResult, int]]:
+        """从指定字节偏移开始逐条流式读取记录，同时返回每条记录结束处的偏移"""
+        if not os.path.exists(filepath):
+            return
+        with open(filepath, 'rb') as f:
+            f.seek(offset)
+            position = offset
+            lines = []
+            for raw_line in f:
+                position += len(raw_line)
+                line = raw_line.decode('utf-8', errors='replace')
+                if line.strip() == '---':
+                    result = ResultAnalyzer.parse_record(lines)
+                    if result:
+                        yield result, position
+                    lines = []
+                else:
+                    lines.append(line)
+            # 末尾缺少分隔符的记录可能仍在写入，增量读取时不计入
+            if include_partial:
+                result = ResultAnalyzer.parse_record(lines)
+                if result:
+                    yield result, position
+    
+    @staticmethod
+    def file_fingerprint(filepath: str, offset: int) -> Optional[str]:
+        """计算文件开头及偏移处分隔符的指纹，用于识别截断或轮转"""
+        try:
+            with open(filepath, 'rb') as f:
+                head = f.read(min(offset, 4096))
+                f.seek(max(offset - 8, 0))
+                tail = f.read(min(offset, 8))
+            return hashlib.sha1(head + b'|' + tail).hexdigest()
+        except OSError:
+            return None
+    
+    @staticmethod
+    def resume_offset(filepath: str, state: Optional[Dict]) -> int:
+        """返回可以继续解析的字节偏移；文件被截断或替换时返回0"""
+        state = state or {}
+        offset = state.get('offset', 0)
+        size = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+        if (state.get('results_file') != os.path.abspath(filepath) or offset > size
+                or ResultAnalyzer.file_fingerprint(filepath, offset) != state.get('fingerprint')):
+            if offset:
+                logging.info("结果文件 %s 已被截断或替换，重新完整解析", filepath)
+            return 0
+        return offset
+    
+    @staticmethod
+    def checkpoint_state(filepath: str, offset: int) -> Dict:
+        """生成可保存的解析检查点"""
+        return {
+            'results_file': os.path.abspath(filepath),
+            'offset': offset,
+            'fingerprint': ResultAnalyzer.file_fingerprint(filepath, offset),
+        }
+    
+    @staticmethod
+    def load_results_from_file(filepath: str) -> Dict[str, str]:
+        """从结果文件中加载最新结果"""
+        result_map = {}
+        try:
+            for result, _ in ResultAnalyzer.iter_results(filepath):
+                # 只记录成功跳转的结果
+                if result.status == 'success':
+                    result_map[result.shizu_id] = result.redirect_url
+        except Exception as e:
+            logging.error("读取结果文件时出错: %s", e)
+            
+        return result_map
+    
+    @staticmethod
+    def compare_results(old_results: Dict[str, str], new_results: Dict[str, str]) -> List[Tuple[str, str, str]]:
+        """比较新旧结果，找出变化的网站"""
+        updated_sites = []
+        for shizu_id, new_url in new_results.items():
+            old_url = old_results.get(shizu_id)
+            if old_url and old_url != new_url:
+                updated_sites.append((shizu_id, old_url, new_url))
+        return updated_sites
+
+
+class ResultStore(ABC):
+    """结果存储后端基类"""
+    
+    @staticmethod
+    def from_config(config: TrackerConfig) -> "ResultStore":
+        """根据配置创建结果存储后端"""
+        if config.results_backend == "sqlite":
+            export_file = config.results_file if config.export_text else None
+            return SQLiteResultStore(config.results_db, export_file, config.store_batch_size)
+        return TextResultStore(config.results_file)
+    
+    def write(self, result: ProcessResult):
+        """写入单条结果"""
+        self.write_many([result])
+    
+    @abstractmethod
+    def write_many(self, results: Iterable[ProcessResult]):
+        """批量写入结果"""
+    
+    @abstractmethod
+    def latest_successful(self) -> Dict[str, str]:
+        """返回每个编号最近一次成功跳转的URL"""
+    
+    def latest_for(self, shizu_id: str) -> Optional[str]:
+        """返回单个编号最近一次成功跳转的URL"""
+        return self.latest_successful().get(shizu_id)
+    
+    @abstractmethod
+    def iter_history(self) -> Iterator[ProcessResult]:
+        """按写入顺序遍历全部历史结果"""
+    
+    @abstractmethod
+    def iter_since(self, checkpoint: Optional[Dict]) -> Iterator[Tuple[ProcessResult, int]]:
+        """从检查点之后按写入顺序读取新增结果，同时返回每条结果之后的位置"""
+    
+    @abstractmethod
+    def checkpoint_at(self, position: int) -> Dict:
+        """把 iter_since 返回的位置换成可保存的检查点"""
+    
+    def is_durable(self) -> bool:
+        """已写入的结果是否都已提交到存储（没有仍在内存中的批次）"""
+        return True
+    
+    def flush(self):
+        """把缓存的结果写入存储"""
+    
+    def close(self):
+        """关闭存储"""
+        self.flush()
+
+
+class TextResultStore(ResultStore):
+    """文本结果文件后端（原有格式）"""
+    
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+    
+    def write_many(self, results: Iterable[ProcessResult]):
+        """批量写入结果"""
+        for result in results:
+            FileManager.write_result(self.filepath, result)
+    
+    def latest_successful(self) -> Dict[str, str]:
+        """返回每个编号最近一次成功跳转的URL"""
+        return ResultAnalyzer.load_results_from_file(self.filepath)
+    
+    def iter_history(self) -> Iterator[ProcessResult]:
+        """按写入顺序遍历全部历史结果"""
+        for result, _ in ResultAnalyzer.iter_results(self.filepath):
+            yield result
+    
+    def iter_since(self, checkpoint: Optional[Dict]) -> Iterator[Tuple[ProcessResult, int]]:
+        """从上次的字节偏移继续解析，位置为记录结束处的偏移；文件被截断或替换时从头读取"""
+        offset = ResultAnalyzer.resume_offset(self.filepath, checkpoint)
+        return ResultAnalyzer.iter_results(self.filepath, offset, include_partial=False)
+    
+    def checkpoint_at(self, position: int) -> Dict:
+        """按字节偏移生成检查点"""
+        return ResultAnalyzer.checkpoint_state(self.filepath, position)
+
+
+class SQLiteResultStore(ResultStore):
+    """SQLite结果存储，按编号和时间建立索引，并维护每个编号的最新成功跳转"""
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            shizu_id TEXT NOT NULL,
+            original_url TEXT,
+            redirect_url TEXT,
+            status TEXT NOT NULL,
+            message TEXT,
+            redirect_chain TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_results_shizu_time ON results (shizu_id, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_results_time ON results (timestamp);
+        CREATE TABLE IF NOT EXISTS latest_success (
+            shizu_id TEXT PRIMARY KEY,
+            redirect_url TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            result_id INTEGER NOT NULL
+        );
+    """
+    
+    def __init__(self, db_path: str, export_file: Optional[str] = None, batch_size: int = 50):
+        self.db_path = db_path
+        self.export_file = export_file
+        self.batch_size = max(batch_size, 1)
+        self.pending: List[ProcessResult] = []
+        self.lock = threading.Lock()
+        is_new = not os.path.exists(db_path)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.executescript(self.SCHEMA)
+        self._migrate()
+        
+        # 首次创建数据库时自动迁移已有的文本结果
+        if is_new and export_file and os.path.exists(export_file):
+            self.import_text_file(export_file)
+    
+    def _migrate(self):
+        """为旧版数据库补充新增的列"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(results)")}
+        if "redirect_chain" not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE results ADD COLUMN redirect_chain TEXT")
+    
+    def write(self, result: ProcessResult):
+        """缓存单条结果，攒够一批后统一提交"""
+        with self.lock:
+            self.pending.append(result)
+            if len(self.pending) < self.batch_size:
+                return
+            batch, self.pending = self.pending, []
+        self.write_many(batch)
+    
+    def write_many(self, results: Iterable[ProcessResult], export: bool = True):
+        """在一个事务中批量写入结果"""
+        results = list(results)
+        if not results:
+            return
+        with METRICS.timer("tracker_result_write_seconds", backend="sqlite"), self.lock, self.conn:
+            for result in results:
+                cursor = self.conn.execute(
+                    "INSERT INTO results (timestamp, shizu_id, original_url, redirect_url, status, message, "
+                    "redirect_chain) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (result.timestamp, result.shizu_id, result.original_url,
+                     result.redirect_url, result.status, result.message,
+                     json.dumps(result.redirect_chain) if result.redirect_chain else None))
+                if result.status == "success":
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO latest_success (shizu_id, redirect_url, timestamp, result_id) "
+                        "VALUES (?, ?, ?, ?)",
+                        (result.shizu_id, result.redirect_url, result.timestamp, cursor.lastrowid))
+        
+        if export and self.export_file:
+            for result in results:
+                FileManager.write_result(self.export_file, result)
+    
+    def latest_successful(self) -> Dict[str, str]:
+        """返回每个编号最近一次成功跳转的URL"""
+        self.flush()
+        with self.lock:
+            return dict(self.conn.execute("SELECT shizu_id, redirect_url FROM latest_success"))
+    
+    def latest_for(self, shizu_id: str) -> Optional[str]:
+        """按主键查询单个编号最近一次成功跳转的URL"""
+        self.flush()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT redirect_url FROM latest_success WHERE shizu_id = ?", (shizu_id,)).fetchone()
+        return row[0] if row else None
+    
+    def iter_history(self) -> Iterator[ProcessResult]:
+        """按写入顺序遍历全部历史结果"""
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT timestamp, shizu_id, original_url, redirect_url, status, message, redirect_chain "
+                "FROM results ORDER BY id").fetchall()
+        for *fields, redirect_chain in rows:
+            yield ProcessResult(*fields, redirect_chain=json.loads(redirect_chain) if redirect_chain else None)
+    
+    def iter_since(self, checkpoint: Optional[Dict], batch_size: int = 1000) -> Iterator[Tuple[ProcessResult, int]]:
+        """按自增主键分批读取检查点之后的结果，位置为结果的主键"""
+        self.flush()
+        last_id = (checkpoint or {}).get("result_id", 0)
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT id, timestamp, shizu_id, original_url, redirect_url, status, message, redirect_chain "
+                    "FROM results WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)).fetchall()
+            for last_id, *fields, redirect_chain in rows:
+                yield ProcessResult(*fields, redirect_chain=json.loads(redirect_chain) if redirect_chain else None), last_id
+            if len(rows) < batch_size:
+                return
+    
+    def checkpoint_at(self, position: int) -> Dict:
+        """按结果主键生成检查点"""
+        return {"result_id": position}
+    
+    def is_durable(self) -> bool:
+        """缓存批次是否已全部提交"""
+        with self.lock:
+            return not self.pending
+    
+    def count(self) -> int:
+        """返回已存储的结果条数"""
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    
+    def import_text_file(self, filepath: str) -> int:
+        """把文本结果文件一次性导入数据库，返回导入条数"""
+        if self.count():
+            logging.warning("数据库 %s 已有数据，跳过导入 %s", self.db_path, filepath)
+            return 0
+        
+        imported = 0
+        batch = []
+        for result, _ in ResultAnalyzer.iter_results(filepath):
+            batch.append(result)
+            if len(batch) >= 1000:
+                self.write_many(batch, export=False)
+                imported += len(batch)
+                batch = []
+        self.write_many(batch, export=False)
+        imported += len(batch)
+        logging.info("已从 %s 导入 %s 条结果到 %s", filepath, imported, self.db_path)
+        return imported
+    
+    def flush(self):
+        """提交缓存中的结果"""
+        with self.lock:
+            batch, self.pending = self.pending, []
+        self.write_many(batch)
+    
+    def close(self):
+        """提交缓存并关闭数据库"""
+        self.flush()
+        self.conn.close()
+
+
+class RedirectHistory:
+    """按编号保存跳转URL的有效区间 [valid_from, valid_to)，支持时间点和时间段查询；差异只按变化的区间生成"""
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS intervals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            shizu_id TEXT NOT NULL,
+            redirect_url TEXT NOT NULL,
+            previous_url TEXT,
+            valid_from TEXT NOT NULL,
+            valid_to TEXT,
+            last_seen TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_intervals_shizu_from ON intervals (shizu_id, valid_from);
+        CREATE INDEX IF NOT EXISTS idx_intervals_from ON intervals (valid_from);
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_intervals_current ON intervals (shizu_id) WHERE valid_to IS NULL;
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(self.SCHEMA)
+    
+    @classmethod
+    def from_config(cls, config: TrackerConfig) -> "RedirectHistory":
+        """根据配置打开跳转历史库"""
+        return cls(config.history_db)
+    
+    def _get_meta(self, key: str):
+        """读取元数据"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def _set_meta(self, key: str, value):
+        """写入元数据"""
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+    
+    def is_synced(self) -> bool:
+        """是否已从结果存储同步过"""
+        return self._get_meta("checkpoint") is not None
+    
+    def observe(self, shizu_id: str, redirect_url: str, timestamp: str) -> bool:
+        """记录一次成功探测；跳转URL变化时关闭当前区间并开始新区间，返回是否发生变化"""
+        row = self.conn.execute(
+            "SELECT id, redirect_url, last_seen FROM intervals WHERE shizu_id = ? AND valid_to IS NULL",
+            (shizu_id,)).fetchone()
+        if row is None:
+            self.conn.execute(
+                "INSERT INTO intervals (shizu_id, redirect_url, valid_from, last_seen) VALUES (?, ?, ?, ?)",
+                (shizu_id, redirect_url, timestamp, timestamp))
+            return False
+        
+        interval_id, current_url, last_seen = row
+        if timestamp < last_seen:
+            # 早于已记录的观测，结果文件被重新完整解析时会出现
+            return False
+        if redirect_url == current_url:
+            self.conn.execute("UPDATE intervals SET last_seen = ? WHERE id = ?", (timestamp, interval_id))
+            return False
+        self.conn.execute("UPDATE intervals SET valid_to = ? WHERE id = ?", (timestamp, interval_id))
+        self.conn.execute(
+            "INSERT INTO intervals (shizu_id, redirect_url, previous_url, valid_from, last_seen) "
+            "VALUES (?, ?, ?, ?, ?)", (shizu_id, redirect_url, current_url, timestamp, timestamp))
+        return True
+    
+    def sync(self, store: ResultStore) -> int:
+        """把结果存储中上次同步之后的新结果并入历史，与检查点在同一事务中提交，返回读取的记录数"""
+        processed = 0
+        position = None
+        with METRICS.timer("tracker_history_sync_seconds"), self.conn:
+            for result, position in store.iter_since(self._get_meta("checkpoint")):
+                processed += 1
+                if result.status == 'success':
+                    self.observe(result.shizu_id, result.redirect_url, result.timestamp)
+            if position is not None or not self.is_synced():
+                self._set_meta("checkpoint", store.checkpoint_at(position) if position is not None else {})
+        return processed
+    
+    @staticmethod
+    def normalize_time(value: Optional[str], end_of_day: bool = False) -> Optional[str]:
+        """只写了日期时补全为当天开始（或结束）的时间"""
+        if value and len(value) == 10:
+            return f"{value} {'23:59:59' if end_of_day else '00:00:00'}"
+        return value
+    
+    def value_at(self, shizu_id: str, when: str) -> Optional[str]:
+        """某个编号在指定时间点的跳转URL"""
+        row = self.conn.execute(
+            "SELECT redirect_url, valid_to FROM intervals WHERE shizu_id = ? AND valid_from <= ? "
+            "ORDER BY valid_from DESC, id DESC LIMIT 1", (shizu_id, when)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= when):
+            return None
+        return row[0]
+    
+    def intervals(self, shizu_id: str, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """某个编号与时间段 [start, end] 有交集的全部区间，按时间排序"""
+        rows = self.conn.execute(
+            "SELECT redirect_url, valid_from, valid_to, last_seen FROM intervals "
+            "WHERE shizu_id = ? AND valid_from <= ? AND (valid_to IS NULL OR valid_to > ?) "
+            "ORDER BY valid_from, id", (shizu_id, end or "9999", start or ""))
+        return [{"redirect_url": url, "valid_from": valid_from, "valid_to": valid_to, "last_seen": last_seen}
+                for url, valid_from, valid_to, last_seen in rows]
+    
+    def changes_between(self, start: str, end: str) -> List[Tuple[str, str, str, str]]:
+        """时间段 [start, end] 内发生的全部变化：(编号, 原URL, 新URL, 变化时间)"""
+        return self.conn.execute(
+            "SELECT shizu_id, previous_url, redirect_url, valid_from FROM intervals "
+            "WHERE valid_from BETWEEN ? AND ? AND previous_url IS NOT NULL ORDER BY valid_from, id",
+            (start, end)).fetchall()
+    
+    def changes_since(self, interval_id: int) -> List[Tuple[str, str, str, str]]:
+        """指定区间之后新产生的变化，按主键范围读取，耗时只与变化条数有关"""
+        return self.conn.execute(
+            "SELECT shizu_id, previous_url, redirect_url, valid_from FROM intervals "
+            "WHERE id > ? AND previous_url IS NOT NULL ORDER BY id", (interval_id,)).fetchall()
+    
+    def current(self) -> Dict[str, str]:
+        """每个编号当前的跳转URL"""
+        return dict(self.conn.execute("SELECT shizu_id, redirect_url FROM intervals WHERE valid_to IS NULL"))
+    
+    def last_interval_id(self) -> int:
+        """最新区间的主键"""
+        return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM intervals").fetchone()[0]
+    
+    def notified_id(self) -> Optional[int]:
+        """已通知到的区间主键，从未通知过时为None"""
+        return self._get_meta("notified")
+    
+    def mark_notified(self, interval_id: int):
+        """记录已通知到的区间"""
+        with self.conn:
+            self._set_meta("notified", interval_id)
+    
+    def close(self):
+        """关闭历史库"""
+        self.conn.close()
+
+
+class RevisitScheduler:
+    """根据各编号的历史变化频率安排重访：常变化的缩短间隔，稳定的按指数退避"""
+    
+    TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+    
+    def __init__(self, schedule_file: str, min_interval: int, max_interval: int):
+        self.schedule_file = schedule_file
+        self.min_interval = max(min_interval, 1)
+        self.max_interval = max(max_interval, self.min_interval)
+        self.entries: Dict[str, Dict] = FileManager.load_json(schedule_file) or {}
+        self.lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config: TrackerConfig, store: ResultStore) -> "RevisitScheduler":
+        """根据配置创建调度器，没有调度记录时从历史结果推算"""
+        scheduler = cls(config.schedule_file, config.revisit_min_interval, config.revisit_max_interval)
+        if not scheduler.entries:
+            scheduler.bootstrap(store.iter_history())
+        return scheduler
+    
+    def bootstrap(self, history: Iterable[ProcessResult]):
+        """按时间顺序回放历史成功结果，估计每个编号的变化频率"""
+        replayed = 0
+        for result in history:
+            if result.status != 'success':
+                continue
+            try:
+                observed_at = datetime.strptime(result.timestamp, self.TIME_FORMAT).timestamp()
+            except ValueError:
+                continue
+            self.observe(result.shizu_id, result.redirect_url, observed_at)
+            replayed += 1
+        logging.info("已从 %s 条历史结果推算 %s 个编号的重访间隔", replayed, len(self.entries))
+    
+    def observe(self, shizu_id: str, redirect_url: str, observed_at: Optional[float] = None):
+        """记录一次成功探测，按是否变化调整重访间隔"""
+        observed_at = observed_at if observed_at is not None else time.time()
+        with self.lock:
+            entry = self.entries.get(shizu_id)
+            if entry is None:
+                entry = {"url": redirect_url, "interval": self.min_interval,
+                         "checks": 1, "changes": 0, "first_seen": observed_at}
+            else:
+                changed = bool(ResultAnalyzer.compare_results(
+                    {shizu_id: entry["url"]}, {shizu_id: redirect_url}))
+                entry["checks"] += 1
+                entry["last_checked"] = observed_at
+                if changed:
+                    entry["changes"] += 1
+                    entry["interval"] = max(self.min_interval, entry["interval"] / 2)
+                else:
+                    # 退避不超过平均变化周期的一半，避免长期稳定后错过有规律的变化
+                    rate = self._rate(entry)
+                    ceiling = max(self.min_interval, 43200 / rate) if rate else self.max_interval
+                    entry["interval"] = min(self.max_interval, ceiling, entry["interval"] * 2)
+                entry["url"] = redirect_url
+            entry["last_checked"] = observed_at
+            entry["next_due"] = observed_at + entry["interval"]
+            self.entries[shizu_id] = entry
+    
+    def change_rate(self, shizu_id: str) -> float:
+        """估计的变化频率（次/天）"""
+        return self._rate(self.entries.get(shizu_id))
+    
+    def _rate(self, entry: Optional[Dict]) -> float:
+        """按调度记录估计变化频率（次/天）"""
+        if not entry or not entry["changes"]:
+            return 0.0
+        span = max(entry["last_checked"] - entry["first_seen"], self.min_interval)
+        return entry["changes"] * 86400 / span
+    
+    def plan(self, indices: Iterable[int], budget: int = 0, now: Optional[float] = None,
+             shizu_id: Callable[[int], str] = "shizu{}".format) -> List[int]:
+        """选出本轮到期的编号，按逾期程度加上距上次探测以来的预期变化次数排序，数量不超过预算；
+        shizu_id 把位置换成结果编号"""
+        now = now if now is not None else time.time()
+        due = []
+        for index in indices:
+            entry = self.entries.get(shizu_id(index))
+            if entry is None:
+                # 从未成功探测过的编号优先处理
+                priority = float("inf")
+            elif now >= entry["next_due"]:
+                # 变化越频繁的编号，同样逾期时越可能已经错过变化
+                priority = ((now - entry["next_due"]) / entry["interval"]
+                            + self._rate(entry) * (now - entry["last_checked"]) / 86400)
+            else:
+                continue
+            item = (priority, -index)
+            if budget <= 0 or len(due) < budget:
+                heapq.heappush(due, item)
+            elif item > due[0]:
+                heapq.heapreplace(due, item)
+        return [-negative_index for _, negative_index in sorted(due, reverse=True)]
+    
+    def save(self):
+        """保存调度状态"""
+        with self.lock:
+            data = dict(self.entries)
+        FileManager.save_json_atomic(self.schedule_file, data)
 
 
-class FileManager:
-    """文件管理器"""
+class ShardLeaseManager:
+    """基于共享目录的分片租约：多个进程或多台机器按租约领取编号区间，心跳续约，过期可被接管"""
     
-    @staticmethod
-    def ensure_file_exists(filepath: str, header: str):
-        """确保文件存在，如果不存在则创建"""
-        if not os.path.exists(filepath):
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(f"{header}\n\n")
+    def __init__(self, shard_dir: str, min_index: int, max_index: int, shard_size: int,
+                 lease_ttl: int, worker_id: str = ""):
+        self.shard_dir = shard_dir
+        self.min_index = min_index
+        self.max_index = max_index
+        self.shard_size = max(shard_size, 1)
+        self.lease_ttl = max(lease_ttl, 3)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        os.makedirs(shard_dir, exist_ok=True)
     
-    @staticmethod
-    def write_result(filepath: str, result: ProcessResult):
-        """写入处理结果到文件"""
-        with open(filepath, 'a', encoding='utf-8') as f:
-            f.write(f"时间戳: {result.timestamp}\n")
-            f.write(f"直连网站: {result.original_url}\n")
-            f.write(f"跳转网站: {result.redirect_url}\n")
-            f.write(f"shizu编号: {result.shizu_id}\n")
-            if result.message:
-                f.write(f"备注: {result.message}\n")
-            f.write("---\n")
+    @classmethod
+    def from_config(cls, config: TrackerConfig, target: WorkTarget) -> "ShardLeaseManager":
+        """根据配置创建某个追踪目标的租约管理器，分片区间按目标内的位置划分"""
+        return cls(target.shard_dir, target.first, target.last,
+                   config.shard_size, config.lease_ttl, config.worker_id)
     
-    @staticmethod
-    def load_progress(progress_file: str = "tracker_progress.json") -> Optional[Dict]:
-        """加载处理进度"""
+    def shards(self) -> Iterator[Tuple[int, int]]:
+        """按顺序列出全部分片区间"""
+        for start in range(self.min_index, self.max_index + 1, self.shard_size):
+            yield start, min(start + self.shard_size - 1, self.max_index)
+    
+    def _path(self, shard: Tuple[int, int], suffix: str) -> str:
+        """分片相关文件路径"""
+        return os.path.join(self.shard_dir, f"shard_{shard[0]:06d}_{shard[1]:06d}.{suffix}")
+    
+    def segment_path(self, shard: Tuple[int, int], owner: Optional[str] = None) -> str:
+        """分片结果段文件路径，每个持有者写入各自的结果段"""
+        return self._path(shard, f"{owner or self.worker_id}.results.txt")
+    
+    def is_done(self, shard: Tuple[int, int]) -> bool:
+        """分片是否已完成"""
+        return os.path.exists(self._path(shard, "done"))
+    
+    def _write_lease(self, path: str) -> bool:
+        """创建自己的租约文件：先写临时文件，再用硬链接原子地放到位，文件已存在时返回False"""
+        temp_file = f"{path}.{self.worker_id}.{threading.get_ident()}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({"owner": self.worker_id, "expires": time.time() + self.lease_ttl}, f)
         try:
-            if os.path.exists(progress_file):
-                with open(progress_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                logging.info(f"已加载进度: 上次处理到 {data.get('last_index', 'unknown')}")
-                return data
-        except Exception as e:
-            logging.error(f"加载进度时出错: {e}")
-        return None
+            os.link(temp_file, path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(temp_file)
     
-    @staticmethod
-    def save_progress(progress_file: str, current_index: int, consecutive_failures: int):
-        """保存处理进度"""
-        data = {
-            "last_index": current_index,
-            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            "consecutive_failures": consecutive_failures
-        }
+    def _swap_lease(self, path: str, expected: Callable[[Optional[Dict]], bool], renew: bool) -> bool:
+        """把租约文件改名移开，确认移开的正是预期的那份后删除（renew 时换上自己的新租约）；
+        不是预期的租约（已被他人抢先改写）时放回原处并返回False，保证同一时刻只有一个持有者"""
+        moved = f"{path}.{self.worker_id}.{threading.get_ident()}.swap"
         try:
-            with open(progress_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            logging.info(f"进度已保存: 当前处理到 shizu{current_index}")
-        except Exception as e:
-            logging.error(f"保存进度时出错: {e}")
-
-
-class ResultAnalyzer:
-    """结果分析器"""
+            os.rename(path, moved)
+        except OSError:
+            return False
+        if not expected(FileManager.load_json(moved)):
+            try:
+                os.link(moved, path)
+            except OSError:
+                # 改名期间已有其他进程新建了租约，以它为准
+                pass
+            os.remove(moved)
+            return False
+        os.remove(moved)
+        return self._write_lease(path) if renew else True
     
-    @staticmethod
-    def load_results_from_file(filepath: str) -> Dict[str, str]:
-        """从结果文件中加载最新结果"""
-        result_map = {}
-        if not os.path.exists(filepath):
-            return result_map
+    def _acquire_path(self, path: str, label: str) -> bool:
+        """领取租约文件，已过期的租约可被接管"""
+        if self._write_lease(path):
+            return True
+        
+        lease = FileManager.load_json(path)
+        if lease is not None and lease.get("expires", 0) > time.time():
+            return False
+        # 只有移开的文件与读到的过期租约完全一致（持有者和到期时间）才接管
+        if not self._swap_lease(path, lambda current: current == lease, renew=True):
+            return False
+        if lease is not None:
+            logging.warning("接管过期%s（原持有者 %s）", label, lease.get('owner'))
+        return True
+    
+    def _owns(self, lease: Optional[Dict]) -> bool:
+        """租约是否由自己持有"""
+        return bool(lease) and lease.get("owner") == self.worker_id
+    
+    def _renew_path(self, path: str) -> bool:
+        """续约；租约已被他人接管时返回False"""
+        if not self._owns(FileManager.load_json(path)):
+            return False
+        return self._swap_lease(path, self._owns, renew=True)
+    
+    def _release_path(self, path: str):
+        """释放自己持有的租约"""
+        if self._owns(FileManager.load_json(path)):
+            self._swap_lease(path, self._owns, renew=False)
+    
+    def _try_acquire(self, shard: Tuple[int, int]) -> bool:
+        """尝试领取分片租约，已过期的租约可被接管"""
+        return self._acquire_path(self._path(shard, "lease"), f"分片 {shard[0]}-{shard[1]}")
+    
+    def claim(self) -> Optional[Tuple[int, int]]:
+        """领取下一个未完成且未被占用的分片"""
+        for shard in self.shards():
+            if not self.is_done(shard) and self._try_acquire(shard):
+                return shard
+        return None
+    
+    def heartbeat(self, shard: Tuple[int, int]) -> bool:
+        """续约；租约已被他人接管时返回False"""
+        return self._renew_path(self._path(shard, "lease"))
+    
+    def complete(self, shard: Tuple[int, int]) -> bool:
+        """标记分片完成并释放租约；租约已被他人接管时返回False"""
+        if not self.heartbeat(shard):
+            return False
+        FileManager.save_json_atomic(self._path(shard, "done"),
+                                     {"owner": self.worker_id,
+                                      "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
+        self.release(shard)
+        return True
+    
+    def release(self, shard: Tuple[int, int]):
+        """释放自己持有的租约"""
+        self._release_path(self._path(shard, "lease"))
+    
+    def merge(self, store: "ResultStore") -> int:
+        """按分片顺序把已完成分片的结果段合并到结果存储，返回合并条数；全部合并后清理分片目录"""
+        # 合并锁与分片租约一样带持有者和到期时间，合并进程被强制结束后过期即可被接管
+        lock_path = os.path.join(self.shard_dir, "merge.lock")
+        if not self._acquire_path(lock_path, "合并锁"):
+            logging.warning("另一个进程正在合并分片，跳过")
+            return 0
         
+        merged = 0
+        all_merged = True
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            records = content.split('---')
-            for record in records:
-                record = record.strip()
-                if not record or '时间戳:' not in record:
+            for shard in self.shards():
+                if os.path.exists(self._path(shard, "merged")):
                     continue
-                
-                shizu_id, redirect_url = None, None
-                for line in record.split('\n'):
-                    line = line.strip()
-                    if line.startswith('shizu编号:'):
-                        shizu_id = line.split(':', 1)[1].strip()
-                    elif line.startswith('跳转网站:'):
-                        redirect_url = line.split(':', 1)[1].strip()
-                
-                # 只记录成功跳转的结果
-                if (shizu_id and redirect_url and 
-                    redirect_url not in ['触发反爬机制', '获取失败', '处理出错', '超过最大重试次数']):
-                    result_map[shizu_id] = redirect_url
-                    
-        except Exception as e:
-            logging.error(f"读取结果文件时出错: {e}")
+                if not self.is_done(shard):
+                    all_merged = False
+                    continue
+                owner = (FileManager.load_json(self._path(shard, "done")) or {}).get("owner")
+                results = [result for result, _ in ResultAnalyzer.iter_results(self.segment_path(shard, owner))]
+                store.write_many(results)
+                store.flush()
+                merged += len(results)
+                FileManager.save_json_atomic(self._path(shard, "merged"), {"records": len(results)})
+                if not self._renew_path(lock_path):
+                    logging.warning("合并锁已被其他进程接管，停止合并")
+                    return merged
             
-        return result_map
-    
-    @staticmethod
-    def compare_results(old_results: Dict[str, str], new_results: Dict[str, str]) -> List[Tuple[str, str, str]]:
-        """比较新旧结果，找出变化的网站"""
-        updated_sites = []
-        for shizu_id, new_url in new_results.items():
-            old_url = old_results.get(shizu_id)
-            if old_url and old_url != new_url:
-                updated_sites.append((shizu_id, old_url, new_url))
-        return updated_sites
+            if all_merged:
+                # 本轮全部分片已合并，清理状态以便开始下一轮
+                for name in os.listdir(self.shard_dir):
+                    if name.startswith("shard_") and name.endswith((".results.txt", ".done", ".merged")):
+                        os.remove(os.path.join(self.shard_dir, name))
+                logging.info("全部分片已合并，分片状态已清理")
+        finally:
+            self._release_path(lock_path)
+        
+        logging.info("已合并 %s 条分片结果", merged)
+        return merged
 
 
 class WebsiteTracker:
     """网站追踪器主类"""
     
+    METRICS_EXPORT_INTERVAL = 15.0  # 运行中刷新指标文件的间隔（秒）
+    WARM_UP_REDIRECT_HOSTS = 20  # 预热时最多预解析的跳转主机数
+    RETRY_QUEUE_LIMIT = 1000  # 延迟重试队列的最大长度，满时暂停领取新编号
+    
     def __init__(self, config: TrackerConfig):
         self.config = config
         self.retry_counts = {}
+        self._retry_after: Dict[int, float] = {}
         self.consecutive_failures = 0
+        self.rate_limiter: Optional[HostRateLimiter] = None
+        self._state_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._shutdown = threading.Event()
+        self._result_buffer: Optional[Dict[int, List[ProcessResult]]] = None
         self._setup_logging()
+        NetworkUtils.configure(config)
         
         # 确保必要文件存在
-        FileManager.ensure_file_exists(self.config.results_file, "=== 网站跳转结果记录 ===")
+        if self.config.results_backend != "sqlite" or self.config.export_text:
+            FileManager.ensure_file_exists(self.config.results_file, "=== 网站跳转结果记录 ===")
+        self.store = ResultStore.from_config(config)
+        self.scheduler: Optional[RevisitScheduler] = None
+        if self.config.schedule_mode == "adaptive":
+            self.scheduler = RevisitScheduler.from_config(config, self.store)
+        self._last_committed: Optional[int] = None
+        self.targets = WorkTarget.all_from_config(config)
+        self.target: Optional[WorkTarget] = None
+        self._target_budget: Optional[TokenBucket] = None
+        self.journal: Optional[ProgressJournal] = None
+        if self.config.metrics_port:
+            METRICS.serve(self.config.metrics_port)
+        self.rate_controller: Optional[AIMDController] = None
+        if self.config.adaptive_rate:
+            self.rate_controller = AIMDController.from_config(config, self._host_rate())
+        initial_rate = self.rate_controller.stats()["rate"] if self.rate_controller else self._host_rate()
+        # 各模式共用的主机限速器：并发模式的探测从中阻塞获取配额，顺序模式的探测只记账，标题等低优先级请求取用空闲配额
+        self.host_limiter = HostRateLimiter(initial_rate, config.host_burst)
+        NetworkUtils.host_limiter = self.host_limiter
+        NetworkUtils.stop_event = self._stop_event
+        self.proxy_pool = ProxyPool.from_config(config, initial_rate)
+        self._journal_pending: List[int] = []
+        self._warm_up_hosts: Optional[List[Tuple[str, int]]] = None
+        self._metrics_exported_at = time.monotonic()
+        self.title_enricher = TitleEnricher.from_config(config, self.host_limiter)
+        self.change_stream = ChangeStream.from_config(config)
         
     def _setup_logging(self):
         """设置日志"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(self.config.log_file, encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        LogPipeline.start(self.config)
     
-    def _create_result(self, shizu_id: str, original_url: str, redirect_url: str, status: str, message: str = None) -> ProcessResult:
+    def _create_result(self, shizu_id: str, original_url: str, redirect_url: str, status: str, message: str = None,
+                       redirect_chain: Optional[List[str]] = None) -> ProcessResult:
         """创建处理结果对象"""
         return ProcessResult(
             timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
@@ -343,32 +3248,91 @@ class WebsiteTracker:
             original_url=original_url,
             redirect_url=redirect_url,
             status=status,
-            message=message
+            message=message,
+            redirect_chain=redirect_chain
         )
     
-    def _wait_with_backoff(self, base_delay: float, multiplier: float = 1.0):
+    def _wait_with_backoff(self, base_delay: float, multiplier: float = 1.0, url: Optional[str] = None):
         """带退避算法的等待"""
         delay = min(base_delay * multiplier, 30.0)  # 最大等待30秒
-        logging.info(f"等待 {delay:.2f} 秒...")
-        time.sleep(delay)
+        reason = "backoff" if url else "delay"
+        if self.rate_limiter and url:
+            # 并发模式下暂停整个主机的令牌发放，而不是只阻塞当前线程
+            logging.info("暂停主机请求 %.2f 秒...", delay)
+            self.rate_limiter.pause(url, delay)
+            METRICS.inc("tracker_host_pause_seconds_total", delay)
+            return
+        logging.info("等待 %.2f 秒...", delay)
+        METRICS.observe("tracker_wait_seconds", delay, reason=reason)
+        METRICS.inc("tracker_sleep_seconds_total", delay, reason=reason)
+        self._shutdown.wait(delay)
+    
+    def _adjust_rate(self, outcome: str):
+        """把探测结果反馈给自适应速率控制器，并同步到主机限速器"""
+        controller = self.rate_controller
+        if controller is None:
+            return
+        if outcome == "success":
+            controller.on_success()
+        elif outcome == "anti_crawl":
+            controller.on_anti_crawl()
+        else:
+            controller.on_failure(outcome == "timeout")
+        
+        stats = controller.stats()
+        self.host_limiter.set_rate(stats["rate"])
+        if self.proxy_pool:
+            self.proxy_pool.set_rate(stats["rate"])
+        if stats["probes"] % 50 == 0:
+            self._log_rate_stats()
+    
+    def _log_rate_stats(self):
+        """输出自适应速率控制器的当前状态"""
+        stats = self.rate_controller.stats()
+        logging.info("自适应速率: %.3f 请求/秒，并发 %s，反爬命中率 %.2f%%，超时比例 %.2f%%",
+                     stats['rate'], stats['concurrency'],
+                     stats['anti_crawl_ratio'] * 100, stats['timeout_ratio'] * 100)
+    
+    def _record_result(self, index: int, result: ProcessResult):
+        """记录处理结果；并发模式下先缓存，编号完成后统一写入"""
+        METRICS.inc("tracker_results_total", status=result.status)
+        if self._result_buffer is None:
+            self.store.write(result)
+            return
+        with self._state_lock:
+            self._result_buffer.setdefault(index, []).append(result)
     
     def process_single_url(self, index: int) -> bool:
-        """处理单个URL，返回是否成功"""
-        url = f"{self.config.base_url}{index}"
-        shizu_id = f"shizu{index}"
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        """处理当前目标中某个位置的URL，返回是否成功"""
+        url = self.target.url(index)
+        shizu_id = self.target.shizu_id(index)
         
         # 检查重试次数
         retry_count = self.retry_counts.get(index, 0)
         if retry_count >= self.config.max_retries:
-            logging.warning(f"已达到最大重试次数 ({self.config.max_retries}) 对于 {shizu_id}，跳过...")
+            logging.warning("已达到最大重试次数 (%s) 对于 %s，跳过...", self.config.max_retries, shizu_id)
             result = self._create_result(shizu_id, url, "超过最大重试次数", "skipped")
-            FileManager.write_result(self.config.results_file, result)
+            self._record_result(index, result)
             return True  # 跳过算作处理完成
         
+        # 使用出口代理池时先为本次探测选择出口，所有出口都没有配额时在这里等待
+        proxy = None
+        if self.proxy_pool:
+            wait_start = time.perf_counter()
+            proxy = self.proxy_pool.acquire(url, self._stop_event)
+            METRICS.inc("tracker_sleep_seconds_total", time.perf_counter() - wait_start, reason="proxy_rate")
+            if proxy is None:
+                return False
+        
         try:
-            logging.info(f"处理 {url} (尝试 {retry_count + 1}/{self.config.max_retries})")
-            redirect_url = NetworkUtils.get_redirect_url(url)
+            logging.info("处理 %s (尝试 %s/%s)", url, retry_count + 1, self.config.max_retries,
+                         extra={"fields": {"event": "probe", "shizu_id": shizu_id, "attempt": retry_count + 1,
+                                           "proxy": proxy.name if proxy else None}})
+            try:
+                redirect_url = NetworkUtils.get_redirect_url(url, proxy.proxies if proxy else None)
+            finally:
+                if proxy:
+                    self.proxy_pool.report(proxy, NetworkUtils.last_probe_outcome())
             
             if redirect_url == "ANTI_CRAWL_DETECTED":
                 return self._handle_anti_crawl(index, url, shizu_id)
@@ -378,46 +3342,74 @@ class WebsiteTracker:
                 return self._handle_failure(index, url, shizu_id, "获取失败")
                 
         except Exception as e:
-            logging.error(f"处理URL时出错: {e}")
+            logging.error("处理URL时出错: %s", e)
             return self._handle_failure(index, url, shizu_id, "处理出错")
     
     def _handle_anti_crawl(self, index: int, url: str, shizu_id: str) -> bool:
         """处理反爬机制"""
-        self.consecutive_failures += 1
-        self.retry_counts[index] = self.retry_counts.get(index, 0) + 1
+        with self._state_lock:
+            self.consecutive_failures += 1
+            self.retry_counts[index] = self.retry_counts.get(index, 0) + 1
+            consecutive_failures = self.consecutive_failures
+        if self.journal:
+            self.journal.record_retry(index, self.retry_counts[index], consecutive_failures)
         
-        logging.warning(f"检测到反爬机制，连续失败: {self.consecutive_failures}")
+        logging.warning("检测到反爬机制，连续失败: %s", consecutive_failures,
+                        extra={"fields": {"event": "anti_crawl", "shizu_id": shizu_id,
+                                          "consecutive_failures": consecutive_failures}})
+        self._adjust_rate("anti_crawl")
         
         result = self._create_result(shizu_id, url, "触发反爬机制", "retry_needed")
-        FileManager.write_result(self.config.results_file, result)
+        self._record_result(index, result)
         
-        # 使用退避算法等待
-        wait_factor = min(self.consecutive_failures, 1.5)
+        # 该编号推迟到反爬等待时间之后再重试；连续触发说明整个主机受限，再用退避算法暂停主机请求
+        # （使用出口代理池时只冷却触发反爬的出口，其他出口照常工作）
+        wait_factor = min(consecutive_failures, 1.5)
         base_delay = random.uniform(self.config.anti_crawl_wait_min, self.config.anti_crawl_wait_max)
-        self._wait_with_backoff(base_delay, wait_factor)
+        with self._state_lock:
+            self._retry_after[index] = min(base_delay * wait_factor, 30.0)
+        if consecutive_failures > 1 and self.proxy_pool is None:
+            self._wait_with_backoff(base_delay, wait_factor, url)
         
         return False  # 需要重试
     
     def _handle_success(self, index: int, url: str, shizu_id: str, redirect_url: str) -> bool:
         """处理成功情况"""
-        self.consecutive_failures = 0
-        self.retry_counts[index] = 0
+        with self._state_lock:
+            self.consecutive_failures = 0
+            self.retry_counts[index] = 0
         
-        result = self._create_result(shizu_id, url, redirect_url, "success")
-        FileManager.write_result(self.config.results_file, result)
+        result = self._create_result(shizu_id, url, redirect_url, "success",
+                                     redirect_chain=NetworkUtils.last_probe_chain())
+        self._record_result(index, result)
+        self._adjust_rate("success")
+        if self.scheduler:
+            self.scheduler.observe(shizu_id, redirect_url)
+        # 没有跳转时最终URL就是源站探测地址，不为它获取标题
+        if self.title_enricher and redirect_url != url:
+            self.title_enricher.submit(redirect_url)
+        if self.change_stream:
+            self.change_stream.observe(self.target.name, shizu_id, url, redirect_url, result.timestamp)
         
-        logging.info(f"已记录: {shizu_id} -> {redirect_url}")
+        logging.info("已记录: %s -> %s", shizu_id, redirect_url,
+                     extra={"fields": {"event": "recorded", "shizu_id": shizu_id, "redirect_url": redirect_url}})
         return True
     
     def _handle_failure(self, index: int, url: str, shizu_id: str, error_type: str) -> bool:
         """处理失败情况"""
-        self.retry_counts[index] = self.retry_counts.get(index, 0) + 1
-        logging.warning(f"无法获取重定向URL: {url} - {error_type}")
+        with self._state_lock:
+            self.retry_counts[index] = self.retry_counts.get(index, 0) + 1
+            retry_count = self.retry_counts[index]
+        if self.journal:
+            self.journal.record_retry(index, retry_count, self.consecutive_failures)
+        logging.warning("无法获取重定向URL: %s - %s", url, error_type,
+                        extra={"fields": {"event": "probe_failed", "shizu_id": shizu_id, "error": error_type}})
+        self._adjust_rate("timeout" if NetworkUtils.last_probe_timed_out() else "failure")
         
         result = self._create_result(shizu_id, url, error_type, "failed")
-        FileManager.write_result(self.config.results_file, result)
+        self._record_result(index, result)
         
-        if self.retry_counts[index] >= self.config.max_retries:
+        if retry_count >= self.config.max_retries:
             return True  # 达到最大重试次数，算作完成
         
         return False  # 需要重试
@@ -425,124 +3417,963 @@ class WebsiteTracker:
     def run(self):
         """运行追踪器"""
         logging.info("开始运行网站追踪器...")
+        run_start = time.perf_counter()
         
-        # 加载进度
-        progress = FileManager.load_progress()
-        start_index = (progress['last_index'] + 1 
-                      if progress and progress['last_index'] < self.config.max_index 
-                      else self.config.min_index)
-        self.consecutive_failures = progress['consecutive_failures'] if progress else 0
-        
-        print(f"开始处理：从 shizu{start_index} 到 shizu{self.config.max_index}")
-        
+        self._warm_up()
+        if self.title_enricher:
+            self.title_enricher.start()
+        if self.change_stream:
+            self.change_stream.start(self.store)
         try:
-            current_index = start_index
-            while current_index <= self.config.max_index:
-                success = self.process_single_url(current_index)
-                
-                if success:
-                    # 处理成功，移动到下一个
-                    if current_index % 5 == 0:
-                        FileManager.save_progress("tracker_progress.json", current_index, self.consecutive_failures)
-                    
-                    # 随机延迟
-                    delay = random.uniform(self.config.min_delay, self.config.max_delay)
-                    self._wait_with_backoff(delay)
-                    
-                    current_index += 1
-                # 如果失败，会在下次循环中重试同一个URL
-                
+            for target in self.targets:
+                if self._shutdown.is_set():
+                    break
+                self._run_target(target)
         except KeyboardInterrupt:
             logging.info("检测到用户中断，保存进度后退出...")
-            FileManager.save_progress("tracker_progress.json", current_index - 1, self.consecutive_failures)
-            print(f"\n程序已暂停。下次运行时将从 shizu{current_index} 继续。")
+            if self.scheduler:
+                print("\n程序已暂停。调度状态已保存，下次运行时继续处理到期的编号。")
+            else:
+                self._close_journal()
+                if self.target is not None and self.journal is not None:
+                    print(f"\n程序已暂停。下次运行时将从 {self.target.shizu_id(self.journal.last_index + 1)} 继续。")
+                else:
+                    # 中断发生在加载当前目标的进度之前
+                    print("\n程序已暂停。进度已保存，下次运行时从中断处继续。")
             sys.exit(0)
+        finally:
+            self._close_journal()
+            if self.title_enricher:
+                self.title_enricher.close()
+            if self.change_stream:
+                self.change_stream.close()
+            if NetworkUtils.response_cache:
+                NetworkUtils.response_cache.save()
+            if self.scheduler:
+                self.scheduler.save()
+            if self.rate_controller:
+                self.rate_controller.save()
         
+        if self.rate_controller:
+            self._log_rate_stats()
+        cache = NetworkUtils.response_cache
+        if cache:
+            cache_stats = cache.stats()
+            logging.info("响应缓存统计: 命中 %s 次，条件请求未变化 %s 次，未命中 %s 次，缓存条目 %s 个",
+                         cache_stats['hits'], cache_stats['revalidated'], cache_stats['misses'], cache_stats['entries'])
+        if NetworkUtils.dns_cache:
+            dns_stats = NetworkUtils.dns_cache.stats()
+            logging.info("DNS缓存统计: 实际解析 %s 次，命中 %s 次，解析累计耗时 %.3f 秒",
+                         dns_stats['lookups'], dns_stats['hits'], dns_stats['resolve_seconds'])
+        if NetworkUtils.hop_cache:
+            hop_stats = NetworkUtils.hop_cache.stats()
+            logging.info("跳转链缓存统计: 命中 %s 次，合并并发请求 %s 次，实际请求 %s 次，缓存条目 %s 个",
+                         hop_stats['hits'], hop_stats['coalesced'], hop_stats['misses'], hop_stats['entries'])
+        if self.proxy_pool:
+            for proxy_stats in self.proxy_pool.stats():
+                logging.info("出口 %s 统计: 请求 %s 次，触发反爬 %s 次，请求失败 %s 次，健康分 %.2f",
+                             proxy_stats['name'], proxy_stats['requests'], proxy_stats['anti_crawl_hits'],
+                             proxy_stats['failures'], proxy_stats['health'])
+        pool_stats = NetworkUtils.get_session_pool().stats()
+        logging.info("连接池统计: 请求 %s 次，新建连接 %s 个，复用连接 %s 次",
+                     pool_stats['requests'], pool_stats['new_connections'], pool_stats['reused_connections'])
+        METRICS.inc("tracker_run_seconds_total", time.perf_counter() - run_start)
+        self._export_metrics()
         logging.info("网站追踪完成!")
+    
+    def request_stop(self):
+        """请求停止：当前编号处理完后结束本轮，进度照常保存"""
+        self._shutdown.set()
+        self._stop_event.set()
+    
+    def _reset_stop(self):
+        """开始新的处理段前清除停止标志；已请求停止时保持"""
+        if not self._shutdown.is_set():
+            self._stop_event.clear()
+    
+    def _select_target(self, target: WorkTarget):
+        """切换当前追踪目标，按目标配置的速率预算限速"""
+        self.target = target
+        # 上一个目标的完成日志已在其处理结束时关闭，不能再用来描述当前目标的进度
+        self.journal = None
+        self.retry_counts = {}
+        self._retry_after = {}
+        self._target_budget = TokenBucket(target.rate) if target.rate > 0 else None
+    
+    def _acquire_target_budget(self) -> bool:
+        """等待当前目标的速率预算；被停止时返回False"""
+        if self._target_budget is None:
+            return True
+        wait_start = time.perf_counter()
+        acquired = self._target_budget.acquire(self._stop_event)
+        METRICS.inc("tracker_sleep_seconds_total", time.perf_counter() - wait_start, reason="target_rate")
+        return acquired
+    
+    def _run_target(self, target: WorkTarget):
+        """处理一个追踪目标，进度按目标分别保存"""
+        self._select_target(target)
+        if self.scheduler:
+            # 自适应调度：只处理到期的编号，按逾期程度排序
+            progress = FileManager.load_progress(target.progress_file)
+            self.consecutive_failures = progress['consecutive_failures'] if progress else 0
+            indices = self.scheduler.plan(target.positions(), self.config.sweep_budget, shizu_id=target.shizu_id)
+            print(f"自适应调度：目标 {target.name} 本轮计划处理 {len(indices)} 个编号")
+        else:
+            # 加载进度：进度文件加上完成日志重建中断前的精确状态
+            self.journal = ProgressJournal.from_config(self.config, target)
+            if self.journal.last_index >= target.last:
+                self.journal.reset(target.first)
+            self.consecutive_failures = self.journal.consecutive_failures
+            self.retry_counts = dict(self.journal.retry_counts)
+            start_index = self.journal.last_index + 1
+            already_done = set(self.journal.completed)
+            self._last_committed = start_index - 1
+            indices = (index for index in target.positions(start_index) if index not in already_done)
+            print(f"开始处理：从 {target.shizu_id(start_index)} 到 {target.shizu_id(target.last)}")
+        
+        try:
+            if self.config.concurrency > 1:
+                self._run_concurrent(indices)
+            else:
+                self._run_sequential(indices)
+        finally:
+            self._close_journal()
+    
+    def _warm_up(self):
+        """预先为各目标的基础主机建立连接；开启跳转链解析时再预解析上次结果中最常见的跳转主机"""
+        if not self.config.warm_up:
+            return
+        start = time.perf_counter()
+        opened = 0
+        warmed_hosts = set()
+        # 使用出口代理池时探测都经由代理发出，不直连预热，避免暴露本机出口地址
+        if self.proxy_pool is None:
+            for target in self.targets:
+                first_url = target.url(target.first)
+                parsed = urlparse(first_url)
+                if (parsed.scheme, parsed.netloc) in warmed_hosts:
+                    continue
+                warmed_hosts.add((parsed.scheme, parsed.netloc))
+                opened += NetworkUtils.get_session_pool().warm(first_url, self.config.concurrency)
+        
+        resolved = 0
+        if NetworkUtils.dns_cache and NetworkUtils.hop_cache:
+            if self._warm_up_hosts is None:
+                # 统计一次即可，常驻模式下后续轮次沿用，不再重新读取全部结果
+                hosts = Counter()
+                for redirect_url in self.store.latest_successful().values():
+                    parsed = urlparse(redirect_url)
+                    if parsed.hostname:
+                        hosts[(parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80))] += 1
+                self._warm_up_hosts = [host for host, _ in hosts.most_common(self.WARM_UP_REDIRECT_HOSTS)]
+            for hostname, port in self._warm_up_hosts:
+                try:
+                    NetworkUtils.dns_cache.getaddrinfo(hostname, port, 0, socket.SOCK_STREAM)
+                    resolved += 1
+                except OSError as e:
+                    logging.warning("预解析 %s 失败: %s", hostname, e)
+        
+        elapsed = time.perf_counter() - start
+        METRICS.observe("tracker_warm_up_seconds", elapsed)
+        logging.info("预热完成: 建立 %s 个连接，预解析跳转主机 %s 个，耗时 %.3f 秒", opened, resolved, elapsed)
+    
+    def _export_metrics(self):
+        """刷新连接池、缓存和速率仪表并写出指标文件"""
+        for name, value in NetworkUtils.get_session_pool().stats().items():
+            METRICS.set_gauge("tracker_pool_connections", value, kind=name)
+        if NetworkUtils.response_cache:
+            for name, value in NetworkUtils.response_cache.stats().items():
+                METRICS.set_gauge("tracker_response_cache", value, kind=name)
+        if NetworkUtils.dns_cache:
+            for name, value in NetworkUtils.dns_cache.stats().items():
+                METRICS.set_gauge("tracker_dns_cache", value, kind=name)
+        if self.rate_controller:
+            stats = self.rate_controller.stats()
+            METRICS.set_gauge("tracker_rate_requests_per_second", stats["rate"])
+            METRICS.set_gauge("tracker_anti_crawl_ratio", stats["anti_crawl_ratio"])
+        METRICS.write_textfile(self.config.metrics_file)
+        self._metrics_exported_at = time.monotonic()
+    
+    def _checkpoint(self, index: int, position: int):
+        """某个编号完成后记录进度；结果仍在存储的内存批次中时，延后到提交后再写入完成日志"""
+        self._last_committed = index
+        if self.scheduler:
+            if position % 5 == 0:
+                self.scheduler.save()
+        elif self.journal:
+            self._journal_pending.append(index)
+            if self.store.is_durable():
+                self._commit_journal()
+        if time.monotonic() - self._metrics_exported_at >= self.METRICS_EXPORT_INTERVAL:
+            self._export_metrics()
+    
+    def _commit_journal(self):
+        """把结果已落盘的编号写入完成日志"""
+        for index in self._journal_pending:
+            self.journal.record_done(index, self.consecutive_failures)
+        self._journal_pending = []
+    
+    def _close_journal(self):
+        """提交结果存储和完成日志，并压缩到进度文件"""
+        self.store.flush()
+        if self.journal and not self.journal.file.closed:
+            self._commit_journal()
+            self.journal.close()
+    
+    def _retry_delay(self, index: int) -> float:
+        """编号下次重试前的等待时间：触发反爬时为反爬等待时间，否则以 retry_delay 为基数按已重试次数指数增长，最长30秒"""
+        with self._state_lock:
+            delay = self._retry_after.pop(index, None)
+        if delay is not None:
+            return delay
+        retry_count = max(self.retry_counts.get(index, 1), 1)
+        return min(self.config.retry_delay * 2 ** (retry_count - 1), 30.0) * random.uniform(0.8, 1.2)
+    
+    @staticmethod
+    def _next_index(retries: RetryQueue, pending_indices: Iterator[int], exhausted: bool) -> Tuple[Optional[int], bool]:
+        """优先取已到期的重试，否则取下一个新编号；返回 (编号, 新编号是否已取完)"""
+        index = retries.pop_ready()
+        if index is not None or exhausted or retries.is_full():
+            return index, exhausted
+        index = next(pending_indices, None)
+        return index, index is None
+    
+    def _run_sequential(self, indices: Iterable[int]):
+        """逐个编号顺序处理；失败的编号进入延迟重试队列，不阻塞后面的编号"""
+        retries = RetryQueue(self.RETRY_QUEUE_LIMIT)
+        pending_indices = iter(indices)
+        exhausted = False
+        position = 0
+        while not self._stop_event.is_set():
+            current_index, exhausted = self._next_index(retries, pending_indices, exhausted)
+            if current_index is None:
+                if not retries:
+                    break
+                # 新编号已取完（或重试队列已满），等待最早的重试到期
+                self._stop_event.wait(retries.wait_time())
+                continue
+            if not self._acquire_target_budget():
+                break
+            if self.proxy_pool is None:
+                # 顺序模式由随机延迟控制节奏，这里只把探测记入主机配额，让标题获取等低优先级请求让出
+                self.host_limiter.reserve(self.target.url(current_index))
+            
+            if self.process_single_url(current_index):
+                position += 1
+                self._checkpoint(current_index, position)
+            else:
+                retries.push(current_index, self._retry_delay(current_index))
+            
+            # 随机延迟；启用自适应速率时按当前速率间隔请求；使用出口代理池时由各出口的配额控制节奏
+            if self.proxy_pool:
+                continue
+            if self.rate_controller:
+                delay = random.uniform(0.8, 1.2) / self.rate_controller.stats()["rate"]
+            else:
+                delay = random.uniform(self.config.min_delay, self.config.max_delay)
+            self._wait_with_backoff(delay)
+    
+    def run_shard_worker(self):
+        """分片工作模式：按目标依次循环领取分片租约，处理结果写入分片结果段，直到没有可领取的分片"""
+        main_store = self.store
+        worker_id = self.config.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        logging.info("分片工作进程 %s 启动", worker_id)
+        self._warm_up()
+        if self.title_enricher:
+            self.title_enricher.start()
+        if self.change_stream:
+            self.change_stream.start(self.store)
+        
+        manager = None
+        shard = None
+        try:
+            for target in self.targets:
+                self._select_target(target)
+                manager = ShardLeaseManager.from_config(self.config, target)
+                while not self._shutdown.is_set():
+                    shard = manager.claim()
+                    if shard is None:
+                        break
+                    self._process_shard(manager, shard)
+                    shard = None
+        except KeyboardInterrupt:
+            logging.info("检测到用户中断，释放分片租约后退出...")
+            if shard is not None:
+                manager.release(shard)
+            sys.exit(0)
+        finally:
+            self.store = main_store
+            if self.title_enricher:
+                self.title_enricher.close()
+            if self.change_stream:
+                self.change_stream.close()
+            if NetworkUtils.response_cache:
+                NetworkUtils.response_cache.save()
+        
+        logging.info("分片工作进程 %s 没有可领取的分片，退出", worker_id)
+    
+    def _process_shard(self, manager: ShardLeaseManager, shard: Tuple[int, int]):
+        """处理当前目标中领取到的一个分片，期间后台线程续约"""
+        first_id, last_id = self.target.shizu_id(shard[0]), self.target.shizu_id(shard[1])
+        logging.info("领取分片 %s - %s", first_id, last_id)
+        
+        # 重新开始该分片，结果段按持有者区分，之前持有者留下的不完整结果段不会被合并
+        segment = manager.segment_path(shard)
+        with open(segment, 'w', encoding='utf-8') as f:
+            f.write("=== 分片结果段 ===\n\n")
+        self.store = TextResultStore(segment)
+        self._reset_stop()
+        lease_lost = threading.Event()
+        heartbeat_stop = threading.Event()
+        
+        def keep_alive():
+            while not heartbeat_stop.wait(manager.lease_ttl / 3):
+                if not manager.heartbeat(shard):
+                    logging.warning("分片 %s - %s 的租约已丢失，停止处理", first_id, last_id)
+                    lease_lost.set()
+                    self._stop_event.set()
+                    return
+        
+        heartbeat = threading.Thread(target=keep_alive, daemon=True)
+        heartbeat.start()
+        try:
+            indices = range(shard[0], shard[1] + 1)
+            if self.config.concurrency > 1:
+                self._run_concurrent(indices)
+            else:
+                self._run_sequential(indices)
+        finally:
+            heartbeat_stop.set()
+            heartbeat.join()
+        
+        if lease_lost.is_set() or not manager.complete(shard):
+            return
+        logging.info("分片 %s - %s 已完成", first_id, last_id)
+    
+    def _host_rate(self) -> float:
+        """每个主机每秒允许的请求数，未配置时按平均延迟换算"""
+        if self.config.host_rate > 0:
+            return self.config.host_rate
+        average_delay = (self.config.min_delay + self.config.max_delay) / 2
+        return 1.0 / average_delay if average_delay > 0 else 1000.0
+    
+    def _process_once(self, index: int) -> bool:
+        """工作线程：按目标速率预算和主机限速处理一次编号，返回是否完成"""
+        if not self._acquire_target_budget():
+            return False
+        if self.proxy_pool:
+            # 出口代理池按出口分别限速，在 process_single_url 中选择出口
+            return self.process_single_url(index)
+        wait_start = time.perf_counter()
+        acquired = self.rate_limiter.acquire(self.target.url(index), self._stop_event)
+        METRICS.inc("tracker_sleep_seconds_total", time.perf_counter() - wait_start, reason="rate_limit")
+        if not acquired:
+            return False
+        return self.process_single_url(index)
+    
+    def _flush_results(self, index: int):
+        """按顺序写出某个编号缓存的全部结果"""
+        with self._state_lock:
+            results = self._result_buffer.pop(index, [])
+        self.store.write_many(results)
+    
+    def _run_concurrent(self, indices: Iterable[int]):
+        """使用有界线程池并发处理，按主机令牌桶限速；失败的编号进入延迟重试队列，完成的编号随即落盘"""
+        concurrency = self.config.concurrency
+        rate = self.rate_controller.stats()["rate"] if self.rate_controller else self._host_rate()
+        self.host_limiter.set_rate(rate)
+        self.rate_limiter = self.host_limiter
+        self._result_buffer = {}
+        self._reset_stop()
+        retries = RetryQueue(self.RETRY_QUEUE_LIMIT)
+        
+        logging.info("并发模式: %s 个工作线程，每主机 %.3f 请求/秒", concurrency, rate)
+        
+        pending_indices = iter(indices)
+        exhausted = False
+        position = 0
+        futures = {}
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        try:
+            while not self._stop_event.is_set():
+                limit = self.rate_controller.concurrency_limit() if self.rate_controller else concurrency
+                while len(futures) < limit:
+                    index, exhausted = self._next_index(retries, pending_indices, exhausted)
+                    if index is None:
+                        break
+                    futures[executor.submit(self._process_once, index)] = index
+                
+                if not futures:
+                    if not retries:
+                        break
+                    # 新编号已取完（或重试队列已满），等待最早的重试到期
+                    self._stop_event.wait(retries.wait_time())
+                    continue
+                timeout = max(min(retries.wait_time(), 1.0), 0.01) if retries and len(futures) < limit else 1.0
+                done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = futures.pop(future)
+                    if future.result():
+                        # 该编号全部尝试的结果一并写出后再保存进度
+                        self._flush_results(index)
+                        position += 1
+                        self._checkpoint(index, position)
+                    elif not self._stop_event.is_set():
+                        retries.push(index, self._retry_delay(index))
+        except KeyboardInterrupt:
+            self._stop_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+            # 停止时仍在处理的编号已经探测完毕，结果照常写出，完成的编号保存进度
+            for future, index in futures.items():
+                if future.cancelled() or future.exception() is not None or not future.result():
+                    continue
+                self._flush_results(index)
+                position += 1
+                self._checkpoint(index, position)
+            # 尚未完成的编号之前各次尝试的结果也写出，与顺序模式一致
+            for index in list(self._result_buffer):
+                self._flush_results(index)
+            self._result_buffer = None
+            self.rate_limiter = None
 
 
 class UpdateNotifier:
     """更新通知器"""
     
-    def __init__(self, config: TrackerConfig):
+    LEGACY_SNAPSHOT_FILE = 'website_results_snapshot.json'
+    
+    def __init__(self, config: TrackerConfig, store: Optional[ResultStore] = None):
         self.config = config
-        self.snapshot_file = 'website_results_snapshot.json'
         self.update_notice_file = 'website_update_notice.txt'
+        # 与追踪器同进程时共用它的结果库，不再对同一个数据库打开第二个连接
+        self.store = store or ResultStore.from_config(config)
+        self.history = RedirectHistory.from_config(config)
+        self.targets = {target.name: target for target in WorkTarget.all_from_config(config)}
         
         # 确保更新通知文件存在
         FileManager.ensure_file_exists(self.update_notice_file, "=== 网站更新差异记录 ===")
     
     def check_and_notify_updates(self):
         """检查并通知更新"""
-        # 读取上次快照
-        old_results = self._load_snapshot()
-        
-        # 读取本次最新结果
-        new_results = ResultAnalyzer.load_results_from_file(self.config.results_file)
+        with METRICS.timer("tracker_notifier_seconds"):
+            self._check_and_notify_updates()
+        METRICS.write_textfile(self.config.metrics_file)
+    
+    def _check_and_notify_updates(self):
+        """把新结果并入跳转历史，按上次通知之后产生的区间写入更新通知"""
+        synced = self.history.sync(self.store)
+        logging.info("跳转历史: 新增 %s 条结果记录", synced)
         
-        # 比较结果
-        updated_sites = ResultAnalyzer.compare_results(old_results, new_results)
+        notified_id = self.history.notified_id()
+        if notified_id is None:
+            updated_sites = self._migrate_snapshot()
+        else:
+            updated_sites = self.history.changes_since(notified_id)
         
+        METRICS.inc("tracker_updates_detected_total", len(updated_sites))
         if updated_sites:
             self._write_update_notice(updated_sites)
             print(f"检测到 {len(updated_sites)} 个网站有更新，详情见 {self.update_notice_file}")
-            logging.info(f"检测到 {len(updated_sites)} 个网站有更新，详情见 {self.update_notice_file}")
+            logging.info("检测到 %s 个网站有更新，详情见 %s", len(updated_sites), self.update_notice_file)
         else:
             print("本次未检测到网站跳转URL变化。")
             logging.info("本次未检测到网站跳转URL变化。")
         
-        # 更新快照
-        self._save_snapshot(new_results)
-    
-    def _load_snapshot(self) -> Dict[str, str]:
-        """加载快照"""
-        if os.path.exists(self.snapshot_file):
-            try:
-                with open(self.snapshot_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                logging.error(f"读取快照文件时出错: {e}")
-        return {}
+        self.history.mark_notified(self.history.last_interval_id())
     
-    def _save_snapshot(self, results: Dict[str, str]):
-        """保存快照"""
+    def _migrate_snapshot(self) -> List[Tuple[str, str, str, str]]:
+        """首次通知时以当前历史为基线，用旧版快照找出上次通知之后的变化；没有旧快照时不产生通知"""
+        if not os.path.exists(self.LEGACY_SNAPSHOT_FILE):
+            return []
         try:
-            with open(self.snapshot_file, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
+            with open(self.LEGACY_SNAPSHOT_FILE, 'r', encoding='utf-8') as f:
+                old_results = json.load(f)
         except Exception as e:
-            logging.error(f"保存快照文件时出错: {e}")
+            logging.error("读取快照文件时出错: %s", e)
+            return []
+        logging.info("已从旧版快照 %s 迁移到跳转历史 %s", self.LEGACY_SNAPSHOT_FILE, self.config.history_db)
+        updated_sites = ResultAnalyzer.compare_results(old_results, self.history.current())
+        return [(shizu_id, old_url, new_url, self.history.intervals(shizu_id)[-1]["valid_from"])
+                for shizu_id, old_url, new_url in updated_sites]
     
-    def _write_update_notice(self, updated_sites: List[Tuple[str, str, str]]):
-        """写入更新通知"""
+    def _write_update_notice(self, updated_sites: List[Tuple[str, str, str, str]]):
+        """写入更新通知，每项为 (编号, 原URL, 新URL, 变化时间)"""
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        titles = (FileManager.load_json(self.config.title_cache_file) if self.config.title_cache_file else None) or {}
         
         with open(self.update_notice_file, 'a', encoding='utf-8') as f:
             f.write(f"\n==== {timestamp} 检测到更新 ====\n\n")
             
-            for shizu_id, old_url, new_url in updated_sites:
-                shizu_num = shizu_id.replace('shizu', '')
-                original_url = f"{self.config.base_url}{shizu_num}"
+            for shizu_id, old_url, new_url, changed_at in updated_sites:
+                # 按编号前缀找回所属目标，还原该目标的直连网址
+                name, shizu_num = WorkTarget.split_id(shizu_id)
+                target = self.targets.get(name)
+                original_url = f"{target.base_url if target else self.config.base_url}{shizu_num}"
                 
                 f.write(f"时间戳: {timestamp}\n")
+                if self.config.targets:
+                    f.write(f"追踪目标: {name}\n")
                 f.write(f"直连网站: {original_url}\n")
                 f.write(f"跳转网站: {new_url}\n")
                 f.write(f"shizu编号: {shizu_id}\n")
                 f.write(f"变化说明: 从 {old_url} 更新到 {new_url}\n")
+                f.write(f"变化时间: {changed_at}\n")
+                if new_url in titles:
+                    f.write(f"页面标题: {titles[new_url]}\n")
                 f.write("---\n")
 
 
+class NotificationSink(ABC):
+    """变化通知的投递目标基类：deliver 失败时抛出异常，由 SinkWorker 负责重试"""
+    
+    SEND_TIMEOUT = 5.0  # 单次投递的超时（秒）
+    
+    def __init__(self, spec: str):
+        self.name = spec
+    
+    @staticmethod
+    def from_spec(spec: str) -> "NotificationSink":
+        """按配置项创建：stdout、http(s)://URL、unix:套接字路径、file:队列目录"""
+        if spec == "stdout":
+            return StdoutSink(spec)
+        if spec.startswith(("http://", "https://")):
+            return WebhookSink(spec)
+        if spec.startswith("unix:"):
+            return UnixSocketSink(spec)
+        if spec.startswith("file:"):
+            return FileQueueSink(spec)
+        raise ValueError(f"无法识别的通知目标: {spec}")
+    
+    @abstractmethod
+    def deliver(self, events: List[Dict]):
+        """投递一批事件"""
+    
+    def close(self):
+        """释放连接等资源"""
+
+
+class StdoutSink(NotificationSink):
+    """每个事件输出一行JSON到标准输出"""
+    
+    def deliver(self, events: List[Dict]):
+        sys.stdout.write("".join(json.dumps(event, ensure_ascii=False) + "\n" for event in events))
+        sys.stdout.flush()
+
+
+class WebhookSink(NotificationSink):
+    """以 {"events": [...]} 的JSON正文POST到HTTP接口，非2xx响应视为失败"""
+    
+    def __init__(self, spec: str):
+        super().__init__(spec)
+        self.session = requests.Session()
+    
+    def deliver(self, events: List[Dict]):
+        response = self.session.post(self.name, json={"events": events}, timeout=self.SEND_TIMEOUT)
+        response.raise_for_status()
+    
+    def close(self):
+        self.session.close()
+
+
+class UnixSocketSink(NotificationSink):
+    """通过Unix套接字发送JSON行，连接断开后下次投递时重连"""
+    
+    def __init__(self, spec: str):
+        super().__init__(spec)
+        self.path = spec[len("unix:"):]
+        self.sock: Optional[socket.socket] = None
+    
+    def deliver(self, events: List[Dict]):
+        payload = "".join(json.dumps(event, ensure_ascii=False) + "\n" for event in events).encode("utf-8")
+        try:
+            if self.sock is None:
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.sock.settimeout(self.SEND_TIMEOUT)
+                self.sock.connect(self.path)
+            self.sock.sendall(payload)
+        except OSError:
+            self.close()
+            raise
+    
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class FileQueueSink(NotificationSink):
+    """每批写成队列目录中的一个JSON行文件，先写临时文件再原子改名，消费者处理后自行删除"""
+    
+    def __init__(self, spec: str):
+        super().__init__(spec)
+        self.directory = spec[len("file:"):]
+        self.sequence = 0
+        os.makedirs(self.directory, exist_ok=True)
+    
+    def deliver(self, events: List[Dict]):
+        self.sequence += 1
+        filename = f"{time.time_ns()}-{os.getpid()}-{self.sequence:06d}.jsonl"
+        temp_file = os.path.join(self.directory, f".{filename}.tmp")
+        with open(temp_file, "w", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, os.path.join(self.directory, filename))
+
+
+class SinkWorker:
+    """一个通知目标的有界队列和后台投递线程：按批次投递、失败退避重试，队列满时丢弃新事件而不阻塞探测"""
+    
+    RETRY_BASE_DELAY = 0.5  # 重试等待的基数（秒），按次数指数增长
+    MAX_RETRY_DELAY = 10.0
+    
+    def __init__(self, sink: NotificationSink, batch_size: int = 50, batch_interval: float = 1.0,
+                 queue_size: int = 1000, max_retries: int = 3):
+        self.sink = sink
+        self.batch_size = max(batch_size, 1)
+        self.batch_interval = batch_interval
+        self.max_retries = max_retries
+        self.queue: "queue.Queue[Tuple[Dict, float]]" = queue.Queue(maxsize=max(queue_size, 1))
+        self.closing = threading.Event()
+        self.abort = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.dropped = 0
+    
+    def start(self):
+        """启动后台线程"""
+        if self.thread is not None:
+            return
+        self.closing.clear()
+        self.abort.clear()
+        self.thread = threading.Thread(target=self._worker, name=f"SinkWorker-{self.sink.name}", daemon=True)
+        self.thread.start()
+    
+    def submit(self, event: Dict, detected_at: float):
+        """放入一个事件；队列已满说明消费者跟不上，直接丢弃并计数"""
+        try:
+            self.queue.put_nowait((event, detected_at))
+        except queue.Full:
+            self.dropped += 1
+            METRICS.inc("tracker_notify_events_total", sink=self.sink.name, status="dropped")
+            return
+        METRICS.set_gauge("tracker_notify_queue_size", self.queue.qsize(), sink=self.sink.name)
+    
+    def _next_batch(self) -> Optional[List[Tuple[Dict, float]]]:
+        """取下一批：拿到第一个事件后最多再等 batch_interval 秒凑满一批；关闭且队列为空时返回None"""
+        while True:
+            try:
+                batch = [self.queue.get(timeout=0.2)]
+                break
+            except queue.Empty:
+                if self.closing.is_set():
+                    return None
+        deadline = time.monotonic() + self.batch_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 and not self.closing.is_set()
+                             else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _worker(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            METRICS.set_gauge("tracker_notify_queue_size", self.queue.qsize(), sink=self.sink.name)
+            self._deliver(batch)
+    
+    def _deliver(self, batch: List[Tuple[Dict, float]]):
+        """投递一批，失败时退避重试，超过 max_retries 次后放弃这一批"""
+        events = [event for event, _ in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.sink.deliver(events)
+                break
+            except Exception as e:
+                if attempt >= self.max_retries or self.abort.is_set():
+                    logging.error("通知投递到 %s 失败，放弃 %s 个事件: %s", self.sink.name, len(events), e)
+                    METRICS.inc("tracker_notify_events_total", len(events), sink=self.sink.name, status="failed")
+                    return
+                delay = min(self.RETRY_BASE_DELAY * 2 ** attempt, self.MAX_RETRY_DELAY)
+                logging.warning("通知投递到 %s 失败，%.1f 秒后重试: %s", self.sink.name, delay, e)
+                if self.abort.wait(delay):
+                    METRICS.inc("tracker_notify_events_total", len(events), sink=self.sink.name, status="failed")
+                    return
+        
+        delivered_at = time.monotonic()
+        METRICS.inc("tracker_notify_batches_total", sink=self.sink.name)
+        METRICS.inc("tracker_notify_events_total", len(events), sink=self.sink.name, status="delivered")
+        for _, detected_at in batch:
+            METRICS.observe("tracker_change_notify_latency_seconds", delivered_at - detected_at, sink=self.sink.name)
+    
+    def close(self, timeout: float):
+        """投递完队列中剩余的事件后停止；超时则放弃剩余事件"""
+        self.closing.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                self.abort.set()
+                self.thread.join(self.sink.SEND_TIMEOUT)
+            self.thread = None
+        if self.dropped:
+            logging.warning("通知目标 %s 的队列满时丢弃了 %s 个事件", self.sink.name, self.dropped)
+            self.dropped = 0
+        undelivered = self.queue.qsize()
+        if undelivered:
+            logging.warning("通知目标 %s 关闭时仍有 %s 个事件未投递", self.sink.name, undelivered)
+        self.sink.close()
+
+
+class ChangeStream:
+    """探测过程中实时检测跳转URL变化，把变化事件分发给各通知目标，不必等整轮结束和更新检查"""
+    
+    CLOSE_TIMEOUT = 10.0  # 本轮结束时等待剩余事件投递的最长时间（秒）
+    
+    def __init__(self, config: TrackerConfig, sinks: List[NotificationSink]):
+        self.config = config
+        self.workers = [SinkWorker(sink, config.notify_batch_size, config.notify_batch_interval,
+                                   config.notify_queue_size, config.notify_max_retries) for sink in sinks]
+        self.latest: Optional[Dict[str, str]] = None
+        self.lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config: TrackerConfig) -> Optional["ChangeStream"]:
+        """根据配置创建，未配置 notify_sinks 时不启用"""
+        if not config.notify_sinks:
+            return None
+        return cls(config, [NotificationSink.from_spec(spec) for spec in config.notify_sinks])
+    
+    def start(self, store: ResultStore):
+        """首次启动时以跳转历史中每个编号的当前URL为基线，之后的轮次沿用内存中的状态"""
+        if self.latest is None:
+            history = RedirectHistory.from_config(self.config)
+            try:
+                history.sync(store)
+                self.latest = history.current()
+            finally:
+                history.close()
+            logging.info("变化通知: 基线 %s 个编号，通知目标 %s", len(self.latest),
+                         ", ".join(worker.sink.name for worker in self.workers))
+        for worker in self.workers:
+            worker.start()
+    
+    def observe(self, target: str, shizu_id: str, original_url: str, redirect_url: str, timestamp: str):
+        """记录一次成功探测，跳转URL与上次不同时立即分发变化事件"""
+        with self.lock:
+            old_url = self.latest.get(shizu_id)
+            self.latest[shizu_id] = redirect_url
+        if not ResultAnalyzer.compare_results({shizu_id: old_url}, {shizu_id: redirect_url}):
+            return
+        
+        detected_at = time.monotonic()
+        event = {
+            "event": "redirect_changed",
+            "target": target,
+            "shizu_id": shizu_id,
+            "original_url": original_url,
+            "old_url": old_url,
+            "new_url": redirect_url,
+            "changed_at": timestamp,
+        }
+        METRICS.inc("tracker_changes_streamed_total")
+        for worker in self.workers:
+            worker.submit(event, detected_at)
+    
+    def close(self):
+        """等待各通知目标投递完剩余事件"""
+        deadline = time.monotonic() + self.CLOSE_TIMEOUT
+        for worker in self.workers:
+            worker.close(max(deadline - time.monotonic(), 0.0))
+
+
+class TrackerDaemon:
+    """常驻服务：按内部计划循环运行追踪和更新检查，两轮之间保留连接池、缓存和跳转历史，配置文件变化时热加载"""
+    
+    CONFIG_CHECK_INTERVAL = 5.0  # 等待下一轮期间检查配置文件变化的间隔（秒）
+    
+    def __init__(self, config_path: str = "config.json"):
+        self.config_path = config_path
+        self.stop_event = threading.Event()
+        self.reload_requested = threading.Event()
+        self.cycles = 0
+        self.tracker: Optional[WebsiteTracker] = None
+        self.notifier: Optional[UpdateNotifier] = None
+        self._config_signature = self._signature()
+        self._apply_config(ConfigManager.load_config(config_path))
+    
+    def _signature(self) -> Optional[Tuple[float, int]]:
+        """配置文件的修改时间和大小，文件不存在时为None"""
+        try:
+            stat = os.stat(ConfigManager.resolve_path(self.config_path))
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+    
+    def _apply_config(self, config: TrackerConfig):
+        """按配置创建追踪器和通知器；网络参数随追踪器一起重建"""
+        self.config = config
+        self.tracker = WebsiteTracker(config)
+        self.notifier = UpdateNotifier(config, self.tracker.store)
+    
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """配置文件变化时重新加载；新配置无效时保留当前配置继续运行"""
+        signature = self._signature()
+        if not force and signature == self._config_signature:
+            return False
+        self._config_signature = signature
+        try:
+            config = ConfigManager.read_config(self.config_path)
+        except Exception as e:
+            logging.error("配置文件无效，继续使用当前配置: %s", e)
+            return False
+        if config == self.config:
+            return False
+        self._close()
+        self._apply_config(config)
+        METRICS.inc("tracker_daemon_reloads_total")
+        logging.info("已重新加载配置文件 %s", self.config_path)
+        return True
+    
+    def stop(self, signum=None, frame=None):
+        """请求停止：正在处理的编号完成后保存进度退出"""
+        if signum is not None:
+            logging.info("收到信号 %s，当前编号处理完后退出...", signum)
+        self.stop_event.set()
+        if self.tracker:
+            self.tracker.request_stop()
+    
+    def _request_reload(self, signum=None, frame=None):
+        """SIGHUP：在下一次检查时强制重新加载配置"""
+        self.reload_requested.set()
+    
+    def install_signal_handlers(self):
+        """注册退出和重新加载信号；平台不支持的信号跳过"""
+        for name in ("SIGTERM", "SIGINT", "SIGBREAK"):
+            if hasattr(signal, name):
+                signal.signal(getattr(signal, name), self.stop)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self._request_reload)
+    
+    def run_cycle(self):
+        """运行一轮追踪和更新检查；单轮出错只记录日志，不中断服务"""
+        self.cycles += 1
+        logging.info("常驻服务: 开始第 %s 轮", self.cycles)
+        try:
+            with METRICS.timer("tracker_daemon_cycle_seconds"):
+                self.tracker.run()
+                if not self.stop_event.is_set():
+                    self.notifier.check_and_notify_updates()
+        except Exception as e:
+            logging.error("第 %s 轮运行出错: %s", self.cycles, e)
+            METRICS.inc("tracker_daemon_cycles_total", status="error")
+        else:
+            METRICS.inc("tracker_daemon_cycles_total", status="ok")
+    
+    def run(self):
+        """循环运行直到收到退出信号"""
+        self.install_signal_handlers()
+        logging.info("常驻服务已启动: 每 %s 秒运行一轮，配置文件 %s", self.config.daemon_interval, self.config_path)
+        try:
+            while not self.stop_event.is_set():
+                started = time.monotonic()
+                self.run_cycle()
+                # 等待到下一轮，期间定期检查配置文件；重新加载后按新间隔计算
+                while not self.stop_event.is_set():
+                    remaining = started + self.config.daemon_interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.stop_event.wait(min(remaining, self.CONFIG_CHECK_INTERVAL))
+                    if not self.stop_event.is_set():
+                        self.reload_if_changed(force=self.reload_requested.is_set())
+                        self.reload_requested.clear()
+        finally:
+            self._close()
+            logging.info("常驻服务已退出，共运行 %s 轮", self.cycles)
+    
+    def _close(self):
+        """关闭结果库和跳转历史"""
+        if self.tracker:
+            self.tracker.store.close()
+        if self.notifier:
+            self.notifier.history.close()
+
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="网站跳转追踪器")
+    parser.add_argument("--import-results", metavar="FILE", nargs="?", const="",
+                        help="把文本结果文件导入SQLite结果库后退出（默认导入配置中的 results_file）")
+    parser.add_argument("--shard-worker", action="store_true",
+                        help="以分片工作进程运行：领取分片租约并把结果写入分片结果段")
+    parser.add_argument("--merge-shards", action="store_true",
+                        help="合并已完成的分片结果段并检查更新")
+    parser.add_argument("--history", metavar="SHIZU_ID",
+                        help="查询某个编号的跳转历史后退出（时间格式 \"YYYY-MM-DD HH:MM:SS\"，可只写日期）")
+    parser.add_argument("--at", metavar="TIME", help="配合 --history：查询该时间点的跳转URL")
+    parser.add_argument("--start", metavar="TIME", help="配合 --history：只列出该时间之后仍有效的区间")
+    parser.add_argument("--end", metavar="TIME", help="配合 --history：只列出该时间之前开始的区间")
+    parser.add_argument("--daemon", action="store_true",
+                        help="以常驻服务运行：按 daemon_interval 循环追踪，配置文件修改后自动重新加载")
+    parser.add_argument("--config", default="config.json",
+                        help="配置文件路径，相对路径相对于脚本所在目录（默认 config.json）")
+    args = parser.parse_args()
+    
+    if args.daemon:
+        TrackerDaemon(args.config).run()
+        return
+    
     # 加载配置
-    config = ConfigManager.load_config()
+    config = ConfigManager.load_config(args.config)
+    
+    if args.history:
+        history = RedirectHistory.from_config(config)
+        history.sync(ResultStore.from_config(config))
+        if args.at:
+            at = RedirectHistory.normalize_time(args.at)
+            print(f"{args.history} 在 {at}: {history.value_at(args.history, at) or '无记录'}")
+        else:
+            start = RedirectHistory.normalize_time(args.start)
+            end = RedirectHistory.normalize_time(args.end, end_of_day=True)
+            for interval in history.intervals(args.history, start, end):
+                print(f"{interval['valid_from']} 至 {interval['valid_to'] or '现在'}: {interval['redirect_url']}"
+                      f"（最后确认 {interval['last_seen']}）")
+        history.close()
+        return
+    
+    if args.import_results is not None:
+        store = SQLiteResultStore(config.results_db)
+        imported = store.import_text_file(args.import_results or config.results_file)
+        store.close()
+        print(f"已导入 {imported} 条结果到 {config.results_db}")
+        return
     
     # 创建并运行追踪器
     tracker = WebsiteTracker(config)
-    tracker.run()
-    
-    # 检查更新并通知
-    notifier = UpdateNotifier(config)
-    notifier.check_and_notify_updates()
+    try:
+        if args.shard_worker:
+            tracker.run_shard_worker()
+            return
+        if args.merge_shards:
+            for target in tracker.targets:
+                ShardLeaseManager.from_config(config, target).merge(tracker.store)
+        else:
+            tracker.run()
+        
+        # 检查更新并通知（共用追踪器的结果库）
+        notifier = UpdateNotifier(config, tracker.store)
+        try:
+            notifier.check_and_notify_updates()
+        finally:
+            notifier.history.close()
+    finally:
+        tracker.store.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+AntiCrawlMatcher 各类规则的匹配
+"""
+
+import os
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "scripts"))
+
+from website_tracker import AhoCorasickAutomaton, AntiCrawlMatcher
+
+
+class AntiCrawlMatcherTest(unittest.TestCase):
+    """主机、路径、子串和正则规则"""
+
+    def test_host_rule_matches_subdomains(self):
+        matcher = AntiCrawlMatcher(["host:decoy.example.com"])
+        self.assertEqual(matcher.match("http://decoy.example.com/a"), "host:decoy.example.com")
+        self.assertEqual(matcher.match("https://cdn.decoy.example.com/"), "host:decoy.example.com")
+        self.assertEqual(matcher.match("http://DECOY.example.com:8080/"), "host:decoy.example.com")
+        self.assertIsNone(matcher.match("http://notdecoy.example.com/"))
+        self.assertIsNone(matcher.match("http://example.com/"))
+
+    def test_trailing_dot_host(self):
+        matcher = AntiCrawlMatcher(["host:decoy.example.com", "path:block.example.com/video"])
+        self.assertEqual(matcher.match("http://decoy.example.com./x"), "host:decoy.example.com")
+        self.assertEqual(matcher.match("http://block.example.com./video/1"), "path:block.example.com/video")
+
+    def test_path_prefix_respects_segments(self):
+        matcher = AntiCrawlMatcher(["path:block.example.com/video/"])
+        rule = "path:block.example.com/video/"
+        self.assertEqual(matcher.match("http://block.example.com/video"), rule)
+        self.assertEqual(matcher.match("http://block.example.com/video/1?x=2"), rule)
+        self.assertIsNone(matcher.match("http://block.example.com/videos/1"))
+        self.assertIsNone(matcher.match("http://other.example.com/video/1"))
+
+    def test_root_path_rule_matches_whole_host(self):
+        matcher = AntiCrawlMatcher(["path:block.example.com/"])
+        self.assertEqual(matcher.match("http://block.example.com/any/path"), "path:block.example.com/")
+        self.assertEqual(matcher.match("http://block.example.com"), "path:block.example.com/")
+
+    def test_substring_rules(self):
+        matcher = AntiCrawlMatcher(["v.qq.com/txp/iframe/player.html", "save-video", "# 注释", ""])
+        self.assertEqual(matcher.rule_count, 2)
+        self.assertEqual(matcher.match("https://v.qq.com/txp/iframe/player.html?vid=1"),
+                         "v.qq.com/txp/iframe/player.html")
+        self.assertEqual(matcher.match("https://mtvod.meituan.net/save-video/1.mp4"), "save-video")
+        self.assertIsNone(matcher.match("https://example.com/"))
+        self.assertIsNone(matcher.match(""))
+
+    def test_regex_with_literal_is_prefiltered(self):
+        matcher = AntiCrawlMatcher([r"regex:/captcha/\d+"])
+        self.assertEqual(matcher.unfiltered_regexes, [])
+        self.assertEqual(matcher.match("http://a.example.com/captcha/123"), "regex:/captcha/123")
+        self.assertIsNone(matcher.match("http://a.example.com/captcha/abc"))
+
+    def test_regex_without_literal_is_always_run(self):
+        matcher = AntiCrawlMatcher([r"regex:(?i)CAPTCHA", r"regex:\d{6}"])
+        self.assertEqual(matcher.unfiltered_regexes, [0, 1])
+        self.assertEqual(matcher.match("http://a.example.com/Captcha"), "regex:Captcha")
+        self.assertEqual(matcher.match("http://a.example.com/123456"), "regex:123456")
+
+    def test_regex_features_survive_per_rule_compile(self):
+        matcher = AntiCrawlMatcher([r"regex:(?P<w>ab)(?P=w)", r"regex:(?P<w>xy)\1"])
+        self.assertEqual(matcher.match("http://example.com/abab"), "regex:abab")
+        self.assertEqual(matcher.match("http://example.com/xyxy"), "regex:xyxy")
+        self.assertIsNone(matcher.match("http://example.com/abxy"))
+
+    def test_invalid_regex_names_the_rule(self):
+        with self.assertRaises(re.error) as context:
+            AntiCrawlMatcher(["regex:(unclosed"])
+        self.assertIn("regex:(unclosed", str(context.exception))
+
+
+class AhoCorasickAutomatonTest(unittest.TestCase):
+    """多模式子串匹配"""
+
+    def test_first_and_all(self):
+        automaton = AhoCorasickAutomaton()
+        for pattern in ("he", "she", "his", "hers"):
+            automaton.add(pattern, pattern)
+        automaton.build()
+        self.assertEqual(automaton.first("ushers"), "she")
+        self.assertEqual(automaton.all("ushers"), {"he", "she", "hers"})
+        self.assertIsNone(automaton.first("xyz"))
+
+    def test_empty_automaton_is_false(self):
+        automaton = AhoCorasickAutomaton()
+        automaton.build()
+        self.assertFalse(automaton)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+MetaRefreshScanner 增量扫描Meta刷新标签
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "scripts"))
+
+from website_tracker import MetaRefreshScanner
+
+
+def scan(page: bytes, chunk_size: int = 8192, max_bytes=None):
+    """按固定块大小把页面喂给扫描器，返回找到的目标URL"""
+    scanner = MetaRefreshScanner(max_bytes)
+    for start in range(0, len(page), chunk_size):
+        if scanner.feed(page[start:start + chunk_size]):
+            break
+    return scanner.result
+
+
+class MetaRefreshScannerTest(unittest.TestCase):
+    """各种页面在任意分块方式下结果一致"""
+
+    CHUNK_SIZES = (1, 3, 7, 64, 8192)
+
+    def assertScans(self, page: bytes, expected):
+        for chunk_size in self.CHUNK_SIZES:
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(scan(page, chunk_size), expected)
+
+    def test_refresh_in_head(self):
+        page = b'<html><head><META HTTP-EQUIV="Refresh" CONTENT="0; URL=\'http://a.example.com/x?a=1&amp;b=2\'"></head>'
+        self.assertScans(page, "http://a.example.com/x?a=1&b=2")
+
+    def test_unquoted_attributes(self):
+        self.assertScans(b"<meta http-equiv=refresh content=5;url=/next>", "/next")
+
+    def test_non_refresh_meta_is_ignored(self):
+        page = b'<meta charset="utf-8"><meta name="x" content="url=http://wrong"><p>no refresh</p>'
+        self.assertScans(page, None)
+
+    def test_refresh_inside_comment_is_skipped(self):
+        page = (b'<head><!-- <meta http-equiv="refresh" content="0;url=http://wrong"> -->'
+                b'<meta http-equiv="refresh" content="0;url=http://right"></head>')
+        self.assertScans(page, "http://right")
+
+    def test_raw_text_elements_are_skipped(self):
+        for name in (b"script", b"style", b"textarea", b"title"):
+            with self.subTest(element=name):
+                page = (b"<head><" + name + b">'<meta http-equiv=\"refresh\" content=\"0;url=http://wrong\">'</"
+                        + name.upper() + b' ><meta http-equiv="refresh" content="0;url=http://right">')
+                self.assertScans(page, "http://right")
+
+    def test_body_in_head_script_does_not_stop_scan(self):
+        page = (b'<head><script>document.write("<body>")</script>'
+                b'<meta http-equiv="refresh" content="0;url=http://right"></head>')
+        self.assertScans(page, "http://right")
+
+    def test_refresh_in_body(self):
+        page = b'<head></head><body><p>text</p><meta http-equiv="refresh" content="0;url=http://body"></body>'
+        self.assertScans(page, "http://body")
+
+    def test_gt_inside_quoted_attribute(self):
+        page = b'<meta data-x="a>b" http-equiv="refresh" content="0;url=http://right?a>b">'
+        self.assertScans(page, "http://right?a>b")
+
+    def test_max_bytes_stops_scan(self):
+        page = b"<p>" + b"x" * 1000 + b'</p><meta http-equiv="refresh" content="0;url=http://late">'
+        self.assertIsNone(scan(page, 64, max_bytes=512))
+        self.assertEqual(scan(page, 64, max_bytes=4096), "http://late")
+
+
+if __name__ == "__main__":
+    unittest.main()
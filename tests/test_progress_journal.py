@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+ProgressJournal 日志回放、压缩与残缺记录截断
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "scripts"))
+
+from website_tracker import ProgressJournal
+
+
+class ProgressJournalTest(unittest.TestCase):
+    """进度日志的恢复语义"""
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.progress_file = os.path.join(self.workdir.name, "progress.json")
+        self.journal_file = os.path.join(self.workdir.name, "progress.journal")
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def open_journal(self, **kwargs):
+        return ProgressJournal(self.progress_file, self.journal_file, min_index=1, ranges=[[1, 100]], **kwargs)
+
+    def test_replay_without_compaction(self):
+        journal = self.open_journal()
+        for index in (1, 2, 3, 5, 7):
+            journal.record_done(index, 0)
+        journal.record_retry(4, 2, 1)
+        # 模拟崩溃：不压缩直接关闭
+        journal.file.close()
+
+        journal = self.open_journal()
+        self.assertEqual(journal.last_index, 3)
+        self.assertEqual(journal.completed, {5, 7})
+        self.assertEqual(journal.retry_counts, {4: 2})
+        self.assertEqual(journal.consecutive_failures, 1)
+        journal.close()
+
+    def test_done_after_retry_advances_watermark(self):
+        journal = self.open_journal()
+        for index in (1, 2, 3, 5):
+            journal.record_done(index, 0)
+        journal.record_retry(4, 1, 1)
+        journal.record_done(4, 0)
+        self.assertEqual(journal.last_index, 5)
+        self.assertEqual(journal.completed, set())
+        self.assertEqual(journal.retry_counts, {})
+        journal.close()
+
+    def test_compaction_writes_progress_and_clears_journal(self):
+        journal = self.open_journal(compact_every=3)
+        for index in (1, 2, 4):
+            journal.record_done(index, 0)
+        # 第三条记录触发压缩
+        self.assertEqual(os.path.getsize(self.journal_file), 0)
+        with open(self.progress_file, encoding="utf-8") as f:
+            progress = json.load(f)
+        self.assertEqual(progress["last_index"], 2)
+        self.assertEqual(progress["completed"], [4])
+        self.assertEqual(progress["ranges"], [[1, 100]])
+
+        journal.record_done(3, 0)
+        journal.file.close()
+        journal = self.open_journal()
+        self.assertEqual(journal.last_index, 4)
+        self.assertEqual(journal.completed, set())
+        journal.close()
+
+    def test_torn_last_line_is_truncated(self):
+        journal = self.open_journal()
+        journal.record_done(1, 0)
+        journal.record_done(2, 0)
+        journal.file.write('{"e": "done", "i": 3')
+        journal.file.close()
+
+        journal = self.open_journal()
+        self.assertEqual(journal.last_index, 2)
+        # 残缺记录被截掉，之后追加的记录在下次回放时不会被一起丢弃
+        journal.record_done(3, 0)
+        journal.file.close()
+        journal = self.open_journal()
+        self.assertEqual(journal.last_index, 3)
+        journal.close()
+
+    def test_reset_starts_new_round(self):
+        journal = self.open_journal()
+        for index in (1, 2, 5):
+            journal.record_done(index, 0)
+        journal.record_retry(3, 1, 0)
+        journal.reset(1)
+        journal.close()
+
+        journal = self.open_journal()
+        self.assertEqual((journal.last_index, journal.completed, journal.retry_counts), (0, set(), {}))
+        journal.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
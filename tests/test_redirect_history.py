@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+RedirectHistory 有效区间的记录与时间点、时间段查询
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "scripts"))
+
+from website_tracker import RedirectHistory
+
+
+class RedirectHistoryTest(unittest.TestCase):
+    """区间按观测时间开启与关闭"""
+
+    def setUp(self):
+        self.history = RedirectHistory(":memory:")
+        observations = [
+            ("shizu1", "http://a", "2024-01-01 00:00:00"),
+            ("shizu1", "http://a", "2024-01-02 00:00:00"),
+            ("shizu1", "http://b", "2024-01-03 00:00:00"),
+            ("shizu2", "http://x", "2024-01-01 12:00:00"),
+            ("shizu1", "http://c", "2024-01-05 00:00:00"),
+        ]
+        self.changed = [self.history.observe(*observation) for observation in observations]
+
+    def tearDown(self):
+        self.history.conn.close()
+
+    def test_observe_reports_changes_only(self):
+        self.assertEqual(self.changed, [False, False, True, False, True])
+
+    def test_older_observation_is_ignored(self):
+        self.assertFalse(self.history.observe("shizu1", "http://old", "2024-01-04 00:00:00"))
+        self.assertEqual(self.history.current()["shizu1"], "http://c")
+
+    def test_value_at(self):
+        self.assertIsNone(self.history.value_at("shizu1", "2023-12-31 23:59:59"))
+        self.assertEqual(self.history.value_at("shizu1", "2024-01-01 00:00:00"), "http://a")
+        self.assertEqual(self.history.value_at("shizu1", "2024-01-02 23:59:59"), "http://a")
+        # 区间右端开放：变化时刻起即为新值
+        self.assertEqual(self.history.value_at("shizu1", "2024-01-03 00:00:00"), "http://b")
+        self.assertEqual(self.history.value_at("shizu1", "2030-01-01 00:00:00"), "http://c")
+        self.assertIsNone(self.history.value_at("missing", "2024-01-03 00:00:00"))
+
+    def test_intervals_overlapping_range(self):
+        intervals = self.history.intervals("shizu1", "2024-01-02 00:00:00", "2024-01-03 12:00:00")
+        self.assertEqual([interval["redirect_url"] for interval in intervals], ["http://a", "http://b"])
+        self.assertEqual(intervals[0]["valid_to"], "2024-01-03 00:00:00")
+        self.assertEqual(intervals[0]["last_seen"], "2024-01-02 00:00:00")
+        self.assertEqual([interval["redirect_url"] for interval in self.history.intervals("shizu1")],
+                         ["http://a", "http://b", "http://c"])
+        self.assertIsNone(self.history.intervals("shizu1", "2024-01-06")[0]["valid_to"])
+
+    def test_changes_between(self):
+        self.assertEqual(self.history.changes_between("2024-01-01", "2024-01-04"),
+                         [("shizu1", "http://a", "http://b", "2024-01-03 00:00:00")])
+        start = RedirectHistory.normalize_time("2024-01-03")
+        end = RedirectHistory.normalize_time("2024-01-05", end_of_day=True)
+        self.assertEqual(len(self.history.changes_between(start, end)), 2)
+
+    def test_changes_since(self):
+        self.assertEqual(len(self.history.changes_since(0)), 2)
+        last_id = self.history.conn.execute("SELECT MAX(id) FROM intervals").fetchone()[0]
+        self.assertEqual(self.history.changes_since(last_id), [])
+        self.history.observe("shizu2", "http://y", "2024-01-06 00:00:00")
+        self.assertEqual(self.history.changes_since(last_id),
+                         [("shizu2", "http://x", "http://y", "2024-01-06 00:00:00")])
+
+    def test_current(self):
+        self.assertEqual(self.history.current(), {"shizu1": "http://c", "shizu2": "http://x"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+RetryQueue 按到期时间出队，同时到期的按入队顺序
+"""
+
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "scripts"))
+
+from website_tracker import RetryQueue
+
+
+class RetryQueueTest(unittest.TestCase):
+    """延迟重试队列的顺序与容量"""
+
+    def drain(self, queue):
+        indexes = []
+        while True:
+            index = queue.pop_ready()
+            if index is None:
+                return indexes
+            indexes.append(index)
+
+    def test_ready_items_pop_in_due_order(self):
+        queue = RetryQueue()
+        queue.push(30, 0.02)
+        queue.push(10, 0.0)
+        queue.push(20, 0.01)
+        time.sleep(0.05)
+        self.assertEqual(self.drain(queue), [10, 20, 30])
+        self.assertEqual(len(queue), 0)
+
+    def test_same_due_time_is_fifo(self):
+        queue = RetryQueue()
+        # 固定时钟，使各编号的到期时间完全相同
+        with mock.patch("website_tracker.time.monotonic", return_value=100.0):
+            for index in (5, 3, 9, 1):
+                queue.push(index, 0.0)
+            self.assertEqual(self.drain(queue), [5, 3, 9, 1])
+
+    def test_pending_items_are_not_popped(self):
+        queue = RetryQueue()
+        queue.push(1, 60.0)
+        queue.push(2, 0.0)
+        self.assertEqual(self.drain(queue), [2])
+        self.assertEqual(len(queue), 1)
+        self.assertGreater(queue.wait_time(), 50.0)
+
+    def test_wait_time_and_limit(self):
+        queue = RetryQueue(limit=2)
+        self.assertEqual(queue.wait_time(), 0.0)
+        queue.push(1, 60.0)
+        self.assertFalse(queue.is_full())
+        queue.push(2, 60.0)
+        self.assertTrue(queue.is_full())
+
+
+if __name__ == "__main__":
+    unittest.main()
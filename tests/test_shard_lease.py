@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+ShardLeaseManager 分片领取、续约与过期接管
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "scripts"))
+
+from website_tracker import ShardLeaseManager
+
+
+class ShardLeaseManagerTest(unittest.TestCase):
+    """多个工作进程共享同一分片目录"""
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def manager(self, worker_id):
+        return ShardLeaseManager(self.workdir.name, 1, 25, 10, 60, worker_id)
+
+    def expire(self, shard, owner):
+        """把分片租约改写为已过期"""
+        path = os.path.join(self.workdir.name, f"shard_{shard[0]:06d}_{shard[1]:06d}.lease")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"owner": owner, "expires": time.time() - 1}, f)
+
+    def test_shards_cover_range(self):
+        self.assertEqual(list(self.manager("a").shards()), [(1, 10), (11, 20), (21, 25)])
+
+    def test_live_lease_is_not_taken(self):
+        first, second = self.manager("a"), self.manager("b")
+        self.assertEqual(first.claim(), (1, 10))
+        self.assertEqual(second.claim(), (11, 20))
+        self.assertTrue(first.heartbeat((1, 10)))
+        self.assertFalse(second.heartbeat((1, 10)))
+
+    def test_expired_lease_is_taken_over(self):
+        first, second = self.manager("a"), self.manager("b")
+        self.assertEqual(first.claim(), (1, 10))
+        self.expire((1, 10), "a")
+        self.assertEqual(second.claim(), (1, 10))
+        # 原持有者续约失败，应停止处理该分片
+        self.assertFalse(first.heartbeat((1, 10)))
+        self.assertFalse(first.complete((1, 10)))
+        self.assertTrue(second.heartbeat((1, 10)))
+
+    def test_release_makes_shard_claimable(self):
+        first, second = self.manager("a"), self.manager("b")
+        shard = first.claim()
+        # 释放他人的租约不产生影响
+        second.release(shard)
+        self.assertEqual(second.claim(), (11, 20))
+        first.release(shard)
+        self.assertEqual(second.claim(), shard)
+
+    def test_completed_shard_is_skipped(self):
+        first, second = self.manager("a"), self.manager("b")
+        shard = first.claim()
+        self.assertTrue(first.complete(shard))
+        self.assertTrue(second.is_done(shard))
+        self.assertEqual(second.claim(), (11, 20))
+        self.assertEqual(second.claim(), (21, 25))
+        self.assertIsNone(second.claim())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+WorkTarget 位置与编号的换算，以及编号区间修改后的断点续跑
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "scripts"))
+
+from website_tracker import ProgressJournal, WorkTarget
+
+
+class WorkTargetTest(unittest.TestCase):
+    """位置 <-> 编号 <-> 结果编号的往返换算"""
+
+    def test_single_range_position_is_number(self):
+        target = WorkTarget("shizu", "http://example.com/s/shizu", [(1, 100)])
+        self.assertEqual((target.first, target.last, target.count), (1, 100, 100))
+        for position in target.positions():
+            self.assertEqual(target.id_at(position), position)
+
+    def test_ranges_are_merged_and_round_trip(self):
+        target = WorkTarget("vod", "http://example.com/v/", [(50, 60), (10, 20), (15, 25), (26, 30), (99, 99)])
+        self.assertEqual(target.segments(), [[10, 30], [50, 60], [99, 99]])
+        self.assertEqual(target.count, 21 + 11 + 1)
+
+        numbers = [target.id_at(position) for position in target.positions()]
+        self.assertEqual(numbers, list(range(10, 31)) + list(range(50, 61)) + [99])
+        for position in target.positions():
+            number = target.id_at(position)
+            self.assertEqual(target.position_of(number), position)
+            name, digits = WorkTarget.split_id(target.shizu_id(position))
+            self.assertEqual((name, int(digits)), ("vod", number))
+        self.assertEqual(target.url(target.first), "http://example.com/v/10")
+
+    def test_position_of_outside_ranges(self):
+        target = WorkTarget("vod", "", [(10, 20), (50, 60)])
+        for number in (9, 21, 49, 61):
+            self.assertIsNone(target.position_of(number))
+
+    def test_positions_start_is_clamped(self):
+        target = WorkTarget("vod", "", [(10, 12), (20, 21)])
+        self.assertEqual(list(target.positions(0)), list(range(10, 15)))
+        self.assertEqual(list(target.positions(13)), [13, 14])
+
+    def test_split_id_without_digits(self):
+        self.assertEqual(WorkTarget.split_id("shizu"), ("shizu", ""))
+        self.assertEqual(WorkTarget.split_id("shizu007"), ("shizu", "007"))
+
+
+class ResumeAcrossChangedRangesTest(unittest.TestCase):
+    """进度按位置保存；编号区间被修改后要按编号换算，不能让位置静默错位"""
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.progress_file = os.path.join(self.workdir.name, "progress.json")
+        self.journal_file = os.path.join(self.workdir.name, "progress.journal")
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def open_journal(self, target):
+        return ProgressJournal(self.progress_file, self.journal_file, min_index=target.first,
+                               ranges=target.segments())
+
+    def done_numbers(self, journal, target):
+        """日志中已完成的编号"""
+        done = {target.id_at(position) for position in target.positions() if position <= journal.last_index}
+        return done | {target.id_at(position) for position in journal.completed}
+
+    def test_unchanged_ranges_resume_in_place(self):
+        target = WorkTarget("vod", "", [(10, 20), (50, 60)])
+        journal = self.open_journal(target)
+        for position in range(target.first, target.first + 15):
+            journal.record_done(position, 0)
+        journal.close()
+
+        journal = self.open_journal(target)
+        self.assertEqual(journal.last_index, target.first + 14)
+        self.assertEqual(target.id_at(journal.last_index + 1), 54)
+        journal.close()
+
+    def test_range_inserted_before_done_numbers(self):
+        old = WorkTarget("vod", "", [(10, 20), (50, 60)])
+        journal = self.open_journal(old)
+        # 完成 10..20 和 50..53，另有 58 提前完成、56 等待重试
+        for position in range(old.first, old.first + 15):
+            journal.record_done(position, 0)
+        journal.record_done(old.position_of(58), 0)
+        journal.record_retry(old.position_of(56), 2, 1)
+        # 不压缩直接关闭文件，模拟中断：下次需要回放旧区间下写入的日志
+        journal.file.close()
+
+        new = WorkTarget("vod", "", [(1, 5), (10, 20), (50, 60)])
+        journal = self.open_journal(new)
+        # 新加入的 1..5 尚未处理，水位线停在开头；旧进度中的编号一个不丢、一个不多
+        self.assertEqual(journal.last_index, new.first - 1)
+        self.assertEqual(self.done_numbers(journal, new),
+                         set(range(10, 21)) | set(range(50, 54)) | {58})
+        self.assertEqual({new.id_at(position): count for position, count in journal.retry_counts.items()}, {56: 2})
+        journal.close()
+
+        # 换算结果已压缩保存，再次打开不会重复换算
+        journal = self.open_journal(new)
+        self.assertEqual(self.done_numbers(journal, new),
+                         set(range(10, 21)) | set(range(50, 54)) | {58})
+        journal.close()
+
+    def test_range_removed_keeps_remaining_progress(self):
+        old = WorkTarget("vod", "", [(10, 20), (50, 60), (80, 90)])
+        journal = self.open_journal(old)
+        for position in range(old.first, old.position_of(55) + 1):
+            journal.record_done(position, 0)
+        journal.close()
+
+        new = WorkTarget("vod", "", [(50, 60), (80, 90)])
+        journal = self.open_journal(new)
+        self.assertEqual(new.id_at(journal.last_index), 55)
+        self.assertEqual(journal.completed, set())
+        journal.close()
+
+    def test_legacy_progress_without_ranges_is_kept(self):
+        target = WorkTarget("shizu", "", [(1, 100)])
+        journal = ProgressJournal(self.progress_file, self.journal_file, min_index=1)
+        for position in range(1, 11):
+            journal.record_done(position, 0)
+        journal.close()
+
+        journal = self.open_journal(target)
+        self.assertEqual(journal.last_index, 10)
+        journal.close()
+
+
+if __name__ == "__main__":
+    unittest.main()